@@ -1,9 +1,31 @@
 import asyncio
 import enum
-from typing import Optional, Dict, Any, Callable
+import functools
+from typing import Optional, Dict, Any, Callable, NamedTuple, Union, List
 import async_timeout
 
-from aiosmpp import pdu
+from aiosmpp import pdu, log
+from aiosmpp.dispatch import DispatchTable
+from aiosmpp.framing import PDUFramer, PDUWriter, FramingException
+from aiosmpp.rtt import RTTStats
+from aiosmpp.throttle import TokenBucket
+from aiosmpp.timers import get_timer_wheel
+
+logger = log.get_logger('client')
+
+
+class SMPPClientError(Exception):
+    pass
+
+
+class SubmitResult(NamedTuple):
+    sequence_number: int
+    command_status: int
+    message_id: Optional[str]
+
+    @property
+    def ok(self) -> bool:
+        return self.command_status == pdu.Status.ESME_ROK
 
 
 class SMPPConnectionState(enum.Enum):
@@ -14,6 +36,30 @@ class SMPPConnectionState(enum.Enum):
     CLOSED = enum.auto()
 
 
+BOUND_STATES = (SMPPConnectionState.BOUND_TX, SMPPConnectionState.BOUND_RX, SMPPConnectionState.BOUND_TRX)
+SUBMIT_STATES = (SMPPConnectionState.BOUND_TX, SMPPConnectionState.BOUND_TRX)
+THROTTLED_STATUSES = (pdu.Status.ESME_RTHROTTLED, pdu.Status.ESME_RMSGQFUL)
+DEFAULT_WINDOW = 10
+# Keepalive timeout is RTT_TIMEOUT_MULTIPLIER x the p99 RTT once there are MIN_RTT_SAMPLES round trips to go on
+MIN_RTT_SAMPLES = 20
+RTT_TIMEOUT_MULTIPLIER = 4
+# Transport write buffer limits, writing is paused above the high water mark until it drains to the low one
+DEFAULT_WRITE_BUFFER_HIGH = 256 * 1024
+DEFAULT_WRITE_BUFFER_LOW = 64 * 1024
+RESPONSE_COMMAND_IDS = tuple(command_id for command_id in pdu.CommandID
+                             if command_id & 0x80000000)
+
+# (state, command_id) -> handler, anything else is unexpected in that state
+CLIENT_DISPATCH = DispatchTable.build(
+    SMPPConnectionState,
+    (SMPPConnectionState, RESPONSE_COMMAND_IDS, '_handle_response'),
+    (BOUND_STATES, (pdu.CommandID.ENQUIRE_LINK,), '_handle_enquire_link'),
+    (BOUND_STATES, (pdu.CommandID.UNBIND,), '_handle_unbind'),
+    ((SMPPConnectionState.BOUND_RX, SMPPConnectionState.BOUND_TRX), (pdu.CommandID.DELIVER_SM,), '_handle_deliver_sm'),
+    default='_handle_unexpected'
+)
+
+
 class SMPPClientProtocol(asyncio.Protocol):
     def __init__(self, config, loop: Optional[asyncio.AbstractEventLoop]=None):
         self.loop = loop
@@ -22,18 +68,51 @@ class SMPPClientProtocol(asyncio.Protocol):
             self.loop = asyncio.get_event_loop()
 
         self.transport = None
+        self.writer: Optional[PDUWriter] = None
+        self.framer = PDUFramer()
+        self.timers = get_timer_wheel(self.loop)
         self.config: Dict[str, Any] = config
-        self.state: SMPPConnectionState = SMPPConnectionState.CLOSED
+        self._dispatch = CLIENT_DISPATCH.bind(self)
+        self._handle_default = CLIENT_DISPATCH.bind_default(self)
+        self._handlers = self._dispatch[SMPPConnectionState.CLOSED]
+        self._state: SMPPConnectionState = SMPPConnectionState.CLOSED
         self.conn_lost_trigger: Callable[[], None] = lambda: None
+        self.flow_control_trigger: Callable[[bool], None] = lambda paused: None
+        self.bound_trigger: Callable[[], None] = lambda: None
+        self.deliver_sm_trigger: Callable[[pdu.DeliverSM], None] = lambda pkt: None
 
-        # enquire_link
+        # Keepalive, an enquire_link is only sent after enquire_link_interval seconds of receiving nothing
         self.enquire_link_enabled = True
-        self.enquire_link_timeout = 0.15  # 150ms
-        self.enquire_link_period = 20
-        self.enquire_link_future = None
+        self.enquire_link_interval = float(self.config.get('enquire_link_interval', 30))
+        self.enquire_link_default_timeout = 10.0
+        self.enquire_link_min_timeout = 1.0
+        self.enquire_link_max_timeout = 30.0
+        self._keepalive_timer = None
+        self._last_activity = 0.0
+
+        # Round trip time of every request
+        self.rtt = RTTStats()
 
         self._seq_number = 0x01
-        self.pending_responses = {}  # Seq ID -> (timer coro, handler_func/partial)
+        self.pending_responses = {}  # Seq ID -> (timeout timer, handler_func/partial, time sent)
+
+        # submit_sm window, at most `window` submits are awaiting a submit_sm_resp
+        self.window = int(self.config.get('window', DEFAULT_WINDOW))
+        self.submit_sm_resp_timeout = 10
+        self._window = asyncio.Semaphore(self.window)
+        self._pending_submits: Dict[int, asyncio.Future] = {}  # Seq ID -> future resolved with a SubmitResult
+        self._submits = 0  # Submits waiting for the window or a response
+
+        # Write flow control
+        self.write_buffer_high = int(self.config.get('write_buffer_high', DEFAULT_WRITE_BUFFER_HIGH))
+        self.write_buffer_low = int(self.config.get('write_buffer_low', DEFAULT_WRITE_BUFFER_LOW))
+        self.writing_paused = False
+        self._resume_waiters: List[asyncio.Future] = []
+
+        # Connector level submit_sm parameters, pre-encoded. Set by the owner of the protocol
+        self.submit_sm_template: Optional[pdu.SubmitSMTemplate] = None
+        # Connector level submit rate limit, shared between its binds. Set by the owner of the protocol
+        self.throttle: Optional[TokenBucket] = None
 
         # Defaults
         self.username = 'testuser'
@@ -43,7 +122,7 @@ class SMPPClientProtocol(asyncio.Protocol):
         self.addr_ton = 1
         self.addr_npi = 1
 
-        self.bind_resp_timeout = 0.15  # 150ms
+        self.bind_resp_timeout = 10
 
     def __del__(self):
         self.close()
@@ -54,9 +133,54 @@ class SMPPClientProtocol(asyncio.Protocol):
         except:
             pass
 
+    @property
+    def state(self) -> SMPPConnectionState:
+        return self._state
+
+    @state.setter
+    def state(self, value: SMPPConnectionState):
+        self._state = value
+        self._handlers = self._dispatch[value]
+
     def set_connection_lost_callback(self, func: Callable[[], None]):
         self.conn_lost_trigger = func
 
+    def set_bound_callback(self, func: Callable[[], None]):
+        self.bound_trigger = func
+
+    def set_flow_control_callback(self, func: Callable[[bool], None]):
+        """
+        Called with True when the write buffer passes the high water mark and False once it drains
+        """
+        self.flow_control_trigger = func
+
+    def set_deliver_sm_callback(self, func: Callable[[pdu.DeliverSM], None]):
+        self.deliver_sm_trigger = func
+
+    @property
+    def enquire_link_timeout(self) -> float:
+        """
+        enquire_link_resp timeout derived from the observed p99 RTT, so slow links aren't dropped by a fixed timeout
+        """
+        if len(self.rtt) < MIN_RTT_SAMPLES:
+            return self.enquire_link_default_timeout
+
+        timeout = self.rtt.percentile(99) * RTT_TIMEOUT_MULTIPLIER
+        return min(self.enquire_link_max_timeout, max(self.enquire_link_min_timeout, timeout))
+
+    @property
+    def write_buffer_size(self) -> int:
+        if self.transport is None:
+            return 0
+        return self.transport.get_write_buffer_size()
+
+    @property
+    def in_flight(self) -> int:
+        """
+        Submits on this bind, both those awaiting a submit_sm_resp and those waiting for room in the window
+        """
+        return self._submits
+
     def get_sequence_number(self) -> int:
         result = self._seq_number
         self._seq_number += 1
@@ -65,29 +189,111 @@ class SMPPClientProtocol(asyncio.Protocol):
 
     def connection_made(self, transport: asyncio.Transport):
         self.transport = transport
-        print('Connected to {0[0]}:{0[1]}'.format(self.transport.get_extra_info('peername')))
+        self.writer = PDUWriter(transport, self.loop, corked=self.config.get('cork', True))
+        logger.info('Connected to %s:%s', *self.transport.get_extra_info('peername')[:2])
+        self.transport.set_write_buffer_limits(high=self.write_buffer_high, low=self.write_buffer_low)
         self.state = SMPPConnectionState.OPEN
 
+    def pause_writing(self):
+        logger.warning('Write buffer over %d bytes, pausing writes', self.write_buffer_high)
+        self.writing_paused = True
+        self.flow_control_trigger(True)
+
+    def resume_writing(self):
+        logger.info('Write buffer drained, resuming writes')
+        self.writing_paused = False
+        self._wake_resume_waiters()
+        self.flow_control_trigger(False)
+
+    def _wake_resume_waiters(self):
+        waiters, self._resume_waiters = self._resume_waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def wait_writable(self):
+        """
+        Wait until the transport is accepting writes again
+        """
+        while self.writing_paused and self.state != SMPPConnectionState.CLOSED:
+            waiter = self.loop.create_future()
+            self._resume_waiters.append(waiter)
+            await waiter
+
     def data_received(self, data: bytes):
-        print('Data received: {0}'.format(data))
+        logger.debug('Data received: %r', data)
+        self._last_activity = self.loop.time()
 
-        if len(data) < 16:
-            print('Recieved pkt len less than 16 bytes, invalid header')
+        try:
+            packets = self.framer.feed(data)
+        except FramingException as err:
+            logger.warning('Invalid PDU stream, %s. Closing', err)
+            self._close_session()
             return
 
-        hdr = pdu.decode_header(data)
+        for packet in packets:
+            if self.transport.is_closing():
+                break
+            self.pdu_received(packet)
 
-        if hdr['seq_no'] in self.pending_responses:
-            timeout_future, handler = self.pending_responses.pop(hdr['seq_no'])
-            timeout_future.cancel()
-            if handler:
-                handler(hdr)
+    def pdu_received(self, packet: memoryview):
+        _, command_id, command_status, sequence_no = pdu.peek_header(packet)
+        self._handlers.get(command_id, self._handle_default)(packet, command_id, command_status, sequence_no)
+
+    def _decode(self, packet: memoryview, command_id: int, command_status: int, sequence_no: int) -> Optional[pdu.PDU]:
+        try:
+            return pdu.decode_body(packet, command_id, command_status, sequence_no)
+        except pdu.DecodeException as err:
+            logger.warning('Failed to decode PDU: %s', err)
+        return None
+
+    # Handlers
+    def _handle_response(self, packet: memoryview, command_id: int, command_status: int, sequence_no: int):
+        try:
+            timer, handler, sent = self.pending_responses.pop(sequence_no)
+        except KeyError:
+            logger.warning('No req matching %s', sequence_no)
             return
 
-        print('No req matching {0}'.format(hdr['seq_no']))
+        timer.cancel()
+        self.rtt.add(self._last_activity - sent)
+        if handler:
+            # Only responses someone is waiting on get decoded
+            pkt = self._decode(packet, command_id, command_status, sequence_no)
+            if pkt is None:
+                # The request will never complete and its timer is gone, fail it and drop the session like the
+                # server does rather than leave it holding a window slot or the bind waiting forever
+                logger.warning('Undecodable response to %s. Closing', sequence_no)
+                future = self._pending_submits.pop(sequence_no, None)
+                if future is not None and not future.done():
+                    future.set_exception(SMPPClientError('Undecodable response to {0}'.format(sequence_no)))
+                self._close_session()
+                return
+            handler(pkt)
+
+    def _handle_enquire_link(self, packet: memoryview, command_id: int, command_status: int, sequence_no: int):
+        self.writer.write(pdu.enquire_link_resp(sequence_no), urgent=True)
+
+    def _handle_unbind(self, packet: memoryview, command_id: int, command_status: int, sequence_no: int):
+        logger.info('Unbind requested by SMSC')
+        self.writer.write(pdu.ENCODERS[pdu.CommandID.UNBIND_RESP](sequence_no), urgent=True)
+        self._close_session()
+
+    def _handle_deliver_sm(self, packet: memoryview, command_id: int, command_status: int, sequence_no: int):
+        pkt = self._decode(packet, command_id, command_status, sequence_no)
+        if pkt is None:
+            self.writer.write(pdu.deliver_sm_resp(sequence_no, status=pdu.Status.ESME_RINVCMDLEN))
+            return
+
+        self.deliver_sm_trigger(pkt)
+        self.writer.write(pdu.deliver_sm_resp(sequence_no))
+
+    def _handle_unexpected(self, packet: memoryview, command_id: int, command_status: int, sequence_no: int):
+        logger.warning('Unexpected command ID %s whilst in %s state', command_id, self.state.name)
+        self.writer.write(pdu.ENCODERS[pdu.CommandID.GENERIC_NACK](sequence_no, status=pdu.Status.ESME_RINVCMDID))
 
     def connection_lost(self, exc):
-        print('Lost connection to {0[0]}:{0[1]}'.format(self.transport.get_extra_info('peername')))
+        logger.info('Lost connection to %s:%s', *self.transport.get_extra_info('peername')[:2])
         self.state = SMPPConnectionState.CLOSED
 
         self._close_session()
@@ -109,86 +315,189 @@ class SMPPClientProtocol(asyncio.Protocol):
         )
 
         self.pending_responses[seq_no] = (
-            asyncio.ensure_future(self.timeout_coro('bind_trx', self.bind_resp_timeout), loop=self.loop),
-            self.bind_trx_resp
+            self.timers.call_later(self.bind_resp_timeout, self._response_timeout, 'bind_trx', seq_no, self.bind_resp_timeout),
+            self.bind_trx_resp,
+            self.loop.time()
         )
-        self.transport.write(pkt)
-        print('Requested TRX bind')
+        self.writer.write(pkt, urgent=True)
+        logger.debug('Requested TRX bind')
 
-    def bind_trx_resp(self, pkt: Dict[str, Any]):
-        print('Got Bind TRX response {0}'.format(pkt))
+    def bind_trx_resp(self, pkt: pdu.BindTransceiverResp):
+        logger.debug('Got Bind TRX response %s', pkt)
 
-        if pkt['status'] != pdu.Status.ESME_ROK:
-            print('TRX Bind did not get ESME_ROK')
+        if pkt.command_status != pdu.Status.ESME_ROK:
+            logger.error('TRX Bind did not get ESME_ROK')
             self._close_session()
             return
 
-        bind_resp = pdu.decode_bind_trx_resp(pkt['payload'])
-
-        if 0x0210 in bind_resp['tlvs'] and bind_resp['tlvs'][0x0210] > self.smpp_min_verison:
-            print('SMPP Server minimum version ({0}) is higher than ours, cant continue'.format(bind_resp['tlvs'][0x0210]))
+        if 0x0210 in pkt.tlvs and pkt.tlvs[0x0210] > self.smpp_min_verison:
+            logger.error('SMPP Server minimum version (%s) is higher than ours, cant continue', pkt.tlvs[0x0210])
             self._close_session()
             return
 
         self.state = SMPPConnectionState.BOUND_TRX
-        print('TRX Bound')
-
-        self.setup_enquire_link_loop()
+        logger.info('TRX Bound')
+
+        self.setup_keepalive()
+        self.bound_trigger()
+
+    async def submit_sm(self,
+                        source_addr: Optional[str],
+                        dest_addr: str,
+                        short_message: Optional[bytes],
+                        data_coding: Optional[int]=None,
+                        esm_class: Optional[int]=None,
+                        priority_flag: Optional[int]=None,
+                        registered_delivery: Optional[int]=None,
+                        tlvs: Union[pdu.TLVs, Dict[Union[int, str], Any], List[bytes], None]=None) -> SubmitResult:
+        """
+        Send a submit_sm and wait for its submit_sm_resp
+
+        Waits first if the window is full, then for the throttle. Connector level parameters come from
+        submit_sm_template.
+
+        :raises SMPPClientError: If the session is not bound or closes before the response arrives
+        :raises asyncio.TimeoutError: If no submit_sm_resp arrives within submit_sm_resp_timeout
+        """
+        future = await self.send_submit_sm(source_addr, dest_addr, short_message, data_coding=data_coding,
+                                           esm_class=esm_class, priority_flag=priority_flag,
+                                           registered_delivery=registered_delivery, tlvs=tlvs)
+        return await future
+
+    async def send_submit_sm(self,
+                             source_addr: Optional[str],
+                             dest_addr: str,
+                             short_message: Optional[bytes],
+                             data_coding: Optional[int]=None,
+                             esm_class: Optional[int]=None,
+                             priority_flag: Optional[int]=None,
+                             registered_delivery: Optional[int]=None,
+                             tlvs: Union[pdu.TLVs, Dict[Union[int, str], Any], List[bytes], None]=None) -> asyncio.Future:
+        """
+        Send a submit_sm, returns once it has been written with a future for its SubmitResult
+
+        Lets a caller put several submit_sm on the wire in order without waiting for each response. The window slot
+        is held until the future is done.
+
+        :raises SMPPClientError: If the session is not bound
+        """
+        self._submits += 1
+        try:
+            await self._window.acquire()
+        except BaseException:
+            self._submits -= 1
+            raise
 
-    async def timeout_coro(self, _type, timeout):
         try:
-            await asyncio.sleep(timeout)
-            print('Failed to receive {0} in {1} seconds'.format(_type, timeout))
-            self._close_session()
-        except asyncio.CancelledError:
-            pass
+            if self.writing_paused:
+                await self.wait_writable()
+            if self.throttle is not None:
+                await self.throttle.acquire()
+
+            if self.state not in SUBMIT_STATES:
+                raise SMPPClientError('Cannot submit whilst in {0} state'.format(self.state.name))
+
+            if self.submit_sm_template is None:
+                self.submit_sm_template = pdu.SubmitSMTemplate()
+            if data_coding is None:
+                data_coding = self.config.get('coding', 0)
+
+            seq_no = self.get_sequence_number()
+            pkt = self.submit_sm_template.encode(
+                seq_no, source_addr, dest_addr, data_coding, short_message,
+                esm_class=esm_class, priority_flag=priority_flag, registered_delivery=registered_delivery, tlvs=tlvs
+            )
+        except BaseException:
+            self._window.release()
+            self._submits -= 1
+            raise
+
+        future = self.loop.create_future()
+        future.add_done_callback(functools.partial(self._submit_done, seq_no))
+        self._pending_submits[seq_no] = future
+        self.pending_responses[seq_no] = (
+            self.timers.call_later(self.submit_sm_resp_timeout, self._submit_sm_timeout, seq_no),
+            self._submit_sm_resp,
+            self.loop.time()
+        )
+        self.writer.write(pkt)
 
-    def setup_enquire_link_loop(self):
-        if self.enquire_link_enabled:
-            self.enquire_link_future = asyncio.ensure_future(self.enquire_link_loop(), loop=self.loop)
+        return future
 
-    async def enquire_link_loop(self):
-        try:
-            while True:
-                try:
-                    # Enquire link loop
-                    seq_no = self.get_sequence_number()
-                    pkt = pdu.enquire_link(seq_no)
-
-                    self.pending_responses[seq_no] = (
-                        asyncio.ensure_future(
-                            self.timeout_coro('enquire_link_{0}'.format(seq_no),
-                                              self.enquire_link_timeout),
-                            loop=self.loop
-                        ),
-                        None
-                    )
-                    self.transport.write(pkt)
-                    print('Sent enquire link')
-
-                    await asyncio.sleep(self.enquire_link_period, loop=self.loop)
-                except Exception as err:
-                    if isinstance(err, asyncio.CancelledError):
-                        raise
-
-                    print('Caught exception {0}'.format(err))
-        except asyncio.CancelledError:
-            pass
+    def _submit_done(self, seq_no: int, future: asyncio.Future):
+        self._pending_submits.pop(seq_no, None)
+        self._window.release()
+        self._submits -= 1
+
+    def _submit_sm_resp(self, pkt: Union[pdu.SubmitSMResp, pdu.GenericNack]):
+        if pkt.command_status in THROTTLED_STATUSES and self.throttle is not None:
+            self.throttle.backoff()
+
+        future = self._pending_submits.pop(pkt.sequence_number, None)
+        if future is not None and not future.done():
+            future.set_result(SubmitResult(pkt.sequence_number, pkt.command_status, pkt.get('message_id')))
+
+    def _submit_sm_timeout(self, seq_no: int):
+        self.pending_responses.pop(seq_no, None)
+        future = self._pending_submits.pop(seq_no, None)
+        if future is not None and not future.done():
+            future.set_exception(asyncio.TimeoutError('No submit_sm_resp for {0} in {1} seconds'.format(seq_no, self.submit_sm_resp_timeout)))
+
+    def _response_timeout(self, _type: str, seq_no: int, timeout: float):
+        self.pending_responses.pop(seq_no, None)
+        logger.warning('Failed to receive %s in %s seconds', _type, timeout)
+        self._close_session()
+
+    def setup_keepalive(self):
+        if self.enquire_link_enabled and self._keepalive_timer is None:
+            self._keepalive_timer = self.timers.call_later(self.enquire_link_interval, self._keepalive)
+
+    def _keepalive(self):
+        self._keepalive_timer = None
+        if self.state not in BOUND_STATES:
+            return
+
+        # Anything received proves the link is up, only probe once its been quiet for a whole interval
+        idle = self.loop.time() - self._last_activity
+        if idle < self.enquire_link_interval:
+            self._keepalive_timer = self.timers.call_later(self.enquire_link_interval - idle, self._keepalive)
+            return
+
+        seq_no = self.get_sequence_number()
+        timeout = self.enquire_link_timeout
+        self.pending_responses[seq_no] = (
+            self.timers.call_later(timeout, self._response_timeout, 'enquire_link_resp', seq_no, timeout),
+            None,
+            self.loop.time()
+        )
+        self.writer.write(pdu.enquire_link(seq_no), urgent=True)
+        logger.debug('Sent enquire link')
+
+        self._keepalive_timer = self.timers.call_later(self.enquire_link_interval, self._keepalive)
 
     def _close_session(self):
-        self.transport.close()
+        if self.writer is not None:
+            self.writer.close()
+        else:
+            self.transport.close()
+        self.framer.clear()
         self.state = SMPPConnectionState.CLOSED
-        try:
-            if self.enquire_link_future:
-                self.enquire_link_future.cancel()
-                self.enquire_link_future = None
-        except asyncio.CancelledError:
-            pass
-        try:
-            for value in self.pending_responses.values():
-                value.cancel()
-        except asyncio.CancelledError:
-            pass
+        if self._keepalive_timer is not None:
+            self._keepalive_timer.cancel()
+            self._keepalive_timer = None
+        for timer, _, _ in self.pending_responses.values():
+            timer.cancel()
+        self.pending_responses.clear()
+
+        for future in self._pending_submits.values():
+            if not future.done():
+                future.set_exception(SMPPClientError('Session closed'))
+        self._pending_submits.clear()
+
+        if self.writing_paused:
+            self.writing_paused = False
+            self._wake_resume_waiters()
+            self.flow_control_trigger(False)
 
 
 # class SMPPManager(object):
@@ -0,0 +1,260 @@
+import functools
+import math
+from typing import Dict, Optional
+
+from aiosmpp.constants import DataCoding, NationalLanguage
+
+# GSM 03.38 text is encoded one septet per octet (unpacked), which is how short_message carries it.
+# pack_septets / unpack_septets convert to and from the packed 7 bit form.
+ESCAPE = 0x1b
+
+# Default alphabet, indexed by septet. 0x1b is the escape to the extension table
+GSM_BASIC = ("@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞ\x1bÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>"
+             "?¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà")
+# Extension table, septet after an escape -> character
+GSM_EXTENSION = {
+    0x0a: '\x0c',
+    0x14: '^',
+    0x28: '{',
+    0x29: '}',
+    0x2f: '\\',
+    0x3c: '[',
+    0x3d: '~',
+    0x3e: ']',
+    0x40: '|',
+    0x65: '€'
+}
+
+# National language tables, 3GPP TS 23.038 A.2 and A.3. A locking shift table replaces the default alphabet and a
+# single shift table replaces the extension table, each is selected by its own UDH IE so the two can be mixed
+GSM_LOCKING_SHIFT = {
+    NationalLanguage.DEFAULT: GSM_BASIC,
+    NationalLanguage.TURKISH: ("@£$¥€éùıòÇ\nĞğ\rÅåΔ_ΦΓΛΩΠΨΣΘΞ\x1bŞşßÉ !\"#¤%&'()*+,-./0123456789:;<=>"
+                               "?İABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§çabcdefghijklmnopqrstuvwxyzäöñüà"),
+    NationalLanguage.PORTUGUESE: ("@£$¥êéúíóç\nÔô\rÁáΔ_ªÇÀ∞^\\€Ó|\x1bÂâÊÉ !\"#º%&'()*+,-./0123456789:;<=>"
+                                  "?ÍABCDEFGHIJKLMNOPQRSTUVWXYZÃÕÚÜ§~abcdefghijklmnopqrstuvwxyzãõ`üà"),
+    NationalLanguage.HINDI: ("ँंःअआइईउऊऋ\nऌऍ\rऎए"
+                             "ऐऑऒओऔकखगघङच\x1bछजझञ"
+                             " !टठडढणत)(थद,ध.न"
+                             "0123456789:;ऩपफ?"
+                             "बभमयरऱलळऴवशषसह़ऽ"
+                             "ािीुूृॄॅॆेैॉॊोौ्"
+                             "ॐabcdefghijklmnopqrstuvwxyzॲॻॼॾॿ")
+}
+GSM_SINGLE_SHIFT = {
+    NationalLanguage.DEFAULT: GSM_EXTENSION,
+    NationalLanguage.TURKISH: {
+        **GSM_EXTENSION,
+        0x47: 'Ğ', 0x49: 'İ', 0x53: 'Ş', 0x63: 'ç', 0x67: 'ğ', 0x69: 'ı', 0x73: 'ş'
+    },
+    NationalLanguage.SPANISH: {
+        **GSM_EXTENSION,
+        0x09: 'ç', 0x41: 'Á', 0x49: 'Í', 0x4f: 'Ó', 0x55: 'Ú', 0x61: 'á', 0x69: 'í', 0x6f: 'ó', 0x75: 'ú'
+    },
+    NationalLanguage.PORTUGUESE: {
+        **GSM_EXTENSION,
+        0x05: 'ê', 0x09: 'ç', 0x0b: 'Ô', 0x0c: 'ô', 0x0e: 'Á', 0x0f: 'á', 0x12: 'Φ', 0x13: 'Γ', 0x15: 'Ω',
+        0x16: 'Π', 0x17: 'Ψ', 0x18: 'Σ', 0x19: 'Θ', 0x1f: 'Ê', 0x41: 'À', 0x49: 'Í', 0x4f: 'Ó', 0x55: 'Ú',
+        0x5b: 'Ã', 0x5c: 'Õ', 0x61: 'Â', 0x69: 'í', 0x6f: 'ó', 0x75: 'ú', 0x7b: 'ã', 0x7c: 'õ', 0x7f: 'â'
+    }
+}
+
+REPLACEMENT = '?'
+GSM_REPLACEMENT = GSM_BASIC.index(REPLACEMENT)
+
+
+class _EncodeTable(dict):
+    """
+    str.translate table, characters missing from the alphabet are handled by errors
+    """
+    __slots__ = ('errors',)
+
+    def __init__(self, mapping: Dict[int, str], errors: str):
+        super().__init__(mapping)
+        self.errors = errors
+
+    def __missing__(self, key: int) -> Optional[str]:
+        if self.errors == 'replace':
+            return chr(GSM_REPLACEMENT)
+        elif self.errors == 'ignore':
+            return None
+        raise ValueError('Character {0!r} is not in the GSM 03.38 alphabet'.format(chr(key)))
+
+
+class GSMAlphabet(object):
+    """
+    The GSM 7 bit alphabet with a given locking and single shift table, the defaults being 0
+    """
+    def __init__(self, locking: int=NationalLanguage.DEFAULT, single: int=NationalLanguage.DEFAULT):
+        try:
+            self.basic = GSM_LOCKING_SHIFT[locking]
+            self.extension = GSM_SINGLE_SHIFT[single]
+        except KeyError:
+            raise ValueError('No GSM shift tables for locking {0} single {1}'.format(locking, single))
+        self.locking = NationalLanguage(locking)
+        self.single = NationalLanguage(single)
+
+        # Characters in both go via the basic table as that takes one septet
+        mapping = {ord(char): chr(ESCAPE) + chr(septet) for septet, char in self.extension.items()}
+        mapping.update({ord(char): chr(septet) for septet, char in enumerate(self.basic) if septet != ESCAPE})
+        self._encode_tables = {errors: _EncodeTable(mapping, errors) for errors in ('strict', 'replace', 'ignore')}
+
+        self._decode_basic = dict(enumerate(self.basic))
+        # An escape followed by something outside the extension table is shown as the basic character, 6.2.1.1
+        self._decode_extension = dict(self._decode_basic)
+        self._decode_extension.update(self.extension)
+
+        self.shift_chars = frozenset(self.extension.values()) - frozenset(self.basic)
+        self.chars = frozenset(self.basic) - {chr(ESCAPE)} | self.shift_chars
+
+    def __repr__(self) -> str:
+        return '<GSMAlphabet locking={0} single={1}>'.format(self.locking.name, self.single.name)
+
+    def is_encodable(self, text: str) -> bool:
+        return self.chars.issuperset(text)
+
+    def encode(self, text: str, errors: str='strict') -> bytes:
+        return text.translate(self._encode_tables[errors]).encode('latin-1')
+
+    def decode(self, data: bytes) -> str:
+        parts = bytes(data).split(b'\x1b')
+        result = [parts[0].decode('latin-1').translate(self._decode_basic)]
+        for part in parts[1:]:
+            if part:
+                result.append(self._decode_extension.get(part[0], ''))
+                result.append(part[1:].decode('latin-1').translate(self._decode_basic))
+        return ''.join(result)
+
+    def length(self, text: str) -> int:
+        """
+        Septets text encodes to, text is assumed to be encodable
+        """
+        return len(text) + sum(text.count(char) for char in self.shift_chars)
+
+
+@functools.lru_cache(maxsize=None)
+def gsm_alphabet(locking: int=NationalLanguage.DEFAULT, single: int=NationalLanguage.DEFAULT) -> GSMAlphabet:
+    """
+    Get the alphabet for a pair of shift tables, they're built once and shared
+
+    :raises ValueError: If there's no table for either language
+    """
+    return GSMAlphabet(locking, single)
+
+
+def is_gsm(text: str, locking: int=NationalLanguage.DEFAULT, single: int=NationalLanguage.DEFAULT) -> bool:
+    return gsm_alphabet(locking, single).is_encodable(text)
+
+
+def gsm_encode(text: str, errors: str='strict', locking: int=NationalLanguage.DEFAULT,
+               single: int=NationalLanguage.DEFAULT) -> bytes:
+    """
+    Encode to unpacked GSM 03.38 septets, extension characters take two
+
+    :param errors: strict raises, replace substitutes '?' and ignore drops unencodable characters
+    :param locking: National language locking shift table, the receiver is told via a UDH IE
+    :param single: National language single shift table, the receiver is told via a UDH IE
+    :raises ValueError: If a character isn't in the alphabet and errors is strict
+    """
+    return gsm_alphabet(locking, single).encode(text, errors)
+
+
+def gsm_decode(data: bytes, locking: int=NationalLanguage.DEFAULT, single: int=NationalLanguage.DEFAULT) -> str:
+    """
+    Decode unpacked GSM 03.38 septets
+    """
+    return gsm_alphabet(locking, single).decode(data)
+
+
+def gsm_length(text: str, locking: int=NationalLanguage.DEFAULT, single: int=NationalLanguage.DEFAULT) -> int:
+    """
+    Septets text encodes to
+    """
+    return gsm_alphabet(locking, single).length(text)
+
+
+def pack_septets(septets: bytes, fill_bits: int=0) -> bytes:
+    """
+    Pack septets into octets, least significant bit first
+
+    fill_bits of padding go in front so packed text after a UDH starts on a septet boundary.
+    """
+    value = 0
+    for index in range(len(septets) - 1, -1, -1):
+        value = (value << 7) | (septets[index] & 0x7f)
+    value <<= fill_bits
+
+    return value.to_bytes(math.ceil((len(septets) * 7 + fill_bits) / 8), 'little')
+
+
+def unpack_septets(data: bytes, count: Optional[int]=None, fill_bits: int=0) -> bytes:
+    """
+    Unpack packed septets, count limits how many as trailing bits can otherwise read as an extra '@'
+    """
+    value = int.from_bytes(data, 'little') >> fill_bits
+    if count is None:
+        count = (len(data) * 8 - fill_bits) // 7
+
+    result = bytearray(count)
+    for index in range(count):
+        result[index] = value & 0x7f
+        value >>= 7
+    return bytes(result)
+
+
+def ucs2_encode(text: str) -> bytes:
+    """
+    Encode to UCS-2 big endian, characters outside the BMP become UTF-16 surrogate pairs
+    """
+    return text.encode('utf-16-be')
+
+
+def ucs2_decode(data: bytes) -> str:
+    """
+    Decode UCS-2 big endian, joining surrogate pairs. A split pair or odd trailing octet becomes U+FFFD
+    """
+    return bytes(data).decode('utf-16-be', errors='replace')
+
+
+def ucs2_length(text: str) -> int:
+    """
+    16 bit code units text encodes to, surrogate pairs count as two
+    """
+    return len(text) + sum(1 for char in text if ord(char) > 0xffff)
+
+
+def encode(text: str, data_coding: int, errors: str='strict') -> bytes:
+    """
+    Encode text for short_message with the given data_coding
+
+    :raises ValueError: If the text can't be represented and errors is strict
+    """
+    if data_coding == DataCoding.UCS2:
+        return ucs2_encode(text)
+    elif data_coding == DataCoding.IA5_ASCII:
+        return text.encode('ascii', errors=errors)
+    elif data_coding in (DataCoding.LATIN_1, DataCoding.OCTET_UNSPECIFIED, DataCoding.OCTET_UNSPECIFIED_COMMON):
+        return text.encode('latin-1', errors=errors)
+    return gsm_encode(text, errors=errors)
+
+
+def decode(data: bytes, data_coding: int) -> str:
+    if data_coding == DataCoding.UCS2:
+        return ucs2_decode(data)
+    elif data_coding in (DataCoding.IA5_ASCII, DataCoding.LATIN_1, DataCoding.OCTET_UNSPECIFIED,
+                         DataCoding.OCTET_UNSPECIFIED_COMMON):
+        return bytes(data).decode('latin-1')
+    return gsm_decode(data)
+
+
+def encoded_length(text: str, data_coding: int) -> int:
+    """
+    Length of text once encoded, in the units message limits are given in: septets for GSM, 16 bit code units for
+    UCS-2 and octets otherwise
+    """
+    if data_coding == DataCoding.UCS2:
+        return ucs2_length(text)
+    elif data_coding in (DataCoding.IA5_ASCII, DataCoding.LATIN_1, DataCoding.OCTET_UNSPECIFIED,
+                         DataCoding.OCTET_UNSPECIFIED_COMMON):
+        return len(text)
+    return gsm_length(text)
@@ -1,5 +1,43 @@
 import configparser
-from typing import Callable
+from typing import Any, Callable, Dict
+
+from aiosmpp import log
+from aiosmpp.config.mq import read_mq_config
+from aiosmpp.encoding import parse_languages
+from aiosmpp.splitter import DEFAULT_MAX_SEGMENTS, SPLIT_MODES
+
+logger = log.get_logger('config.httpapi')
+
+
+def read_httpapi_config(config: configparser.ConfigParser) -> Dict[str, Any]:
+    """
+    Read the [httpapi] section, how message content is encoded and split
+    """
+    try:
+        languages = parse_languages(config.get('httpapi', 'national_languages', fallback=''))
+    except ValueError as err:
+        logger.warning('Ignoring national_languages: %s', err)
+        languages = ()
+
+    split = config.get('httpapi', 'long_content_split', fallback='udh')
+    if split not in SPLIT_MODES:
+        logger.warning('Ignoring long_content_split %s, must be one of %s', split, ', '.join(SPLIT_MODES))
+        split = 'udh'
+
+    reference_bits = config.getint('httpapi', 'concat_reference_bits', fallback=16)
+    if reference_bits not in (8, 16):
+        logger.warning('Ignoring concat_reference_bits %d, must be 8 or 16', reference_bits)
+        reference_bits = 16
+
+    return {
+        'auto_encoding': config.getboolean('httpapi', 'auto_encoding', fallback=True),
+        'national_languages': languages,
+        'transliterate': config.getboolean('httpapi', 'transliterate', fallback=False),
+        'long_content_split': split,
+        'long_content_max_parts': config.getint('httpapi', 'long_content_max_parts', fallback=DEFAULT_MAX_SEGMENTS),
+        'concat_reference_bits': reference_bits,
+        'api_max_batch': config.getint('httpapi', 'api_max_batch', fallback=1000)
+    }
 
 
 class HTTPAPIConfig(object):
@@ -10,6 +48,8 @@ class HTTPAPIConfig(object):
         self.mt_routes = {}
         self.mo_routes = {}
         self.filters = {}
+        self.mq = {}
+        self.httpapi = {}
 
         self._read_config()
 
@@ -20,21 +60,24 @@ class HTTPAPIConfig(object):
 
         for section in self._config.sections():
 
-            if section.startswith('mo_route:') or section.startswith('smpp_bind:'):
+            if section.startswith('mo_route:') or section.startswith('smpp_bind:') or section in ('mq', 'reconnect', 'manager', 'httpapi'):
                 continue
             elif section.startswith('filter:'):
                 self._add_filter(section)
             elif section.startswith('mt_route:'):
                 self._add_mt_route(section)
             else:
-                print('Unknown section: {0}'.format(section))
+                logger.warning('Unknown section: %s', section)
+
+        self.mq = read_mq_config(self._config)
+        self.httpapi = read_httpapi_config(self._config)
 
     def _add_filter(self, section):
         name = section.split(':', 1)[-1]
         data = dict(self._config[section])
 
         if name in self.filters:
-            print('Filter {0} already exists, overwriting'.format(name))
+            logger.warning('Filter %s already exists, overwriting', name)
 
         self.filters[name] = data
 
@@ -48,7 +91,7 @@ class HTTPAPIConfig(object):
         data = dict(self._config[section])
 
         if name in self.filters:
-            print('Route {0} already exists, overwriting'.format(name))
+            logger.warning('Route %s already exists, overwriting', name)
 
         return name, data
 
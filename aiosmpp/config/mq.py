@@ -0,0 +1,17 @@
+import configparser
+from typing import Any, Dict
+
+
+def read_mq_config(config: configparser.ConfigParser) -> Dict[str, Any]:
+    """
+    Read the [mq] section shared by the SMPP manager and the HTTP API, missing values fall back to a local broker
+    """
+    return {
+        'host': config.get('mq', 'host', fallback='127.0.0.1'),
+        'port': config.getint('mq', 'port', fallback=5672),
+        'vhost': config.get('mq', 'vhost', fallback='/'),
+        'user': config.get('mq', 'user', fallback='guest'),
+        'password': config.get('mq', 'password', fallback='guest'),
+        'heartbeat_interval': config.getint('mq', 'heartbeat', fallback=30),
+        'connections': config.getint('mq', 'connections', fallback=2)
+    }
@@ -1,6 +1,11 @@
 import configparser
 from typing import Callable
 
+from aiosmpp import log
+from aiosmpp.config.mq import read_mq_config
+
+logger = log.get_logger('config.smpp')
+
 
 class SMPPConfig(object):
     def __init__(self, config: configparser.ConfigParser, reload_func: Callable[[], 'SMPPConfig']):
@@ -10,6 +15,8 @@ class SMPPConfig(object):
         self.connectors = {}
 
         self.mq = {}
+        self.reconnect = {}
+        self.manager = {}
 
         self._read_config()
 
@@ -18,21 +25,24 @@ class SMPPConfig(object):
 
         for section in self._config.sections():
 
-            if section.startswith('mt_route:') or section.startswith('mo_route:') or section.startswith('filter:') or section in ('mq',):
+            if section.startswith('mt_route:') or section.startswith('mo_route:') or section.startswith('filter:') or section in ('mq', 'reconnect', 'manager', 'httpapi'):
                 continue
             elif section.startswith('smpp_bind:'):
                 self._add_connector(section)
             else:
-                print('Unknown section: {0}'.format(section))
+                logger.warning('Unknown section: %s', section)
 
         # Get MQ settings
-        self.mq = {
-            'host': self._config.get('mq', 'host', fallback='127.0.0.1'),
-            'port': self._config.getint('mq', 'port', fallback=5672),
-            'vhost': self._config.get('mq', 'vhost', fallback='/'),
-            'user': self._config.get('mq', 'user', fallback='guest'),
-            'password': self._config.get('mq', 'password', fallback='guest'),
-            'heartbeat_interval': self._config.getint('mq', 'heartbeat', fallback=30)
+        self.mq = read_mq_config(self._config)
+
+        # Manager wide reconnect settings
+        self.reconnect = {
+            'max_concurrent': self._config.getint('reconnect', 'max_concurrent', fallback=10),
+            'max_delay': self._config.getint('reconnect', 'max_delay', fallback=300)
+        }
+
+        self.manager = {
+            'startup_concurrency': self._config.getint('manager', 'startup_concurrency', fallback=20)
         }
 
     def _add_connector(self, section):
@@ -40,7 +50,7 @@ class SMPPConfig(object):
         data = dict(self._config[section])
 
         if name in self.connectors:
-            print('Connector {0} already exists, overwriting'.format(name))
+            logger.warning('Connector %s already exists, overwriting', name)
 
         self.connectors[name] = data
 
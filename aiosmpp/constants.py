@@ -68,6 +68,48 @@ class MoreMessagesToSend(enum.IntEnum):
     MORE_MESSAGES = 0x01
 
 
+class DataCoding(enum.IntEnum):
+    SMSC_DEFAULT = 0x00
+    IA5_ASCII = 0x01
+    OCTET_UNSPECIFIED = 0x02
+    LATIN_1 = 0x03
+    OCTET_UNSPECIFIED_COMMON = 0x04
+    JIS = 0x05
+    CYRILLIC = 0x06
+    ISO_8859_8 = 0x07
+    UCS2 = 0x08
+    PICTOGRAM = 0x09
+    ISO_2022_JP = 0x0a
+    EXTENDED_KANJI_JIS = 0x0d
+    KS_C_5601 = 0x0e
+
+
+# 3GPP TS 23.038 6.2.1.2.4, identifies the shift tables in the UDH national language IEs
+class NationalLanguage(enum.IntEnum):
+    DEFAULT = 0x00
+    TURKISH = 0x01
+    SPANISH = 0x02
+    PORTUGUESE = 0x03
+    BENGALI = 0x04
+    GUJARATI = 0x05
+    HINDI = 0x06
+    KANNADA = 0x07
+    MALAYALAM = 0x08
+    ORIYA = 0x09
+    PUNJABI = 0x0a
+    TAMIL = 0x0b
+    TELUGU = 0x0c
+    URDU = 0x0d
+
+
+# User data header information element identifiers, 3GPP TS 23.040 9.2.3.24
+class UDHIdentifier(enum.IntEnum):
+    CONCATENATED_8BIT = 0x00
+    CONCATENATED_16BIT = 0x08
+    NATIONAL_SINGLE_SHIFT = 0x24
+    NATIONAL_LOCKING_SHIFT = 0x25
+
+
 MESSAGE_STATE_SHORT = {
     'ENROUTE':       'ENROUTE',
     'DELIVERED':     'DELIVRD',
@@ -0,0 +1,45 @@
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+
+Handler = Callable[[memoryview, int, int, int], None]  # (packet, command_id, command_status, sequence_number)
+
+
+class DispatchTable(object):
+    """
+    Maps (state, command_id) to the name of a handler method
+
+    The table is built once per protocol class and bound to each protocol instance, giving a
+    state -> {command_id: bound method} dict. A protocol keeps the dict for its current state, so
+    dispatching a PDU is a single lookup on the command_id peeked from the header.
+    """
+    def __init__(self, routes: Dict[Tuple[Hashable, int], str], states: Iterable[Hashable], default: Optional[str]=None):
+        self.routes = routes
+        self.states = tuple(states)
+        self.default = default
+
+    @classmethod
+    def build(cls, states: Iterable[Hashable], *route_groups: Tuple[Iterable[Hashable], Iterable[int], str],
+              default: Optional[str]=None) -> 'DispatchTable':
+        """
+        Build a table from (states, command_ids, handler name) groups
+        """
+        routes = {}
+        for group_states, command_ids, handler_name in route_groups:
+            for state in group_states:
+                for command_id in command_ids:
+                    routes[(state, command_id)] = handler_name
+
+        return cls(routes, states, default=default)
+
+    def bind(self, instance: Any) -> Dict[Hashable, Dict[int, Handler]]:
+        result = {state: {} for state in self.states}
+
+        for (state, command_id), handler_name in self.routes.items():
+            result[state][command_id] = getattr(instance, handler_name)
+
+        return result
+
+    def bind_default(self, instance: Any) -> Optional[Handler]:
+        if self.default is None:
+            return None
+        return getattr(instance, self.default)
@@ -0,0 +1,138 @@
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Sequence, Tuple
+
+from aiosmpp import codec
+from aiosmpp.constants import DataCoding, NationalLanguage, UDHIdentifier
+from aiosmpp.splitter import MessageSplitter
+
+# Lookalikes for characters GSM lacks, only used when asked for and when it saves a segment
+TRANSLITERATIONS = str.maketrans({
+    '‘': "'", '’': "'", '‚': "'", '‛': "'", '′': "'", '´': "'", '`': "'",
+    '“': '"', '”': '"', '„': '"', '‟': '"', '″': '"', '«': '"', '»': '"',
+    '‐': '-', '‑': '-', '‒': '-', '–': '-', '—': '-', '―': '-', '−': '-',
+    '…': '...',
+    '\t': ' ', '\u00a0': ' ', '\u2002': ' ', '\u2003': ' ', '\u2009': ' ', '\u202f': ' ',
+    '\u200b': '', '\u200c': '', '\u200d': '', '\ufeff': '',
+    'á': 'a', 'â': 'a', 'ã': 'a', 'ą': 'a', 'ç': 'Ç', 'č': 'c', 'ê': 'e', 'ë': 'e', 'ę': 'e', 'ğ': 'g',
+    'í': 'i', 'î': 'i', 'ï': 'i', 'ı': 'i', 'ł': 'l', 'ń': 'n', 'ó': 'o', 'ô': 'o', 'õ': 'o', 'ő': 'ö',
+    'ś': 's', 'ş': 's', 'š': 's', 'ú': 'u', 'û': 'u', 'ű': 'ü', 'ý': 'y', 'ÿ': 'y', 'ź': 'z', 'ż': 'z',
+    'ž': 'z',
+    'À': 'A', 'Á': 'A', 'Â': 'A', 'Ã': 'A', 'Č': 'C', 'È': 'E', 'Ê': 'E', 'Ë': 'E', 'Ğ': 'G', 'Ì': 'I',
+    'Í': 'I', 'Î': 'I', 'Ï': 'I', 'İ': 'I', 'Ł': 'L', 'Ò': 'O', 'Ó': 'O', 'Ô': 'O', 'Õ': 'O', 'Ş': 'S',
+    'Š': 'S', 'Ù': 'U', 'Ú': 'U', 'Û': 'U', 'Ý': 'Y', 'Ž': 'Z',
+    'Α': 'A', 'Β': 'B', 'Ε': 'E', 'Ζ': 'Z', 'Η': 'H', 'Ι': 'I', 'Κ': 'K', 'Μ': 'M', 'Ν': 'N', 'Ο': 'O',
+    'Ρ': 'P', 'Τ': 'T', 'Υ': 'Y', 'Χ': 'X'
+})
+
+
+def shift_udh(locking: int, single: int) -> bytes:
+    """
+    IEs announcing national language shift tables, which go in the UDH of every segment
+    """
+    result = b''
+    if locking:
+        result += bytes((UDHIdentifier.NATIONAL_LOCKING_SHIFT, 1, locking))
+    if single:
+        result += bytes((UDHIdentifier.NATIONAL_SINGLE_SHIFT, 1, single))
+    return result
+
+
+def parse_languages(value: str) -> Tuple[NationalLanguage, ...]:
+    """
+    Parse a comma separated list of national language names, e.g. turkish,spanish
+
+    :raises ValueError: If a language is unknown or there are no shift tables for it
+    """
+    result = []
+    for name in value.split(','):
+        name = name.strip()
+        if not name:
+            continue
+        try:
+            language = NationalLanguage[name.upper()]
+        except KeyError:
+            raise ValueError('Unknown national language {0}'.format(name))
+        if language not in codec.GSM_LOCKING_SHIFT and language not in codec.GSM_SINGLE_SHIFT:
+            raise ValueError('No GSM shift tables for {0}'.format(name))
+        result.append(language)
+    return tuple(result)
+
+
+class EncodingPlan(NamedTuple):
+    """
+    How to send some text, locking and single are the national language shift tables used with GSM
+    """
+    text: str
+    data_coding: int
+    locking: int
+    single: int
+    length: int
+    segments: int
+
+    @property
+    def udh(self) -> bytes:
+        return shift_udh(self.locking, self.single)
+
+    def encode(self) -> bytes:
+        if self.data_coding == DataCoding.UCS2:
+            return codec.ucs2_encode(self.text)
+        return codec.gsm_encode(self.text, locking=self.locking, single=self.single)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'data_coding': int(self.data_coding),
+            'locking': NationalLanguage(self.locking).name,
+            'single': NationalLanguage(self.single).name,
+            'length': self.length,
+            'segments': self.segments
+        }
+
+
+def _gsm_plan(text: str, locking: int, single: int, splitter: MessageSplitter) -> EncodingPlan:
+    data = codec.gsm_encode(text, locking=locking, single=single)
+    segments = splitter.count(data, DataCoding.SMSC_DEFAULT, shift_udh(locking, single))
+    return EncodingPlan(text, DataCoding.SMSC_DEFAULT, locking, single, len(data), segments)
+
+
+def _candidates(text: str, languages: Sequence[int], splitter: MessageSplitter) -> Iterable[EncodingPlan]:
+    # In order of preference when segments tie
+    if codec.is_gsm(text):
+        yield _gsm_plan(text, NationalLanguage.DEFAULT, NationalLanguage.DEFAULT, splitter)
+
+    data = codec.ucs2_encode(text)
+    yield EncodingPlan(text, DataCoding.UCS2, 0, 0, len(data) // 2, splitter.count(data, DataCoding.UCS2))
+
+    lockings = [NationalLanguage.DEFAULT] + [lang for lang in languages if lang in codec.GSM_LOCKING_SHIFT]
+    singles = [NationalLanguage.DEFAULT] + [lang for lang in languages if lang in codec.GSM_SINGLE_SHIFT]
+    for locking in lockings:
+        for single in singles:
+            if (locking or single) and codec.is_gsm(text, locking, single):
+                yield _gsm_plan(text, locking, single, splitter)
+
+
+def _plan(text: str, languages: Sequence[int], splitter: MessageSplitter) -> EncodingPlan:
+    return min(_candidates(text, languages, splitter), key=lambda plan: (plan.segments, len(plan.udh)))
+
+
+def plan_encoding(text: str, languages: Sequence[int]=(), transliterate: bool=False,
+                  splitter: Optional[MessageSplitter]=None) -> EncodingPlan:
+    """
+    Pick the encoding which sends text in the fewest segments
+
+    Tries the default GSM alphabet, UCS-2 and GSM with every pairing of the given languages' locking and single
+    shift tables. Ties go to the smallest UDH, so shift tables are only used when they save a segment. With
+    transliterate set, lookalikes replace characters GSM lacks if that saves a segment. Segments are counted the way
+    splitter would split the message.
+    """
+    if splitter is None:
+        splitter = MessageSplitter()
+
+    result = _plan(text, languages, splitter)
+
+    if transliterate:
+        plain = text.translate(TRANSLITERATIONS)
+        if plain != text:
+            plan = _plan(plain, languages, splitter)
+            if plan.segments < result.segments:
+                result = plan
+
+    return result
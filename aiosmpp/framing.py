@@ -0,0 +1,127 @@
+import asyncio
+from typing import List
+
+from aiosmpp import pdu
+
+
+HEADER_LENGTH = 16
+# Largest PDU we are willing to buffer, a message_payload TLV can hold up to 64KiB
+# so leave a bit of room for the header and mandatory parameters
+DEFAULT_MAX_PDU_LENGTH = 65536 + 1024
+
+
+class FramingException(pdu.DecodeException):
+    pass
+
+
+class PDUFramer(object):
+    """
+    Incremental PDU framer for a byte stream
+
+    Bytes from each read are fed in and every complete PDU is returned as a memoryview
+    over an immutable bytes object, so nothing is copied when a read holds whole PDUs.
+    Only a trailing partial PDU is kept, which is bounded by max_pdu_length.
+    """
+    __slots__ = ('max_pdu_length', '_buffer')
+
+    def __init__(self, max_pdu_length: int=DEFAULT_MAX_PDU_LENGTH):
+        self.max_pdu_length = max_pdu_length
+        self._buffer = bytearray()
+
+    @property
+    def buffered(self) -> int:
+        return len(self._buffer)
+
+    def clear(self):
+        self._buffer.clear()
+
+    def feed(self, data: bytes) -> List[memoryview]:
+        """
+        Add data to the framer and return all complete PDUs
+
+        :raises FramingException: If a PDU has a command_length which is too small or too large
+        """
+        if self._buffer:
+            self._buffer += data
+            data = bytes(self._buffer)
+            self._buffer.clear()
+
+        view = memoryview(data)
+        data_len = len(view)
+        max_pdu_length = self.max_pdu_length
+        result = []
+
+        index = 0
+        while data_len - index >= 4:
+            command_length = pdu.decode_command_length(view, index)
+
+            if command_length < HEADER_LENGTH or command_length > max_pdu_length:
+                raise FramingException('Invalid command_length {0}'.format(command_length))
+
+            end = index + command_length
+            if end > data_len:
+                break
+
+            result.append(view[index:end])
+            index = end
+
+        if index < data_len:
+            self._buffer += view[index:]
+
+        return result
+
+
+class PDUWriter(object):
+    """
+    Coalesces outbound PDUs into one transport write per event loop iteration
+
+    PDUs written whilst handling a read (e.g. a resp for every PDU in it) are buffered and flushed together by a
+    call_soon callback, so a burst costs one send instead of one per PDU. Pass urgent=True to send straight away,
+    anything already buffered goes first so ordering is kept. Setting corked to False disables buffering.
+    """
+    __slots__ = ('transport', 'loop', 'corked', '_buffer', '_scheduled')
+
+    def __init__(self, transport: asyncio.WriteTransport, loop: asyncio.AbstractEventLoop, corked: bool=True):
+        self.transport = transport
+        self.loop = loop
+        self.corked = corked
+        self._buffer: List[bytes] = []
+        self._scheduled = False
+
+    @property
+    def buffered(self) -> int:
+        return sum(len(data) for data in self._buffer)
+
+    def write(self, data: bytes, urgent: bool=False):
+        if urgent or not self.corked:
+            if self._buffer:
+                self._buffer.append(data)
+                self.flush()
+            else:
+                self.transport.write(data)
+            return
+
+        self._buffer.append(data)
+        if not self._scheduled:
+            self._scheduled = True
+            self.loop.call_soon(self._flush_soon)
+
+    def _flush_soon(self):
+        self._scheduled = False
+        self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+
+        data = self._buffer[0] if len(self._buffer) == 1 else b''.join(self._buffer)
+        self._buffer.clear()
+        if not self.transport.is_closing():
+            self.transport.write(data)
+
+    def close(self):
+        """
+        Flush anything buffered then close the transport
+        """
+        self.flush()
+        self.transport.close()
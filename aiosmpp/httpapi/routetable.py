@@ -2,6 +2,10 @@ import json
 import re
 from typing import List, Union, Dict, Any
 
+from aiosmpp import log
+
+logger = log.get_logger('httpapi.routetable')
+
 
 # Event
 # {
@@ -147,7 +151,7 @@ class StaticRoute(Route):
             try:
                 result &= _filter.evaluate(event)
             except Exception as err:
-                print(err)
+                logger.warning('Filter %s failed: %s', _filter, err)
                 result = False
 
             # Short circuit
@@ -189,7 +193,7 @@ class RouteTable(object):
         if route_type in ('static', 'default'):
             return StaticRoute(route_index, route_data['connector'], needed_filters, connector_dict=self.connector_dict)
         else:
-            print('Unknown route type {0}'.format(route_type))
+            logger.warning('Unknown route type %s', route_type)
 
         return None
 
@@ -202,6 +206,6 @@ class RouteTable(object):
                 if route.evaluate(event):
                     return route.connector
             except Exception as err:
-                print(err)
+                logger.warning('Route %s failed: %s', route, err)
         else:
             return None
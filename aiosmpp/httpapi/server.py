@@ -1,26 +1,49 @@
 import asyncio
 import argparse
 import binascii
+import configparser
 import datetime
-import math
+import json
 import os
-import struct
 import sys
 import uuid
-from typing import Dict, Any, Optional, TYPE_CHECKING
+from typing import Dict, Any, Optional, Tuple, TYPE_CHECKING
 
 from aiohttp import web
+from aioamqp.channel import Channel as AMQPChannel
+from aioamqp.exceptions import AioamqpException
 
-from aiosmpp.utils import gsm_encode
+from aiosmpp import codec
 from aiosmpp.constants import AddrTON, AddrNPI, ESMClassMode, ESMClassType, PriorityFlag, RegisteredDeliveryReceipt, ReplaceIfPresentFlag, \
-    ESMClassGSMFeatures, MoreMessagesToSend
-from aiosmpp.config.httpapi import HTTPAPIConfig
+    ESMClassGSMFeatures, MoreMessagesToSend, DataCoding
+from aiosmpp.config.httpapi import HTTPAPIConfig, read_httpapi_config
+from aiosmpp.config.mq import read_mq_config
+from aiosmpp.encoding import plan_encoding
+from aiosmpp.pdu import TLVs, TLVTag
 from aiosmpp.httpapi.routetable import RouteTable
+from aiosmpp.smppmanager.amqp import AMQPConnection
 from aiosmpp.smppmanager.client import SMPPManagerClient
+from aiosmpp.smppmanager.lanes import lane_queue_name
+from aiosmpp.splitter import MessageSplitter, ReferenceAllocator
+from aiosmpp import log
 
 if TYPE_CHECKING:
     import multidict
 
+logger = log.get_logger('httpapi')
+
+# NDJSON sends are read in chunks, a line can't be longer than this
+NDJSON_MAX_LINE = 1024 * 1024
+
+
+class SendError(Exception):
+    """
+    A message which can't be sent, status is the HTTP status to report it with
+    """
+    def __init__(self, message: str, status: int=400):
+        super(SendError, self).__init__(message)
+        self.status = status
+
 
 class WebHandler(object):
     def __init__(self, config: Optional[HTTPAPIConfig]=None):
@@ -32,9 +55,19 @@ class WebHandler(object):
 
         self.route_table = RouteTable(config, connector_dict=self.smpp_manager_client.connectors)
 
-        self._last_long_msg_ref_num = 0
-        self._long_content_max_parts = 5
-        self._long_content_split = 'udh'  # Either sar or udh
+        self.httpapi_config = config.httpapi if config else read_httpapi_config(configparser.ConfigParser())
+
+        # Messages are published onto the connector queues which the SMPP manager consumes
+        self.amqp = AMQPConnection(config.mq if config else read_mq_config(configparser.ConfigParser()))
+        self.amqp.add_listener(self._amqp_state_trigger)
+        self._amqp_channel: Optional[AMQPChannel] = None
+        self._amqp_channel_lock = asyncio.Lock()
+
+        # Long messages are split into segments, or sent whole in message_payload, as long_content_split says
+        self.splitter = MessageSplitter(self.httpapi_config['long_content_split'],
+                                        self.httpapi_config['concat_reference_bits'],
+                                        self.httpapi_config['long_content_max_parts'])
+        self.references = ReferenceAllocator(self.httpapi_config['concat_reference_bits'])
 
         self._default_smpp_config = {
             'service_type': None,
@@ -58,14 +91,6 @@ class WebHandler(object):
             'locked': []
         }
 
-    @property
-    def next_long_msg_ref_num(self) -> int:
-        if self._last_long_msg_ref_num >= 255:
-            self._last_long_msg_ref_num = 0
-
-        self._last_long_msg_ref_num += 1
-        return self._last_long_msg_ref_num
-
     def app(self) -> web.Application:
         _app = web.Application()
 
@@ -86,6 +111,25 @@ class WebHandler(object):
             await self.smpp_manager_client.close()
         except:
             pass
+        self.amqp.close()
+
+    def _amqp_state_trigger(self, connected: bool):
+        if not connected:
+            self._amqp_channel = None
+
+    async def publish(self, queue_name: str, payload: Dict[str, Any]):
+        """
+        Publish a persistent message onto a connector queue
+
+        :raises aioamqp.AioamqpException: If MQ is unavailable
+        """
+        async with self._amqp_channel_lock:
+            if self._amqp_channel is None or not self._amqp_channel.is_open:
+                self._amqp_channel = await self.amqp.channel()
+            channel = self._amqp_channel
+
+        await channel.basic_publish(json.dumps(payload), exchange_name='', routing_key=queue_name,
+                                    properties={'delivery_mode': 2})
 
     def _set_config_params_in_pdu(self, pdu: Dict[str, Any]) -> Dict[str, Any]:
         modified_pdu = pdu.copy()
@@ -125,117 +169,63 @@ class WebHandler(object):
 
         return pdu
 
-    def create_submitsm_pdus(self, source_address, destination_address, short_message, data_coding) -> Dict[str, Any]:
+    def create_submitsm_pdus(self, source_address, destination_address, short_message, data_coding, udh: bytes=b'') -> Dict[str, Any]:
         """
         Create PDUs that are JSON compatible
         :param source_address:
         :param destination_address:
-        :param short_message:
+        :param short_message: Encoded message, GSM as unpacked septets
         :param data_coding:
+        :param udh: IEs every PDU's UDH should carry, e.g. national language shift tables
         :return:
+        :raises ValueError: If the message needs more segments than long_content_max_parts
         """
-
-        # Possible data_coding values : 0,1,2,3,4,5,6,7,8,9,10,13,14
-        # Set the max short message length depending on the
-        # coding (7, 8 or 16 bits)
-        if data_coding in [3, 6, 7, 10]:
-            # 8 bit coding
-            bits = 8
-            max_sm_length = 140
-            sliced_max_sm_length = max_sm_length - 6
-        elif data_coding in [2, 4, 5, 8, 9, 13, 14]:
-            # 16 bit coding
-            bits = 16
-            max_sm_length = 70
-            sliced_max_sm_length = max_sm_length - 3
-        else:
-            # 7 bit coding is the default
-            # for data_coding in [0, 1] or any other invalid value
-            bits = 7
-            max_sm_length = 160
-            sliced_max_sm_length = 153
-
-        long_msg = short_message
-        if bits == 16:
-            sm_length = len(short_message) // 2
-        else:
-            sm_length = len(short_message)
+        segments = self.splitter.split(short_message, data_coding, udh)
+        num_parts = len(segments)
+        if num_parts > 1:
+            msg_ref_num = self.references.next(destination_address)
 
         result = {
             'pdus': []
         }
 
-        if sm_length > max_sm_length:
-            # As the lengths of a message are shorter when its split
-            # - dont exceed the configured max parts
-            num_parts = min((
-                int(math.ceil(sm_length / sliced_max_sm_length)),
-                self._long_content_max_parts
-            ))
-
-            msg_ref_num = self.next_long_msg_ref_num
-            for i in range(0, num_parts):
-                sequence_number = i + 1
-
-                if bits == 16:
-                    short_message_segment = long_msg[sliced_max_sm_length * i * 2: sliced_max_sm_length * (i + 1) * 2]
-                else:
-                    short_message_segment = long_msg[sliced_max_sm_length * i: sliced_max_sm_length * (i + 1)]
-
-                current_pdu = {
-                    'source_addr': source_address,
-                    'destination_addr': destination_address,
-                    'data_coding': data_coding,
-                    'short_message': short_message_segment
-                }
-
-                current_pdu = self._set_config_params_in_pdu(current_pdu)
-
-                # Deal with splitting details
-                if self._long_content_split == 'sar':
-                    current_pdu['sar_total_segments'] = num_parts
-                    current_pdu['sar_segment_seqnum'] = sequence_number
-                    current_pdu['sar_msg_ref_num'] = msg_ref_num
-                elif self._long_content_split == 'udh':
-                    current_pdu['esm_class'] = (ESMClassMode.DEFAULT, ESMClassType.DEFAULT, (ESMClassGSMFeatures.UDHI_INDICATOR_SET))
-
-                    if sequence_number < num_parts:
-                        current_pdu['more_messages_to_send'] = MoreMessagesToSend.MORE_MESSAGES
-                    else:
-                        current_pdu['more_messages_to_send'] = MoreMessagesToSend.NO_MORE_MESSAGES
-
-                    # If we have a binary message, Null short_message and create short_message_hex
-                    # As python3 cares about bytes in a string, we need a binary message
-
-                    # If we had a UCS2 message, it will be bytes
-                    if isinstance(current_pdu['short_message'], bytes):
-                        current_pdu['short_message_hex'] = current_pdu['short_message']
-                    elif isinstance(current_pdu['short_message'], str):
-                        current_pdu['short_message_hex'] = current_pdu['short_message'].encode()
-                    current_pdu['short_message'] = None
-
-                    udh_header = struct.pack('>BBBBBB', 5, 0, 3, msg_ref_num, num_parts, sequence_number)
-                    current_pdu['short_message_hex'] = udh_header + current_pdu['short_message_hex']
-
-                    current_pdu['short_message_hex'] = binascii.hexlify(current_pdu['short_message_hex'])
-
-                result['pdus'].append(current_pdu)
-
-        else:
-            # Msg didnt need splitting
-
+        for sequence_number, segment in enumerate(segments, 1):
             current_pdu = {
                 'source_addr': source_address,
                 'destination_addr': destination_address,
                 'data_coding': data_coding,
-                'short_message': short_message
+                'short_message': None
             }
 
             current_pdu = self._set_config_params_in_pdu(current_pdu)
 
-            if isinstance(current_pdu['short_message'], bytes):
-                current_pdu['short_message_hex'] = binascii.hexlify(current_pdu['short_message'])
-                current_pdu['short_message'] = None
+            tlvs = {}
+            header = udh
+            if num_parts > 1 and self.splitter.mode == 'sar':
+                tlvs[TLVTag.SAR_MSG_REF_NUM] = msg_ref_num
+                tlvs[TLVTag.SAR_TOTAL_SEGMENTS] = num_parts
+                tlvs[TLVTag.SAR_SEGMENT_SEQNUM] = sequence_number
+            elif num_parts > 1:
+                header = self.splitter.concat_ie(msg_ref_num, num_parts, sequence_number) + udh
+
+                if sequence_number < num_parts:
+                    tlvs[TLVTag.MORE_MESSAGES_TO_SEND] = MoreMessagesToSend.MORE_MESSAGES
+                else:
+                    tlvs[TLVTag.MORE_MESSAGES_TO_SEND] = MoreMessagesToSend.NO_MORE_MESSAGES
+
+            if header:
+                current_pdu['esm_class'] = (ESMClassMode.DEFAULT, ESMClassType.DEFAULT, ESMClassGSMFeatures.UDHI_INDICATOR_SET)
+                segment = bytes((len(header),)) + header + segment
+
+            if self.splitter.mode == 'payload' and not self.splitter.fits(short_message, data_coding, udh):
+                # Send the whole message in a message_payload TLV instead of splitting it
+                tlvs[TLVTag.MESSAGE_PAYLOAD] = segment
+            else:
+                # Binary safe in JSON
+                current_pdu['short_message_hex'] = binascii.hexlify(segment).decode()
+
+            if tlvs:
+                current_pdu['tlvs'] = TLVs(tlvs).to_json()
 
             result['pdus'].append(current_pdu)
 
@@ -350,53 +340,151 @@ class WebHandler(object):
 
         return result
 
-    # Legacy send
-    async def handler_send(self, request: web.Request) -> web.Response:
-        request_id = str(uuid.uuid4())
+    @staticmethod
+    def parse_api_v1_message(data: Any) -> Dict[str, Any]:
+        """
+        Takes a message from a /api/v1/send body and will return a dict like parse_legacy_send_post_parameters
 
-        # Parse / Validate form data
-        try:
-            request_dict = self.parse_legacy_send_post_parameters(request.query)
-        except ValueError as err:
-            return web.Response(text='Error "{0}"'.format(err), status=400)
+        Required Fields:
+        * to - destination address
+
+        Optional Fields:
+        * from - originator - default none
+        * coding - 0 -> 14 - default 0
+        * priority - 0,1,2 or 3 - default 0
+        * sdt - scheduled delivery time - default none
+        * validity-period - integer - default none
+        * tags - list of integers - default none
+        * content - text
+        * hex-content - binary hex value
+        * dlr - object with url, level (1, 2 or 3) and method (GET or POST)
+        * ref - anything, echoed back in the message's result
+
+        Either `content` or `hex-content` is required, content wins if both are given.
+
+        :raises ValueError: If required parameters are invalid
+        """
+        if not isinstance(data, dict):
+            raise ValueError('message must be an object')
+
+        if not isinstance(data.get('to'), str) or not data['to']:
+            raise ValueError('to address missing from message')
+        if data.get('from') is not None and not isinstance(data['from'], str):
+            raise ValueError('from must be a string')
+
+        content = data.get('content')
+        hex_content = data.get('hex-content')
+        if not content and not hex_content:
+            raise ValueError('content or hex-content must be provided')
+        if content:
+            if not isinstance(content, str):
+                raise ValueError('content must be a string')
+            hex_content = None
+        elif not isinstance(hex_content, str):
+            raise ValueError('hex-content must be a string')
 
+        coding = data.get('coding', 0)
+        if not isinstance(coding, int) or not 0 <= coding <= 14:
+            raise ValueError('coding must be in the range 0-14')
+
+        priority = data.get('priority', 0)
+        if not isinstance(priority, int) or not 0 <= priority <= 3:
+            raise ValueError('priority must be in the range 0-3')
+
+        validity = data.get('validity-period')
+        if validity is not None and (not isinstance(validity, int) or validity < 0):
+            raise ValueError('validity-period must be a positive integer')
+
+        tags = data.get('tags') or []
+        if not isinstance(tags, list) or not all(isinstance(tag, int) for tag in tags):
+            raise ValueError('tags must be a list of integers')
+
+        dlr_data = {}
+        if data.get('dlr'):
+            dlr = data['dlr']
+            if not isinstance(dlr, dict) or not dlr.get('url'):
+                raise ValueError('dlr url missing')
+            if dlr.get('level') not in (1, 2, 3):
+                raise ValueError('dlr level not 1,2 or 3')
+            if dlr.get('method') not in ('GET', 'POST'):
+                raise ValueError('dlr method not GET or POST')
+
+            dlr_data = {
+                'url': dlr['url'],
+                'level': dlr['level'],
+                'method': dlr['method']
+            }
+
+        result = {
+            'to': data['to'],
+            'from': data.get('from'),
+            'coding': coding,
+            'priority': priority,
+            'sdt': data.get('sdt'),
+            'validity-period': validity,
+            'tags': tags,
+            'content': content,
+            'hex-content': hex_content,
+            'dlr': dlr_data
+        }
+
+        return result
+
+    def prepare_message(self, request_dict: Dict[str, Any], request_id: str) -> Tuple[str, Dict[str, Any]]:
+        """
+        Encode, split and route a parsed message
+
+        :return: The queue to publish to and the payload
+        :raises SendError: If the content can't be encoded, needs too many segments or there's no route
+        """
         # Convert MSG into PDUs and split+UDH if necessary, including all default pdu parameters
         # Add a `locked` field so that applying settings later can ignore some pdu fields
         # ---------------------------------------
 
-        if not request_dict['hex-content']:
-            if request_dict['coding'] == 0:
-                short_message = gsm_encode(request_dict['content'])
+        data_coding = request_dict['coding']
+        udh = b''
+        try:
+            if request_dict['hex-content']:
+                short_message = binascii.unhexlify(request_dict['hex-content'])
+            elif self.httpapi_config['auto_encoding'] and data_coding in (DataCoding.SMSC_DEFAULT, DataCoding.UCS2):
+                # Text codings are open to whichever encoding takes the fewest segments
+                plan = plan_encoding(request_dict['content'], self.httpapi_config['national_languages'],
+                                     self.httpapi_config['transliterate'], self.splitter)
+                logger.debug('Encoding plan %s', plan.to_dict())
+                short_message, data_coding, udh = plan.encode(), plan.data_coding, plan.udh
             else:
-                short_message = request_dict['content']
-
-        else:
-            short_message = binascii.unhexlify(request_dict['hex-content'])
-
-        pdu_event = self.create_submitsm_pdus(
-            source_address=request_dict['from'],
-            destination_address=request_dict['to'],
-            short_message=short_message,
-            data_coding=request_dict['coding']
-        )
+                short_message = codec.encode(request_dict['content'], data_coding)
+
+            pdu_event = self.create_submitsm_pdus(
+                source_address=request_dict['from'],
+                destination_address=request_dict['to'],
+                short_message=short_message,
+                data_coding=data_coding,
+                udh=udh
+            )
+        except ValueError as err:
+            raise SendError(str(err))
+        if request_dict['content']:
+            # Filters match the text rather than the encoded bytes
+            pdu_event['msg'] = request_dict['content']
         pdu_event['tags'] = request_dict['tags']
         pdu_event['dlr'] = request_dict['dlr']
         pdu_event['locked'] = []  # Stores the names of locked attributes so they dont get reset to defaults
 
-        print('Num PDUs to send {0}'.format(len(pdu_event['pdus'])))
+        logger.debug('Num PDUs to send %d', len(pdu_event['pdus']))
 
         # TODO Evaluate interceptor table
         # TODO Process active intercept
-        print()
 
         connector = self.route_table.evaluate(pdu_event)
         if connector is None:
-            return web.Response(body='Error "No route found"', status=412)
+            raise SendError('No route found', 412)
 
         # Re apply some connector level pdu parameters
         pdu_event = self._update_config_params_in_pdu(pdu_event, connector.config)
 
-        queue_name = connector.queue_name
+        # Each priority has its own queue so the SMPP manager can serve urgent traffic ahead of bulk
+        queue_name = lane_queue_name(connector.queue_name, request_dict['priority'])
         queue_payload = {
             'req_id': request_id,
             'connector': connector.to_dict(),
@@ -404,13 +492,152 @@ class WebHandler(object):
             'dlr': pdu_event['dlr']
         }
 
-        # TODO Push PDUs onto queue
-        print()
+        return queue_name, queue_payload
+
+    async def send_message(self, request_dict: Dict[str, Any]) -> Tuple[str, int]:
+        """
+        Route, split and enqueue a parsed message
+
+        :return: The request id and number of PDUs
+        :raises SendError: If the message can't be sent
+        """
+        request_id = str(uuid.uuid4())
+        queue_name, queue_payload = self.prepare_message(request_dict, request_id)
 
-        return web.Response(body='Success "{0}"'.format(request_id))
+        try:
+            await self.publish(queue_name, queue_payload)
+        except (AioamqpException, OSError) as err:
+            logger.error('Failed to publish %s to %s: %r', request_id, queue_name, err)
+            raise SendError('MQ unavailable', 503)
+
+        return request_id, len(queue_payload['pdus'])
+
+    # Legacy send
+    async def handler_send(self, request: web.Request) -> web.Response:
+        # Parse / Validate form data
+        try:
+            request_dict = self.parse_legacy_send_post_parameters(request.query)
+        except ValueError as err:
+            return web.Response(text='Error "{0}"'.format(err), status=400)
+
+        try:
+            request_id, _ = await self.send_message(request_dict)
+        except SendError as err:
+            return web.Response(text='Error "{0}"'.format(err), status=err.status)
+
+        return web.Response(text='Success "{0}"'.format(request_id))
+
+    async def _api_v1_send_one(self, index: int, data: Any, mq_down: bool=False) -> Dict[str, Any]:
+        """
+        Send one message from a /api/v1/send body, the result says whether it was queued and if not why
+        """
+        result = {'index': index}
+        if isinstance(data, dict) and data.get('ref') is not None:
+            result['ref'] = data['ref']
+
+        try:
+            request_dict = self.parse_api_v1_message(data)
+            if mq_down:
+                # Once a publish has failed the rest fail fast rather than each waiting on a reconnect
+                raise SendError('MQ unavailable', 503)
+            request_id, num_pdus = await self.send_message(request_dict)
+        except ValueError as err:
+            result.update({'status': 'error', 'code': 400, 'error': str(err)})
+        except SendError as err:
+            result.update({'status': 'error', 'code': err.status, 'error': str(err)})
+        else:
+            result.update({'status': 'queued', 'id': request_id, 'pdus': num_pdus})
+
+        return result
+
+    async def handler_api_v1_send(self, request: web.Request) -> web.StreamResponse:
+        """
+        Send many messages in one request
+
+        A JSON body is a list of messages, or an object with the list under "messages", and the response has a
+        result per message once all of them are queued. An application/x-ndjson body is one message per line,
+        each result line is streamed back as its message is queued so a campaign of any size can be sent in one
+        request without either end holding it all in memory.
+        """
+        if request.content_type == 'application/x-ndjson':
+            return await self._api_v1_send_ndjson(request)
+
+        try:
+            body = await request.json()
+        except ValueError as err:
+            return web.json_response({'error': 'Invalid JSON: {0}'.format(err)}, status=400)
+
+        messages = body.get('messages') if isinstance(body, dict) else body
+        if not isinstance(messages, list):
+            return web.json_response({'error': 'Expected a list of messages'}, status=400)
+        if len(messages) > self.httpapi_config['api_max_batch']:
+            return web.json_response({'error': 'At most {0} messages per request, use application/x-ndjson for more'.format(
+                self.httpapi_config['api_max_batch'])}, status=413)
+
+        results = []
+        mq_down = False
+        for index, data in enumerate(messages):
+            result = await self._api_v1_send_one(index, data, mq_down)
+            mq_down = mq_down or result.get('code') == 503
+            results.append(result)
+
+        queued = sum(1 for result in results if result['status'] == 'queued')
+        return web.json_response({'queued': queued, 'failed': len(results) - queued, 'results': results})
+
+    async def _api_v1_send_ndjson(self, request: web.Request) -> web.StreamResponse:
+        response = web.StreamResponse(headers={'Content-Type': 'application/x-ndjson'})
+        await response.prepare(request)
+
+        index = 0
+        mq_down = False
+        partial = b''
+        # Set once an over-long line has been reported, the rest of it is dropped up to its newline
+        discarding = False
+        async for chunk in request.content.iter_any():
+            if discarding:
+                newline = chunk.find(b'\n')
+                if newline == -1:
+                    continue
+                chunk = chunk[newline + 1:]
+                discarding = False
+
+            lines = (partial + chunk).split(b'\n')
+            partial = lines.pop()
+            if len(partial) > NDJSON_MAX_LINE:
+                lines.append(partial)
+                partial = b''
+                discarding = True
+
+            # One write per chunk read, results go back as soon as what the client has sent so far is queued
+            results = []
+            for line in lines:
+                if not line.strip():
+                    continue
+                result = await self._api_v1_send_line(index, line, mq_down)
+                mq_down = mq_down or result.get('code') == 503
+                results.append(json.dumps(result))
+                index += 1
+
+            if results:
+                await response.write('\n'.join(results).encode() + b'\n')
+
+        if partial.strip():
+            result = await self._api_v1_send_line(index, partial, mq_down)
+            await response.write(json.dumps(result).encode() + b'\n')
+
+        await response.write_eof()
+        return response
+
+    async def _api_v1_send_line(self, index: int, line: bytes, mq_down: bool) -> Dict[str, Any]:
+        if len(line) > NDJSON_MAX_LINE:
+            return {'index': index, 'status': 'error', 'code': 413, 'error': 'Line longer than {0} bytes'.format(NDJSON_MAX_LINE)}
+
+        try:
+            data = json.loads(line.decode())
+        except ValueError as err:
+            return {'index': index, 'status': 'error', 'code': 400, 'error': 'Invalid JSON: {0}'.format(err)}
 
-    async def handler_api_v1_send(self, request: web.Request) -> web.Response:
-        pass
+        return await self._api_v1_send_one(index, data, mq_down)
 
     async def handler_api_v1_status(self, request: web.Request) -> web.Response:
         return web.Response(text='OK', status=200)
@@ -424,19 +651,22 @@ def app(argv: list=None) -> web.Application:
     parser.add_argument('--config.dynamodb.table', help='DynamoDB config table')
     parser.add_argument('--config.dynamodb.region', help='DynamoDB region')
     parser.add_argument('--config.dynamodb.key', help='DynamoDB key identifying the config entry')
+    parser.add_argument('--log.level', default='INFO', help='Log level, e.g. DEBUG, INFO, WARNING')
+    parser.add_argument('--log.queue', action='store_true', help='Write logs from a background thread so logging never blocks the event loop')
 
     args = parser.parse_args(argv[1:])
+    log.setup_logging(log.get_log_level(getattr(args, 'log.level')), use_queue=getattr(args, 'log.queue'))
 
     config = None
     if getattr(args, 'config.file') and getattr(args, 'config.dynamodb.table'):
-        print('Cannot specify both dynamodb and file')
+        logger.error('Cannot specify both dynamodb and file')
         sys.exit(1)
     elif getattr(args, 'config.dynamodb.table'):
         raise NotImplementedError()
     elif getattr(args, 'config.file'):
         filepath = os.path.expanduser(getattr(args, 'config.file'))
         if not os.path.exists(filepath):
-            print('Path "{0}" does not exist, exiting'.format(filepath))
+            logger.error('Path "%s" does not exist, exiting', filepath)
             sys.exit(1)
 
         config = HTTPAPIConfig.from_file(filepath)
@@ -1,7 +1,71 @@
+import atexit
 import logging
+import logging.handlers
+import queue
+from typing import Optional
 
 
-def get_stdout_logger(name: str, level: int=logging.INFO) -> logging.Logger:
+LOG_FORMAT = '[%(asctime)23s - %(name)s - %(levelname)8s]  %(message)s'
+
+
+def _formatter() -> logging.Formatter:
+    formatter = logging.Formatter(LOG_FORMAT)
+    formatter.default_msec_format = '%s.%03d'
+    return formatter
+
+
+def _queue_handler(handler: logging.Handler) -> logging.Handler:
+    """
+    Wrap a handler so records are written from a background thread, the event loop only pays for a queue put
+    """
+    log_queue = queue.Queue(-1)
+    listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    return logging.handlers.QueueHandler(log_queue)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Get a logger in the aiosmpp tree, output is configured once with setup_logging
+
+    Log with %-style arguments, e.g. logger.debug('Data received: %r', data), so nothing is formatted unless the
+    level is enabled.
+    """
+    return logging.getLogger('aiosmpp.' + name)
+
+
+def setup_logging(level: int=logging.INFO, use_queue: bool=False) -> logging.Logger:
+    """
+    Send everything logged under aiosmpp to stderr, optionally through a non-blocking queue
+    """
+    logger = logging.getLogger('aiosmpp')
+    logger.setLevel(level)
+
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+
+    ch = logging.StreamHandler()
+    ch.setFormatter(_formatter())
+    logger.addHandler(_queue_handler(ch) if use_queue else ch)
+
+    logger.propagate = False
+
+    return logger
+
+
+def get_log_level(name: Optional[str], default: int=logging.INFO) -> int:
+    if not name:
+        return default
+
+    level = logging.getLevelName(name.upper())
+    if not isinstance(level, int):
+        return default
+    return level
+
+
+def get_stdout_logger(name: str, level: int=logging.INFO, use_queue: bool=False) -> logging.Logger:
     logger = logging.getLogger('aiosmpp.' + name)
     logger.setLevel(level)
 
@@ -9,10 +73,8 @@ def get_stdout_logger(name: str, level: int=logging.INFO) -> logging.Logger:
     ch.setLevel(level)
 
     # create formatter
-    formatter = logging.Formatter('[%(asctime)23s - %(name)s - %(levelname)8s]  %(message)s')
-    formatter.default_msec_format = '%s.%03d'
-    ch.setFormatter(formatter)
-    logger.addHandler(ch)
+    ch.setFormatter(_formatter())
+    logger.addHandler(_queue_handler(ch) if use_queue else ch)
 
     logger.propagate = False
 
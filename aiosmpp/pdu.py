@@ -1,6 +1,7 @@
-import struct
+import binascii
 import enum
-from typing import Union, Tuple, List, Dict, Any, Optional
+import struct
+from typing import Union, Tuple, List, Dict, Any, Optional, Callable, NamedTuple
 
 
 class DecodeException(Exception):
@@ -34,6 +35,7 @@ class CommandID(enum.IntEnum):
     ALERT_NOTIFICATION = 0x00000102
     DATA_SM = 0x00000103
     DATA_SM_RESP = 0x80000103
+    OUTBIND = 0x0000000B
 
 
 class Status(enum.IntEnum):
@@ -87,11 +89,6 @@ class Status(enum.IntEnum):
     ESME_RUNKNOWNERR = 0x000000FF
 
 
-TLV_MAP = {
-    0x0210: ('sc_interface_version', lambda value: ord(value))  # 5.3.2.25 - e.g. 0x34 -> 3.4
-}
-
-
 def octet_string(value: Optional[bytes], _max: int=0) -> bytes:
     if value is None:
         return b'\x00'
@@ -114,7 +111,7 @@ def read_octet_string(value: bytes, index: int=0, _max: int=0) -> Tuple[Union[by
         return None, index
 
     # index-1 then decodes string excluding the null byte
-    return value[start:index], index
+    return bytes(value[start:index]), index
 
 
 def c_octet_string(value: Optional[str], _max: int=0) -> bytes:
@@ -143,7 +140,7 @@ def read_c_octet_string(value: bytes, index: int=0, _max: int=0) -> Tuple[Union[
         return None, index
 
     # index-1 then decodes string excluding the null byte
-    return value[start:index-1].decode(), index
+    return bytes(value[start:index-1]).decode(), index
 
 
 def read_integer(value: bytes, index: int, octets: int) -> Tuple[int, int]:
@@ -152,11 +149,11 @@ def read_integer(value: bytes, index: int, octets: int) -> Tuple[int, int]:
     if octets == 1:
         result = value[index]
     if octets == 2:
-        result = struct.unpack_from('>H', value, index)
+        result = struct.unpack_from('>H', value, index)[0]
     if octets == 4:
-        result = struct.unpack_from('>I', value, index)
+        result = struct.unpack_from('>I', value, index)[0]
     if octets == 8:
-        result = struct.unpack_from('>Q', value, index)
+        result = struct.unpack_from('>Q', value, index)[0]
 
     return result, index + octets
 
@@ -164,23 +161,16 @@ def read_integer(value: bytes, index: int, octets: int) -> Tuple[int, int]:
 def read_tlv(payload: bytes, index: int=0) -> Tuple[int, bytes, int]:
     tag, length = struct.unpack_from('>HH', payload, index)
     index += 4
-    data = payload[index:index+length]
+    data = bytes(payload[index:index+length])
 
     return tag, data, index + length
 
 
-def read_tlvs(payload: bytes, index: int=0) -> Dict[int, Any]:
-    result = {}
-
-    payload_len = len(payload)
-    while index < payload_len:
-        tag, data, index = read_tlv(payload, index)
-        if tag in TLV_MAP:
-            # tag -> (name, formatter_func)
-            data = TLV_MAP[tag][1](data)
-        result[tag] = data
-
-    return result
+def read_tlvs(payload: bytes, index: int=0) -> 'TLVs':
+    """
+    Returns a lazy TLV container, nothing is parsed until a TLV is accessed
+    """
+    return TLVs.from_buffer(payload, index)
 
 
 def create_tlv(tag: int, payload: bytes, length: int=None) -> bytes:
@@ -190,6 +180,21 @@ def create_tlv(tag: int, payload: bytes, length: int=None) -> bytes:
     return struct.pack('>HH', tag, length) + payload
 
 
+def create_tlvs(tlvs: Union['TLVs', Dict[Union[int, str], Any], List[bytes], None]) -> bytes:
+    """
+    Encode TLVs, either a TLVs container, a dict of tag/name -> value or a list of already encoded TLVs
+    """
+    if not tlvs:
+        return b''
+
+    if isinstance(tlvs, TLVs):
+        return tlvs.encode()
+    if isinstance(tlvs, dict):
+        return TLVs(tlvs).encode()
+
+    return b''.join(tlvs)
+
+
 def integer(value: Optional[int], octets: int=1) -> bytes:
     if value is None:
         return b'\x00'
@@ -206,16 +211,31 @@ def integer(value: Optional[int], octets: int=1) -> bytes:
     raise AttributeError('octets not one of 1,2,4,8')
 
 
+HEADER = struct.Struct('>IIII')
+COMMAND_LENGTH = struct.Struct('>I')
+
+
 def create_header(_id: int, status: int, sequence_number: int, payload: Optional[bytes]=None) -> bytes:
     if payload is None:
         payload = b''
     packet_length = len(payload) + 16  # 4+4+4+4 for header size
 
-    return struct.pack('>IIII', packet_length, _id, status, sequence_number) + payload
+    return HEADER.pack(packet_length, _id, status, sequence_number) + payload
+
+
+def decode_command_length(payload: Union[bytes, memoryview], index: int=0) -> int:
+    return COMMAND_LENGTH.unpack_from(payload, index)[0]
 
 
-def decode_header(payload: bytes) -> Dict[str, Any]:
-    values = struct.unpack_from('>IIII', payload, 0)
+def peek_header(payload: Union[bytes, memoryview], index: int=0) -> Tuple[int, int, int, int]:
+    """
+    Unpack (command_length, command_id, command_status, sequence_number) without copying anything
+    """
+    return HEADER.unpack_from(payload, index)
+
+
+def decode_header(payload: Union[bytes, memoryview]) -> Dict[str, Any]:
+    values = HEADER.unpack_from(payload, 0)
 
     return {
         'length': values[0],
@@ -226,190 +246,1126 @@ def decode_header(payload: bytes) -> Dict[str, Any]:
     }
 
 
-# Enquire link
-def enquire_link(sequence_number: int) -> bytes:
-    return create_header(_id=CommandID.ENQUIRE_LINK,
-                         status=Status.ESME_ROK,  # Should be Null in Requsts, ROK == 0x00
-                         sequence_number=sequence_number)
 
 
-def enquire_link_resp(sequence_number: int) -> bytes:
-    return create_header(_id=CommandID.ENQUIRE_LINK_RESP,
-                         status=Status.ESME_ROK,
-                         sequence_number=sequence_number)
+# Parameter kinds, shared by the TLV registry and PDU schemas
+INTEGER = 'integer'
+C_OCTET_STRING = 'c_octet_string'
+OCTET_STRING = 'octet_string'
+DEST_ADDRESSES = 'dest_addresses'
+UNSUCCESS_SMES = 'unsuccess_smes'
+
+INTEGER_FORMATS = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
+TLV_HEADER = struct.Struct('>HH')
+
+
+# TLVs
+# ---------------------------------------
+class TLVTag(enum.IntEnum):
+    DEST_ADDR_SUBUNIT = 0x0005
+    DEST_NETWORK_TYPE = 0x0006
+    DEST_BEARER_TYPE = 0x0007
+    DEST_TELEMATICS_ID = 0x0008
+    SOURCE_ADDR_SUBUNIT = 0x000D
+    SOURCE_NETWORK_TYPE = 0x000E
+    SOURCE_BEARER_TYPE = 0x000F
+    SOURCE_TELEMATICS_ID = 0x0010
+    QOS_TIME_TO_LIVE = 0x0017
+    PAYLOAD_TYPE = 0x0019
+    ADDITIONAL_STATUS_INFO_TEXT = 0x001D
+    RECEIPTED_MESSAGE_ID = 0x001E
+    MS_MSG_WAIT_FACILITIES = 0x0030
+    PRIVACY_INDICATOR = 0x0201
+    SOURCE_SUBADDRESS = 0x0202
+    DEST_SUBADDRESS = 0x0203
+    USER_MESSAGE_REFERENCE = 0x0204
+    USER_RESPONSE_CODE = 0x0205
+    SOURCE_PORT = 0x020A
+    DESTINATION_PORT = 0x020B
+    SAR_MSG_REF_NUM = 0x020C
+    LANGUAGE_INDICATOR = 0x020D
+    SAR_TOTAL_SEGMENTS = 0x020E
+    SAR_SEGMENT_SEQNUM = 0x020F
+    SC_INTERFACE_VERSION = 0x0210
+    CALLBACK_NUM_PRES_IND = 0x0302
+    CALLBACK_NUM_ATAG = 0x0303
+    NUMBER_OF_MESSAGES = 0x0304
+    CALLBACK_NUM = 0x0381
+    DPF_RESULT = 0x0420
+    SET_DPF = 0x0421
+    MS_AVAILABILITY_STATUS = 0x0422
+    NETWORK_ERROR_CODE = 0x0423
+    MESSAGE_PAYLOAD = 0x0424
+    DELIVERY_FAILURE_REASON = 0x0425
+    MORE_MESSAGES_TO_SEND = 0x0426
+    MESSAGE_STATE = 0x0427
+    USSD_SERVICE_OP = 0x0501
+    DISPLAY_TIME = 0x1201
+    SMS_SIGNAL = 0x1203
+    MS_VALIDITY = 0x1204
+    ALERT_ON_MESSAGE_DELIVERY = 0x130C
+    ITS_REPLY_TYPE = 0x1380
+    ITS_SESSION_INFO = 0x1383
+
+
+class TLVDef(NamedTuple):
+    tag: int
+    name: str
+    kind: str
+    decoder: Callable[[bytes, int, int], Any]  # (buffer, start, end) -> value
+    encoder: Callable[[Any], bytes]
+
+
+_INTEGER_STRUCTS = {size: struct.Struct('>' + fmt) for size, fmt in INTEGER_FORMATS.items()}
+
+
+def _integer_tlv(size: int) -> Tuple[Callable[[bytes, int, int], int], Callable[[int], bytes]]:
+    _struct = _INTEGER_STRUCTS[size]
+
+    def decoder(buffer: bytes, start: int, end: int) -> int:
+        if end - start != size:
+            raise DecodeException('Invalid TLV length {0}, expected {1}'.format(end - start, size))
+        return _struct.unpack_from(buffer, start)[0]
+
+    return decoder, _struct.pack
+
+
+def _decode_c_octet_string_tlv(buffer: bytes, start: int, end: int) -> str:
+    return buffer[start:end].rstrip(b'\x00').decode()
+
+
+def _encode_c_octet_string_tlv(value: str) -> bytes:
+    return value.encode() + b'\x00'
 
 
-# Bind TRX
-def bind_trx(sequence_number: int,
-             system_id: str,
-             password: str,
-             system_type: Optional[str]=None,
-             interface_version: int=0x34,
-             addr_ton: Optional[int]=None,
-             addr_npi: Optional[int]=None,
-             address_range: Optional[str]=None) -> bytes:
-
-    buffer = c_octet_string(system_id, _max=16)
-    buffer += c_octet_string(password, _max=9)
-    buffer += c_octet_string(system_type, _max=16)
-    buffer += integer(interface_version, octets=1)
-    buffer += integer(addr_ton, octets=1)
-    buffer += integer(addr_npi, octets=1)
-    buffer += c_octet_string(address_range, _max=41)
-
-    return create_header(_id=CommandID.BIND_TRANSCEIVER,
-                         status=Status.ESME_ROK,  # Should be Null in Requsts, ROK == 0x00
-                         sequence_number=sequence_number,
-                         payload=buffer)
-
-
-def decode_bind_trx(payload: bytes, index: int=0) -> Dict[str, Any]:
-    system_id, index = read_c_octet_string(payload, index, _max=16)
-    password, index = read_c_octet_string(payload, index, _max=9)
-    system_type, index = read_c_octet_string(payload, index, _max=16)
-    interface_version, index = read_integer(payload, index, octets=1)
-    addr_ton, index = read_integer(payload, index, octets=1)
-    addr_npi, index = read_integer(payload, index, octets=1)
-    address_range, index = read_c_octet_string(payload, index, _max=41)
+def _decode_octet_string_tlv(buffer: bytes, start: int, end: int) -> bytes:
+    return buffer[start:end]
 
-    return {
-        'system_id': system_id,
-        'password': password,
-        'system_type': system_type,
-        'interface_version': interface_version,
-        'addr_ton': addr_ton,
-        'addr_npi': addr_npi,
-        'address_range': address_range
-    }
 
+def _encode_octet_string_tlv(value: Union[bytes, str]) -> bytes:
+    if isinstance(value, str):
+        return value.encode()
+    return bytes(value)
 
-def bind_trx_resp(sequence_number: int,
-                  system_id: str,
-                  interface_version: int=0x34) -> bytes:
 
-    buffer = c_octet_string(system_id, _max=16)
-    buffer += create_tlv(tag=0x0210, payload=bytes([interface_version]))
+_NETWORK_ERROR_CODE = struct.Struct('>BH')
 
-    return create_header(_id=CommandID.BIND_TRANSCEIVER_RESP,
-                         status=Status.ESME_ROK,
-                         sequence_number=sequence_number,
-                         payload=buffer)
 
+def _decode_network_error_code(buffer: bytes, start: int, end: int) -> Tuple[int, int]:
+    # (network type, error code) 5.3.2.31
+    if end - start != 3:
+        raise DecodeException('Invalid network_error_code length {0}'.format(end - start))
+    return _NETWORK_ERROR_CODE.unpack_from(buffer, start)
 
-def decode_bind_trx_resp(payload: bytes, index: int=0) -> Dict[str, Any]:
-    system_id, index = read_c_octet_string(payload, index, _max=16)
-    tlvs = read_tlvs(payload, index)
 
-    return {
-        'system_id': system_id,
-        'tlvs': tlvs
-    }
+def _encode_network_error_code(value: Tuple[int, int]) -> bytes:
+    return _NETWORK_ERROR_CODE.pack(*value)
 
 
-# Submit SM
-def decode_submit_sm(payload: bytes, index: int=0) -> Dict[str, Any]:
-    service_type, index = read_c_octet_string(payload, index, _max=6)
-    source_addr_ton, index = read_integer(payload, index, octets=1)
-    source_addr_npi, index = read_integer(payload, index, octets=1)
-    source_addr, index = read_c_octet_string(payload, index, _max=21)
-    dest_addr_ton, index = read_integer(payload, index, octets=1)
-    dest_addr_npi, index = read_integer(payload, index, octets=1)
-    dest_addr, index = read_c_octet_string(payload, index, _max=21)
-    esm_class, index = read_integer(payload, index, octets=1)
-    protocol_id, index = read_integer(payload, index, octets=1)
-    priority_flag, index = read_integer(payload, index, octets=1)
-    schedule_delivery_time, index = read_c_octet_string(payload, index, _max=17)
-    validity_period, index = read_c_octet_string(payload, index, _max=17)
-    registered_delivery, index = read_integer(payload, index, octets=1)
-    replace_if_present_flag, index = read_integer(payload, index, octets=1)
-    data_coding, index = read_integer(payload, index, octets=1)
-    sm_default_msg_id, index = read_integer(payload, index, octets=1)
-    sm_length, index = read_integer(payload, index, octets=1)
-    short_message, index = read_octet_string(payload, index, _max=254)
-
-    tlvs = read_tlvs(payload, index)
+def _tlv(tag: TLVTag, kind: str, size: int=1) -> TLVDef:
+    if kind == INTEGER:
+        decoder, encoder = _integer_tlv(size)
+    elif kind == C_OCTET_STRING:
+        decoder, encoder = _decode_c_octet_string_tlv, _encode_c_octet_string_tlv
+    else:
+        decoder, encoder = _decode_octet_string_tlv, _encode_octet_string_tlv
+
+    return TLVDef(tag, tag.name.lower(), kind, decoder, encoder)
+
+
+TLV_REGISTRY: Dict[int, TLVDef] = {tlv_def.tag: tlv_def for tlv_def in (
+    _tlv(TLVTag.DEST_ADDR_SUBUNIT, INTEGER),
+    _tlv(TLVTag.DEST_NETWORK_TYPE, INTEGER),
+    _tlv(TLVTag.DEST_BEARER_TYPE, INTEGER),
+    _tlv(TLVTag.DEST_TELEMATICS_ID, INTEGER, 2),
+    _tlv(TLVTag.SOURCE_ADDR_SUBUNIT, INTEGER),
+    _tlv(TLVTag.SOURCE_NETWORK_TYPE, INTEGER),
+    _tlv(TLVTag.SOURCE_BEARER_TYPE, INTEGER),
+    _tlv(TLVTag.SOURCE_TELEMATICS_ID, INTEGER),
+    _tlv(TLVTag.QOS_TIME_TO_LIVE, INTEGER, 4),
+    _tlv(TLVTag.PAYLOAD_TYPE, INTEGER),
+    _tlv(TLVTag.ADDITIONAL_STATUS_INFO_TEXT, C_OCTET_STRING),
+    _tlv(TLVTag.RECEIPTED_MESSAGE_ID, C_OCTET_STRING),
+    _tlv(TLVTag.MS_MSG_WAIT_FACILITIES, INTEGER),
+    _tlv(TLVTag.PRIVACY_INDICATOR, INTEGER),
+    _tlv(TLVTag.SOURCE_SUBADDRESS, OCTET_STRING),
+    _tlv(TLVTag.DEST_SUBADDRESS, OCTET_STRING),
+    _tlv(TLVTag.USER_MESSAGE_REFERENCE, INTEGER, 2),
+    _tlv(TLVTag.USER_RESPONSE_CODE, INTEGER),
+    _tlv(TLVTag.SOURCE_PORT, INTEGER, 2),
+    _tlv(TLVTag.DESTINATION_PORT, INTEGER, 2),
+    _tlv(TLVTag.SAR_MSG_REF_NUM, INTEGER, 2),
+    _tlv(TLVTag.LANGUAGE_INDICATOR, INTEGER),
+    _tlv(TLVTag.SAR_TOTAL_SEGMENTS, INTEGER),
+    _tlv(TLVTag.SAR_SEGMENT_SEQNUM, INTEGER),
+    _tlv(TLVTag.SC_INTERFACE_VERSION, INTEGER),  # 5.3.2.25 - e.g. 0x34 -> 3.4
+    _tlv(TLVTag.CALLBACK_NUM_PRES_IND, INTEGER),
+    _tlv(TLVTag.CALLBACK_NUM_ATAG, OCTET_STRING),
+    _tlv(TLVTag.NUMBER_OF_MESSAGES, INTEGER),
+    _tlv(TLVTag.CALLBACK_NUM, OCTET_STRING),
+    _tlv(TLVTag.DPF_RESULT, INTEGER),
+    _tlv(TLVTag.SET_DPF, INTEGER),
+    _tlv(TLVTag.MS_AVAILABILITY_STATUS, INTEGER),
+    TLVDef(TLVTag.NETWORK_ERROR_CODE, 'network_error_code', OCTET_STRING, _decode_network_error_code, _encode_network_error_code),
+    _tlv(TLVTag.MESSAGE_PAYLOAD, OCTET_STRING),
+    _tlv(TLVTag.DELIVERY_FAILURE_REASON, INTEGER),
+    _tlv(TLVTag.MORE_MESSAGES_TO_SEND, INTEGER),
+    _tlv(TLVTag.MESSAGE_STATE, INTEGER),
+    _tlv(TLVTag.USSD_SERVICE_OP, INTEGER),
+    _tlv(TLVTag.DISPLAY_TIME, INTEGER),
+    _tlv(TLVTag.SMS_SIGNAL, INTEGER, 2),
+    _tlv(TLVTag.MS_VALIDITY, INTEGER),
+    TLVDef(TLVTag.ALERT_ON_MESSAGE_DELIVERY, 'alert_on_message_delivery', OCTET_STRING, lambda buffer, start, end: True, lambda value: b''),
+    _tlv(TLVTag.ITS_REPLY_TYPE, INTEGER),
+    _tlv(TLVTag.ITS_SESSION_INFO, OCTET_STRING),
+)}
+TLV_NAMES: Dict[str, int] = {tlv_def.name: tlv_def.tag for tlv_def in TLV_REGISTRY.values()}
+
+# Kept for compatibility, tag -> (name, decoder_func, encoder_func)
+TLV_MAP = {tag: (tlv_def.name, tlv_def.decoder, tlv_def.encoder) for tag, tlv_def in TLV_REGISTRY.items()}
+
+
+def tlv_tag(key: Union[int, str]) -> int:
+    if isinstance(key, str):
+        try:
+            return TLV_NAMES[key]
+        except KeyError:
+            raise KeyError(key)
+    return key
+
+
+class TLVs(object):
+    """
+    Lazy TLV container
+
+    When created from a PDU buffer only the buffer and start offset are kept, the TLV headers are scanned on
+    first access and each value is decoded with its registered decoder the first time it is read. Unknown tags
+    are returned as raw bytes. Keys can be tags or registry names, iteration yields tags.
+    """
+    __slots__ = ('_buffer', '_start', '_offsets', '_values')
+
+    def __init__(self, values: Optional[Dict[Union[int, str], Any]]=None):
+        self._buffer = b''
+        self._start = 0
+        self._offsets = {}  # tag -> (value start, value end)
+        self._values = {}  # tag -> decoded or set value
+
+        if values:
+            for key, value in values.items():
+                self[key] = value
+
+    @classmethod
+    def from_buffer(cls, buffer: bytes, index: int=0) -> 'TLVs':
+        obj = cls.__new__(cls)
+        obj._buffer = buffer
+        obj._start = index
+        obj._offsets = None
+        obj._values = {}
+
+        return obj
+
+    def _scan(self) -> Dict[int, Tuple[int, int]]:
+        offsets = {}
+        buffer = self._buffer
+        buffer_len = len(buffer)
+        index = self._start
+
+        while index < buffer_len:
+            try:
+                tag, length = TLV_HEADER.unpack_from(buffer, index)
+            except struct.error:
+                raise DecodeException('Truncated TLV header at {0}'.format(index))
+            index += 4
+            if index + length > buffer_len:
+                raise DecodeException('TLV 0x{0:04x} length {1} exceeds PDU'.format(tag, length))
+            offsets[tag] = (index, index + length)
+            index += length
+
+        self._offsets = offsets
+        return offsets
+
+    def _tags(self) -> List[int]:
+        offsets = self._offsets if self._offsets is not None else self._scan()
+        return list(dict.fromkeys(list(offsets) + list(self._values)))
+
+    def __getitem__(self, key: Union[int, str]) -> Any:
+        tag = tlv_tag(key)
+        try:
+            return self._values[tag]
+        except KeyError:
+            pass
+
+        offsets = self._offsets if self._offsets is not None else self._scan()
+        start, end = offsets[tag]
+
+        tlv_def = TLV_REGISTRY.get(tag)
+        if tlv_def:
+            value = tlv_def.decoder(self._buffer, start, end)
+        else:
+            value = self._buffer[start:end]
+        self._values[tag] = value
+
+        return value
+
+    def __setitem__(self, key: Union[int, str], value: Any):
+        tag = tlv_tag(key)
+        if self._offsets is None:
+            self._scan()
+        self._offsets.pop(tag, None)
+        self._values[tag] = value
+
+    def __delitem__(self, key: Union[int, str]):
+        tag = tlv_tag(key)
+        if self._offsets is None:
+            self._scan()
+        found = self._offsets.pop(tag, None) is not None
+        found |= self._values.pop(tag, None) is not None
+        if not found:
+            raise KeyError(key)
+
+    def __contains__(self, key: Union[int, str]) -> bool:
+        try:
+            tag = tlv_tag(key)
+        except KeyError:
+            return False
+        if tag in self._values:
+            return True
+        offsets = self._offsets if self._offsets is not None else self._scan()
+        return tag in offsets
+
+    def __iter__(self):
+        return iter(self._tags())
+
+    def __len__(self) -> int:
+        return len(self._tags())
+
+    def __bool__(self) -> bool:
+        # Cheap check that avoids scanning the buffer
+        return bool(self._values) or (len(self._buffer) > self._start and self._offsets is None) or bool(self._offsets)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, TLVs):
+            other = other.to_dict()
+        return isinstance(other, dict) and self.to_dict() == {tlv_tag(key): value for key, value in other.items()}
+
+    def __repr__(self) -> str:
+        return 'TLVs({0!r})'.format(self.to_dict(names=True))
+
+    def get(self, key: Union[int, str], default: Any=None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self) -> List[int]:
+        return self._tags()
+
+    def items(self) -> List[Tuple[int, Any]]:
+        return [(tag, self[tag]) for tag in self._tags()]
+
+    def to_dict(self, names: bool=False) -> Dict[Union[int, str], Any]:
+        result = {}
+        for tag in self._tags():
+            key = tag
+            if names and tag in TLV_REGISTRY:
+                key = TLV_REGISTRY[tag].name
+            result[key] = self[tag]
+
+        return result
+
+    def encode(self) -> bytes:
+        # Untouched TLVs from a decoded PDU can be copied straight from the buffer
+        if not self._values and self._offsets is None:
+            return self._buffer[self._start:]
+
+        if self._offsets is None:
+            self._scan()
+
+        buffer = b''
+        for tag in self._tags():
+            if tag in self._values:
+                value = self._values[tag]
+                tlv_def = TLV_REGISTRY.get(tag)
+                if tlv_def and not isinstance(value, bytes):
+                    value = tlv_def.encoder(value)
+                elif not isinstance(value, bytes):
+                    raise TypeError('TLV 0x{0:04x} is not registered, value must be bytes'.format(tag))
+            else:
+                start, end = self._offsets[tag]
+                value = self._buffer[start:end]
+            buffer += TLV_HEADER.pack(tag, len(value)) + value
+
+        return buffer
+
+    def to_json(self) -> Dict[str, Any]:
+        """
+        JSON compatible dict of name -> value, octet string values are hex encoded
+        """
+        result = {}
+        for tag in self._tags():
+            tlv_def = TLV_REGISTRY.get(tag)
+            value = self[tag]
+            if tlv_def is None:
+                result['0x{0:04x}'.format(tag)] = binascii.hexlify(value).decode()
+            elif tlv_def.kind == OCTET_STRING and isinstance(value, bytes):
+                result[tlv_def.name] = binascii.hexlify(value).decode()
+            else:
+                result[tlv_def.name] = value
+
+        return result
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> 'TLVs':
+        obj = cls()
+        for key, value in data.items():
+            if key.startswith('0x'):
+                obj[int(key, 16)] = binascii.unhexlify(value)
+                continue
+
+            tag = tlv_tag(key)
+            if TLV_REGISTRY[tag].kind == OCTET_STRING and isinstance(value, str):
+                value = binascii.unhexlify(value)
+            elif isinstance(value, list):
+                value = tuple(value)
+            obj[tag] = value
+
+        return obj
+
+
+# PDU schemas
+# ---------------------------------------
+# Each command is described by its mandatory parameters in wire order. The schemas are compiled
+# once at import time into an encoder and decoder per command, consecutive integers are handled by
+# a single precomputed struct and c-octet strings are scanned with bytes.find.
+class Field(NamedTuple):
+    name: str
+    kind: str = INTEGER
+    size: int = 1  # Octets for integers, max length (including NULL) for strings
+    length_field: Optional[str] = None  # Field holding the length/count of an octet string or list
+    default: Any = None
+
+
+_BIND_FIELDS = (
+    Field('system_id', C_OCTET_STRING, 16),
+    Field('password', C_OCTET_STRING, 9),
+    Field('system_type', C_OCTET_STRING, 13),
+    Field('interface_version', default=0x34),
+    Field('addr_ton', default=0),
+    Field('addr_npi', default=0),
+    Field('address_range', C_OCTET_STRING, 41),
+)
+_BIND_RESP_FIELDS = (
+    Field('system_id', C_OCTET_STRING, 16),
+)
+_SM_FIELDS = (
+    Field('service_type', C_OCTET_STRING, 6),
+    Field('source_addr_ton', default=0),
+    Field('source_addr_npi', default=0),
+    Field('source_addr', C_OCTET_STRING, 21),
+    Field('dest_addr_ton', default=0),
+    Field('dest_addr_npi', default=0),
+    Field('dest_addr', C_OCTET_STRING, 21),
+    Field('esm_class', default=0),
+    Field('protocol_id', default=0),
+    Field('priority_flag', default=0),
+    Field('schedule_delivery_time', C_OCTET_STRING, 17),
+    Field('validity_period', C_OCTET_STRING, 17),
+    Field('registered_delivery', default=0),
+    Field('replace_if_present_flag', default=0),
+    Field('data_coding', default=0),
+    Field('sm_default_msg_id', default=0),
+    Field('sm_length', default=0),
+    Field('short_message', OCTET_STRING, 254, 'sm_length'),
+)
+_MESSAGE_ID_FIELDS = (
+    Field('message_id', C_OCTET_STRING, 65),
+)
+
+SCHEMAS: Dict[CommandID, Tuple[Field, ...]] = {
+    CommandID.GENERIC_NACK: (),
+    CommandID.BIND_RECEIVER: _BIND_FIELDS,
+    CommandID.BIND_RECEIVER_RESP: _BIND_RESP_FIELDS,
+    CommandID.BIND_TRANSMITTER: _BIND_FIELDS,
+    CommandID.BIND_TRANSMITTER_RESP: _BIND_RESP_FIELDS,
+    CommandID.QUERY_SM: (
+        Field('message_id', C_OCTET_STRING, 65),
+        Field('source_addr_ton', default=0),
+        Field('source_addr_npi', default=0),
+        Field('source_addr', C_OCTET_STRING, 21),
+    ),
+    CommandID.QUERY_SM_RESP: (
+        Field('message_id', C_OCTET_STRING, 65),
+        Field('final_date', C_OCTET_STRING, 17),
+        Field('message_state', default=0),
+        Field('error_code', default=0),
+    ),
+    CommandID.SUBMIT_SM: _SM_FIELDS,
+    CommandID.SUBMIT_SM_RESP: _MESSAGE_ID_FIELDS,
+    CommandID.DELIVER_SM: _SM_FIELDS,
+    CommandID.DELIVER_SM_RESP: _MESSAGE_ID_FIELDS,
+    CommandID.UNBIND: (),
+    CommandID.UNBIND_RESP: (),
+    CommandID.REPLACE_SM: (
+        Field('message_id', C_OCTET_STRING, 65),
+        Field('source_addr_ton', default=0),
+        Field('source_addr_npi', default=0),
+        Field('source_addr', C_OCTET_STRING, 21),
+        Field('schedule_delivery_time', C_OCTET_STRING, 17),
+        Field('validity_period', C_OCTET_STRING, 17),
+        Field('registered_delivery', default=0),
+        Field('sm_default_msg_id', default=0),
+        Field('sm_length', default=0),
+        Field('short_message', OCTET_STRING, 254, 'sm_length'),
+    ),
+    CommandID.REPLACE_SM_RESP: (),
+    CommandID.CANCEL_SM: (
+        Field('service_type', C_OCTET_STRING, 6),
+        Field('message_id', C_OCTET_STRING, 65),
+        Field('source_addr_ton', default=0),
+        Field('source_addr_npi', default=0),
+        Field('source_addr', C_OCTET_STRING, 21),
+        Field('dest_addr_ton', default=0),
+        Field('dest_addr_npi', default=0),
+        Field('dest_addr', C_OCTET_STRING, 21),
+    ),
+    CommandID.CANCEL_SM_RESP: (),
+    CommandID.BIND_TRANSCEIVER: _BIND_FIELDS,
+    CommandID.BIND_TRANSCEIVER_RESP: _BIND_RESP_FIELDS,
+    CommandID.ENQUIRE_LINK: (),
+    CommandID.ENQUIRE_LINK_RESP: (),
+    CommandID.SUBMIT_MULTI: (
+        Field('service_type', C_OCTET_STRING, 6),
+        Field('source_addr_ton', default=0),
+        Field('source_addr_npi', default=0),
+        Field('source_addr', C_OCTET_STRING, 21),
+        Field('number_of_dests', default=0),
+        Field('dest_addresses', DEST_ADDRESSES, 255, 'number_of_dests'),
+        Field('esm_class', default=0),
+        Field('protocol_id', default=0),
+        Field('priority_flag', default=0),
+        Field('schedule_delivery_time', C_OCTET_STRING, 17),
+        Field('validity_period', C_OCTET_STRING, 17),
+        Field('registered_delivery', default=0),
+        Field('replace_if_present_flag', default=0),
+        Field('data_coding', default=0),
+        Field('sm_default_msg_id', default=0),
+        Field('sm_length', default=0),
+        Field('short_message', OCTET_STRING, 254, 'sm_length'),
+    ),
+    CommandID.SUBMIT_MULTI_RESP: (
+        Field('message_id', C_OCTET_STRING, 65),
+        Field('no_unsuccess', default=0),
+        Field('unsuccess_smes', UNSUCCESS_SMES, 255, 'no_unsuccess'),
+    ),
+    CommandID.ALERT_NOTIFICATION: (
+        Field('source_addr_ton', default=0),
+        Field('source_addr_npi', default=0),
+        Field('source_addr', C_OCTET_STRING, 65),
+        Field('esme_addr_ton', default=0),
+        Field('esme_addr_npi', default=0),
+        Field('esme_addr', C_OCTET_STRING, 65),
+    ),
+    CommandID.DATA_SM: (
+        Field('service_type', C_OCTET_STRING, 6),
+        Field('source_addr_ton', default=0),
+        Field('source_addr_npi', default=0),
+        Field('source_addr', C_OCTET_STRING, 65),
+        Field('dest_addr_ton', default=0),
+        Field('dest_addr_npi', default=0),
+        Field('dest_addr', C_OCTET_STRING, 65),
+        Field('esm_class', default=0),
+        Field('registered_delivery', default=0),
+        Field('data_coding', default=0),
+    ),
+    CommandID.DATA_SM_RESP: _MESSAGE_ID_FIELDS,
+    CommandID.OUTBIND: (
+        Field('system_id', C_OCTET_STRING, 16),
+        Field('password', C_OCTET_STRING, 9),
+    ),
+}
 
-    return {
-        'service_type': service_type,
-        'source_addr_ton': source_addr_ton,
-        'source_addr_npi': source_addr_npi,
-        'source_addr': source_addr,
-        'dest_addr_ton': dest_addr_ton,
-        'dest_addr_npi': dest_addr_npi,
-        'dest_addr': dest_addr,
-        'esm_class': esm_class,
-        'protocol_id': protocol_id,
-        'priority_flag': priority_flag,
-        'schedule_delivery_time': schedule_delivery_time,
-        'validity_period': validity_period,
-        'registered_delivery': registered_delivery,
-        'replace_if_present_flag': replace_if_present_flag,
-        'data_coding': data_coding,
-        'sm_default_msg_id': sm_default_msg_id,
-        'sm_length': sm_length,
-        'short_message': short_message,
-        'tlvs': tlvs
+
+# submit_multi list fields, these are rare so are not compiled
+def _encode_dest_addresses(dest_addresses: List[Dict[str, Any]]) -> bytes:
+    buffer = b''
+    for dest_address in dest_addresses:
+        if dest_address.get('dl_name') is not None:
+            buffer += integer(0x02, octets=1)
+            buffer += c_octet_string(dest_address['dl_name'], _max=21)
+        else:
+            buffer += integer(0x01, octets=1)
+            buffer += integer(dest_address.get('dest_addr_ton', 0), octets=1)
+            buffer += integer(dest_address.get('dest_addr_npi', 0), octets=1)
+            buffer += c_octet_string(dest_address.get('dest_addr'), _max=21)
+
+    return buffer
+
+
+def _decode_dest_addresses(payload: bytes, index: int, count: int) -> Tuple[List[Dict[str, Any]], int]:
+    result = []
+    for _ in range(count):
+        dest_flag, index = read_integer(payload, index, octets=1)
+        if dest_flag == 0x02:
+            dl_name, index = read_c_octet_string(payload, index, _max=21)
+            result.append({'dest_flag': dest_flag, 'dl_name': dl_name})
+        elif dest_flag == 0x01:
+            dest_addr_ton, index = read_integer(payload, index, octets=1)
+            dest_addr_npi, index = read_integer(payload, index, octets=1)
+            dest_addr, index = read_c_octet_string(payload, index, _max=21)
+            result.append({'dest_flag': dest_flag, 'dest_addr_ton': dest_addr_ton, 'dest_addr_npi': dest_addr_npi, 'dest_addr': dest_addr})
+        else:
+            raise DecodeException('Invalid dest_flag {0}'.format(dest_flag))
+
+    return result, index
+
+
+def _encode_unsuccess_smes(unsuccess_smes: List[Dict[str, Any]]) -> bytes:
+    buffer = b''
+    for unsuccess_sme in unsuccess_smes:
+        buffer += integer(unsuccess_sme.get('dest_addr_ton', 0), octets=1)
+        buffer += integer(unsuccess_sme.get('dest_addr_npi', 0), octets=1)
+        buffer += c_octet_string(unsuccess_sme.get('dest_addr'), _max=21)
+        buffer += integer(unsuccess_sme.get('error_status_code', 0), octets=4)
+
+    return buffer
+
+
+def _decode_unsuccess_smes(payload: bytes, index: int, count: int) -> Tuple[List[Dict[str, Any]], int]:
+    result = []
+    for _ in range(count):
+        dest_addr_ton, index = read_integer(payload, index, octets=1)
+        dest_addr_npi, index = read_integer(payload, index, octets=1)
+        dest_addr, index = read_c_octet_string(payload, index, _max=21)
+        error_status_code, index = read_integer(payload, index, octets=4)
+        result.append({'dest_addr_ton': dest_addr_ton, 'dest_addr_npi': dest_addr_npi, 'dest_addr': dest_addr,
+                       'error_status_code': error_status_code})
+
+    return result, index
+
+
+_LIST_CODECS = {
+    DEST_ADDRESSES: ('_encode_dest_addresses', '_decode_dest_addresses'),
+    UNSUCCESS_SMES: ('_encode_unsuccess_smes', '_decode_unsuccess_smes'),
+}
+
+
+class PDUMeta(type):
+    """
+    Gives each PDU class a slot per mandatory parameter in its command's schema
+    """
+    def __new__(mcs, name, bases, namespace):
+        command_id = namespace.get('command_id')
+        if command_id is not None and '__slots__' not in namespace:
+            fields = SCHEMAS[command_id]
+            namespace['fields'] = tuple(field.name for field in fields)
+            namespace['defaults'] = tuple(field.default for field in fields)
+            namespace['__slots__'] = namespace['fields']
+
+        return super(PDUMeta, mcs).__new__(mcs, name, bases, namespace)
+
+
+class PDU(object, metaclass=PDUMeta):
+    """
+    Base for all PDUs, holds the header fields, mandatory parameters and TLVs
+
+    Item access (pdu['source_addr']) and to_dict() are kept for code written against the dict format.
+    """
+    __slots__ = ('sequence_number', 'command_status', 'tlvs')
+    command_id: int = None
+    fields: Tuple[str, ...] = ()
+    defaults: Tuple[Any, ...] = ()
+
+    def __init__(self, sequence_number: int=0, command_status: int=Status.ESME_ROK,
+                 tlvs: Union[TLVs, Dict[Union[int, str], Any], None]=None, **kwargs):
+        self.sequence_number = sequence_number
+        self.command_status = command_status
+        self.tlvs = tlvs if isinstance(tlvs, TLVs) else TLVs(tlvs)
+
+        for name, default in zip(self.fields, self.defaults):
+            setattr(self, name, kwargs.pop(name, default))
+
+        if kwargs:
+            raise TypeError('Unknown {0} fields: {1}'.format(type(self).__name__, ', '.join(kwargs)))
+
+    def encode(self) -> bytes:
+        return PDU_ENCODERS[self.command_id](self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = {
+            'command_id': self.command_id,
+            'command_status': self.command_status,
+            'sequence_number': self.sequence_number
+        }
+        for name in self.fields:
+            result[name] = getattr(self, name)
+        result['tlvs'] = self.tlvs
+
+        return result
+
+    def get(self, key: str, default: Any=None) -> Any:
+        return getattr(self, key, default)
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __contains__(self, key: str) -> bool:
+        return hasattr(self, key)
+
+    def __eq__(self, other) -> bool:
+        return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        values = ' '.join('{0}={1!r}'.format(name, getattr(self, name)) for name in self.fields)
+        return '<{0} seq={1} status={2} {3} tlvs={4!r}>'.format(type(self).__name__, self.sequence_number,
+                                                                 self.command_status, values, self.tlvs)
+
+
+class GenericNack(PDU):
+    command_id = CommandID.GENERIC_NACK
+
+
+class BindReceiver(PDU):
+    command_id = CommandID.BIND_RECEIVER
+
+
+class BindReceiverResp(PDU):
+    command_id = CommandID.BIND_RECEIVER_RESP
+
+
+class BindTransmitter(PDU):
+    command_id = CommandID.BIND_TRANSMITTER
+
+
+class BindTransmitterResp(PDU):
+    command_id = CommandID.BIND_TRANSMITTER_RESP
+
+
+class QuerySM(PDU):
+    command_id = CommandID.QUERY_SM
+
+
+class QuerySMResp(PDU):
+    command_id = CommandID.QUERY_SM_RESP
+
+
+class SubmitSM(PDU):
+    command_id = CommandID.SUBMIT_SM
+
+
+class SubmitSMResp(PDU):
+    command_id = CommandID.SUBMIT_SM_RESP
+
+
+class DeliverSM(PDU):
+    command_id = CommandID.DELIVER_SM
+
+
+class DeliverSMResp(PDU):
+    command_id = CommandID.DELIVER_SM_RESP
+
+
+class Unbind(PDU):
+    command_id = CommandID.UNBIND
+
+
+class UnbindResp(PDU):
+    command_id = CommandID.UNBIND_RESP
+
+
+class ReplaceSM(PDU):
+    command_id = CommandID.REPLACE_SM
+
+
+class ReplaceSMResp(PDU):
+    command_id = CommandID.REPLACE_SM_RESP
+
+
+class CancelSM(PDU):
+    command_id = CommandID.CANCEL_SM
+
+
+class CancelSMResp(PDU):
+    command_id = CommandID.CANCEL_SM_RESP
+
+
+class BindTransceiver(PDU):
+    command_id = CommandID.BIND_TRANSCEIVER
+
+
+class BindTransceiverResp(PDU):
+    command_id = CommandID.BIND_TRANSCEIVER_RESP
+
+
+class EnquireLink(PDU):
+    command_id = CommandID.ENQUIRE_LINK
+
+
+class EnquireLinkResp(PDU):
+    command_id = CommandID.ENQUIRE_LINK_RESP
+
+
+class SubmitMulti(PDU):
+    command_id = CommandID.SUBMIT_MULTI
+
+
+class SubmitMultiResp(PDU):
+    command_id = CommandID.SUBMIT_MULTI_RESP
+
+
+class AlertNotification(PDU):
+    command_id = CommandID.ALERT_NOTIFICATION
+
+
+class DataSM(PDU):
+    command_id = CommandID.DATA_SM
+
+
+class DataSMResp(PDU):
+    command_id = CommandID.DATA_SM_RESP
+
+
+class Outbind(PDU):
+    command_id = CommandID.OUTBIND
+
+
+PDU_CLASSES: Dict[int, type] = {
+    cls.command_id: cls for cls in (
+        GenericNack, BindReceiver, BindReceiverResp, BindTransmitter, BindTransmitterResp, QuerySM, QuerySMResp,
+        SubmitSM, SubmitSMResp, DeliverSM, DeliverSMResp, Unbind, UnbindResp, ReplaceSM, ReplaceSMResp, CancelSM,
+        CancelSMResp, BindTransceiver, BindTransceiverResp, EnquireLink, EnquireLinkResp, SubmitMulti,
+        SubmitMultiResp, AlertNotification, DataSM, DataSMResp, Outbind
+    )
+}
+
+
+def _integer_groups(fields: Tuple[Field, ...]) -> List[Union[Field, List[Field]]]:
+    """
+    Collapse runs of consecutive integer fields into lists so they can share a struct
+    """
+    result = []
+    for field in fields:
+        if field.kind == INTEGER:
+            if result and isinstance(result[-1], list):
+                result[-1].append(field)
+            else:
+                result.append([field])
+        else:
+            result.append(field)
+
+    return result
+
+
+def _compile(source: str, func_name: str, namespace: Dict[str, Any]) -> Callable:
+    exec(compile(source, '<aiosmpp.pdu {0}>'.format(func_name), 'exec'), namespace)
+    func = namespace[func_name]
+    func.__module__ = __name__
+
+    return func
+
+
+def _compile_encoder(command_id: CommandID, fields: Tuple[Field, ...]) -> Callable[..., bytes]:
+    func_name = 'encode_' + command_id.name.lower()
+    namespace = {'_HEADER': HEADER, '_NULL': b'\x00', '_create_tlvs': create_tlvs}
+    derived = {field.length_field for field in fields if field.length_field}
+
+    params = ['sequence_number']
+    params.extend('{0}={1!r}'.format(field.name, field.default) for field in fields)
+    params.extend(('tlvs=None', 'status=0'))
+    lines = ['def {0}({1}):'.format(func_name, ', '.join(params))]
+
+    # Length and count fields are always derived from the value they describe
+    for field in fields:
+        if field.kind == OCTET_STRING:
+            lines.append('    {0} = {0}[:{1}] if {0} else b""'.format(field.name, field.size))
+            lines.append('    {0} = len({1})'.format(field.length_field, field.name))
+        elif field.kind in _LIST_CODECS:
+            lines.append('    {0} = {0}[:{1}] if {0} else ()'.format(field.name, field.size))
+            lines.append('    {0} = len({1})'.format(field.length_field, field.name))
+
+    parts = []
+    for item in _integer_groups(fields):
+        if isinstance(item, list):
+            struct_name = '_struct_{0}'.format(len(namespace))
+            namespace[struct_name] = struct.Struct('>' + ''.join(INTEGER_FORMATS[field.size] for field in item))
+            values = [field.name if field.name in derived else '{0} or 0'.format(field.name) for field in item]
+            parts.append('{0}.pack({1})'.format(struct_name, ', '.join(values)))
+        elif item.kind == C_OCTET_STRING:
+            parts.append('({0}.encode()[:{1}] + _NULL) if {0} else _NULL'.format(item.name, item.size - 1))
+        elif item.kind == OCTET_STRING:
+            parts.append(item.name)
+        else:
+            encoder_name = _LIST_CODECS[item.kind][0]
+            namespace[encoder_name] = globals()[encoder_name]
+            parts.append('{0}({1})'.format(encoder_name, item.name))
+    parts.append('_create_tlvs(tlvs) if tlvs else b""')
+
+    lines.append('    body = b"".join(({0},))'.format(', '.join(parts)))
+    lines.append('    return _HEADER.pack(16 + len(body), {0}, status, sequence_number) + body'.format(int(command_id)))
+
+    return _compile('\n'.join(lines), func_name, namespace)
+
+
+def _compile_decoder(command_id: CommandID, fields: Tuple[Field, ...]) -> Callable[..., PDU]:
+    func_name = 'decode_' + command_id.name.lower()
+    namespace = {
+        '_NULL': b'\x00',
+        '_new': object.__new__,
+        '_cls': PDU_CLASSES[command_id],
+        'DecodeException': DecodeException,
+        '_TLVs': TLVs,
+        '_tlvs_from_buffer': TLVs.from_buffer,
+        'struct': struct
     }
 
+    lines = [
+        'def {0}(payload, index=0, sequence_number=0, command_status=0):'.format(func_name),
+        '    if type(payload) is not bytes:',
+        '        payload = bytes(payload)',
+        '    payload_len = len(payload)',
+        '    obj = _new(_cls)',
+        '    obj.sequence_number = sequence_number',
+        '    obj.command_status = command_status',
+    ]
+    if command_id & 0x80000000 and fields:
+        # Response bodies are omitted when the command status is an error
+        lines.append('    if index >= payload_len:')
+        lines.extend('        obj.{0} = {1!r}'.format(field.name, field.default) for field in fields)
+        lines.append('        obj.tlvs = _TLVs()')
+        lines.append('        return obj')
+
+    if fields:
+        lines.append('    try:')
+    indent = '        ' if fields else '    '
+    for item in _integer_groups(fields):
+        if isinstance(item, list):
+            struct_name = '_struct_{0}'.format(len(namespace))
+            namespace[struct_name] = struct.Struct('>' + ''.join(INTEGER_FORMATS[field.size] for field in item))
+            names = ', '.join('obj.' + field.name for field in item) + (',' if len(item) == 1 else '')
+            lines.append(indent + '{0} = {1}.unpack_from(payload, index)'.format(names, struct_name))
+            lines.append(indent + 'index += {0}'.format(namespace[struct_name].size))
+        elif item.kind == C_OCTET_STRING:
+            lines.extend(indent + line for line in (
+                'end = payload.find(_NULL, index)',
+                'if end < 0 or end - index >= {0}:'.format(item.size),
+                '    raise DecodeException({0!r})'.format('Invalid c-octet string ' + item.name),
+                'obj.{0} = payload[index:end].decode() if end > index else None'.format(item.name),
+                'index = end + 1',
+            ))
+        elif item.kind == OCTET_STRING:
+            lines.extend(indent + line for line in (
+                'end = index + obj.{0}'.format(item.length_field),
+                'if end > payload_len:',
+                '    raise DecodeException({0!r})'.format('Invalid octet string ' + item.name),
+                'obj.{0} = payload[index:end]'.format(item.name),
+                'index = end',
+            ))
+        else:
+            decoder_name = _LIST_CODECS[item.kind][1]
+            namespace[decoder_name] = globals()[decoder_name]
+            lines.append(indent + 'obj.{0}, index = {1}(payload, index, obj.{2})'.format(item.name, decoder_name, item.length_field))
+
+    if fields:
+        lines.extend((
+            '    except (struct.error, IndexError, UnicodeDecodeError) as err:',
+            '        raise DecodeException({0!r}.format(err))'.format('Malformed ' + command_id.name.lower() + ': {0}'),
+        ))
+    lines.append('    obj.tlvs = _tlvs_from_buffer(payload, index)')
+    lines.append('    return obj')
+
+    return _compile('\n'.join(lines), func_name, namespace)
+
+
+def _compile_pdu_encoder(command_id: CommandID, fields: Tuple[Field, ...]) -> Callable[[PDU], bytes]:
+    func_name = 'encode_' + command_id.name.lower() + '_pdu'
+    namespace = {'_encode': ENCODERS[command_id]}
+
+    args = ['obj.sequence_number']
+    args.extend('obj.' + field.name for field in fields)
+    args.extend(('tlvs=obj.tlvs', 'status=obj.command_status'))
+    source = 'def {0}(obj):\n    return _encode({1})'.format(func_name, ', '.join(args))
+
+    return _compile(source, func_name, namespace)
+
+
+ENCODERS: Dict[int, Callable[..., bytes]] = {
+    command_id: _compile_encoder(command_id, fields) for command_id, fields in SCHEMAS.items()
+}
+DECODERS: Dict[int, Callable[..., PDU]] = {
+    command_id: _compile_decoder(command_id, fields) for command_id, fields in SCHEMAS.items()
+}
+PDU_ENCODERS: Dict[int, Callable[[PDU], bytes]] = {
+    command_id: _compile_pdu_encoder(command_id, fields) for command_id, fields in SCHEMAS.items()
+}
+
+
+class SubmitSMTemplate(object):
+    """
+    Pre-encoded submit_sm for a fixed set of connector parameters
+
+    The constant byte segments are encoded once, encode() only has to splice in the sequence number, addresses,
+    data_coding and short_message. The segment after dest_addr is cached per (esm_class, priority_flag,
+    registered_delivery) as those can change per message.
+    """
+    __slots__ = ('_head', '_middle', '_tail_fields', '_tails', '_default_key', '_sm_default_msg_id')
+
+    _TAIL_CACHE_SIZE = 64
+
+    def __init__(self,
+                 service_type: Optional[str]=None,
+                 source_addr_ton: int=0,
+                 source_addr_npi: int=0,
+                 dest_addr_ton: int=0,
+                 dest_addr_npi: int=0,
+                 esm_class: int=0,
+                 protocol_id: int=0,
+                 priority_flag: int=0,
+                 schedule_delivery_time: Optional[str]=None,
+                 validity_period: Optional[str]=None,
+                 registered_delivery: int=0,
+                 replace_if_present_flag: int=0,
+                 sm_default_msg_id: int=0):
+        self._head = c_octet_string(service_type, _max=6) + _TEMPLATE_ADDR.pack(source_addr_ton or 0, source_addr_npi or 0)
+        self._middle = _TEMPLATE_ADDR.pack(dest_addr_ton or 0, dest_addr_npi or 0)
+        self._tail_fields = (
+            protocol_id or 0,
+            c_octet_string(schedule_delivery_time, _max=17) + c_octet_string(validity_period, _max=17),
+            replace_if_present_flag or 0
+        )
+        self._tails = {}
+        self._default_key = (esm_class or 0, priority_flag or 0, registered_delivery or 0)
+        self._sm_default_msg_id = sm_default_msg_id or 0
+
+    def _tail(self, key: Tuple[int, int, int]) -> bytes:
+        esm_class, priority_flag, registered_delivery = key
+        protocol_id, times, replace_if_present_flag = self._tail_fields
+
+        tail = _TEMPLATE_CLASS.pack(esm_class, protocol_id, priority_flag) + times + \
+            _TEMPLATE_DELIVERY.pack(registered_delivery, replace_if_present_flag)
+
+        if len(self._tails) >= self._TAIL_CACHE_SIZE:
+            self._tails.clear()
+        self._tails[key] = tail
+
+        return tail
+
+    def encode(self,
+               sequence_number: int,
+               source_addr: Optional[str],
+               dest_addr: Optional[str],
+               data_coding: int,
+               short_message: Optional[bytes],
+               esm_class: Optional[int]=None,
+               priority_flag: Optional[int]=None,
+               registered_delivery: Optional[int]=None,
+               tlvs: Union[TLVs, Dict[Union[int, str], Any], List[bytes], None]=None) -> bytes:
+        key = self._default_key
+        if esm_class is not None or priority_flag is not None or registered_delivery is not None:
+            key = (
+                key[0] if esm_class is None else esm_class,
+                key[1] if priority_flag is None else priority_flag,
+                key[2] if registered_delivery is None else registered_delivery
+            )
+        tail = self._tails.get(key) or self._tail(key)
+
+        short_message = short_message[:254] if short_message else b''
+
+        body = b''.join((
+            self._head,
+            (source_addr.encode()[:20] + b'\x00') if source_addr else b'\x00',
+            self._middle,
+            (dest_addr.encode()[:20] + b'\x00') if dest_addr else b'\x00',
+            tail,
+            _TEMPLATE_CODING.pack(data_coding or 0, self._sm_default_msg_id, len(short_message)),
+            short_message,
+            create_tlvs(tlvs) if tlvs else b''
+        ))
+
+        return HEADER.pack(16 + len(body), CommandID.SUBMIT_SM, Status.ESME_ROK, sequence_number) + body
+
+
+_TEMPLATE_ADDR = struct.Struct('>BB')
+_TEMPLATE_CLASS = struct.Struct('>BBB')
+_TEMPLATE_DELIVERY = struct.Struct('>BB')
+_TEMPLATE_CODING = struct.Struct('>BBB')
+
+
+def encode(command_id: int, sequence_number: int, status: int=Status.ESME_ROK,
+           tlvs: Union[TLVs, Dict[Union[int, str], Any], List[bytes], None]=None, **fields) -> bytes:
+    return ENCODERS[command_id](sequence_number, tlvs=tlvs, status=status, **fields)
+
+
+def decode(packet: Union[bytes, memoryview]) -> PDU:
+    """
+    Decode a whole PDU including its header
+
+    :raises DecodeException: If the command id is unknown or the body is malformed
+    """
+    try:
+        _, command_id, command_status, sequence_number = HEADER.unpack_from(packet, 0)
+    except struct.error:
+        raise DecodeException('PDU shorter than header')
+
+    return decode_body(packet, command_id, command_status, sequence_number)
+
+
+def decode_body(packet: Union[bytes, memoryview], command_id: int, command_status: int, sequence_number: int) -> PDU:
+    """
+    Decode a PDU whose header has already been peeked
+
+    :raises DecodeException: If the command id is unknown or the body is malformed
+    """
+    try:
+        decoder = DECODERS[command_id]
+    except KeyError:
+        raise DecodeException('Unknown command id {0}'.format(command_id))
+
+    return decoder(packet, 16, sequence_number, command_status)
+
+
+# Enquire link
+enquire_link = ENCODERS[CommandID.ENQUIRE_LINK]
+enquire_link_resp = ENCODERS[CommandID.ENQUIRE_LINK_RESP]
+
+# Bind TRX
+bind_trx = ENCODERS[CommandID.BIND_TRANSCEIVER]
+decode_bind_trx = DECODERS[CommandID.BIND_TRANSCEIVER]
+
+
+def bind_trx_resp(sequence_number: int,
+                  system_id: str,
+                  interface_version: int=0x34) -> bytes:
+
+    return ENCODERS[CommandID.BIND_TRANSCEIVER_RESP](
+        sequence_number,
+        system_id,
+        tlvs={TLVTag.SC_INTERFACE_VERSION: interface_version}
+    )
+
+
+decode_bind_trx_resp = DECODERS[CommandID.BIND_TRANSCEIVER_RESP]
+
+# Submit SM
+submit_sm = ENCODERS[CommandID.SUBMIT_SM]
+decode_submit_sm = DECODERS[CommandID.SUBMIT_SM]
+
 
 def submit_sm_resp(sequence_number: int, msg_id: str, status=Status.ESME_ROK) -> bytes:
-    buffer = b''
+    if status != Status.ESME_ROK:
+        # Body is not returned on error, 4.4.2
+        return create_header(_id=CommandID.SUBMIT_SM_RESP,
+                             status=status,
+                             sequence_number=sequence_number)
 
-    if status == Status.ESME_ROK:
-        buffer += c_octet_string(msg_id, _max=65)
+    return ENCODERS[CommandID.SUBMIT_SM_RESP](sequence_number, msg_id, status=status)
 
-    return create_header(_id=CommandID.SUBMIT_SM_RESP,
-                         status=status,
-                         sequence_number=sequence_number,
-                         payload=buffer)
 
+decode_submit_sm_resp = DECODERS[CommandID.SUBMIT_SM_RESP]
 
 # Deliver SM
-def deliver_sm(sequence_number: int,
-               service_type: str,
-               source_addr_ton: int,
-               source_addr_npi: int,
-               source_addr: str,
-               dest_addr_ton: int,
-               dest_addr_npi: int,
-               dest_addr: str,
-               esm_class: int,
-               protocol_id: int,
-               priority_flag: int,
-               schedule_delivery_time: str,
-               validity_period: str,
-               registered_delivery: int,
-               replace_if_present_flag: int,
-               data_coding: int,
-               sm_default_msg_id: int,
-               sm_length: int,
-               short_message: bytes,
-               tlvs: Optional[List[bytes]]=None) -> bytes:
-
-    buffer = c_octet_string(service_type, _max=6)
-    buffer += integer(source_addr_ton, octets=1)
-    buffer += integer(source_addr_npi, octets=1)
-    buffer += c_octet_string(source_addr, _max=21)
-    buffer += integer(dest_addr_ton, octets=1)
-    buffer += integer(dest_addr_npi, octets=1)
-    buffer += c_octet_string(dest_addr, _max=21)
-    buffer += integer(esm_class, octets=1)
-    buffer += integer(protocol_id, octets=1)
-    buffer += integer(priority_flag, octets=1)
-    buffer += c_octet_string(schedule_delivery_time, _max=1)
-    buffer += c_octet_string(validity_period, _max=1)
-    buffer += integer(registered_delivery, octets=1)
-    buffer += integer(replace_if_present_flag, octets=1)
-    buffer += integer(data_coding, octets=1)
-    buffer += integer(sm_default_msg_id, octets=1)
-    buffer += integer(sm_length, octets=1)
-    buffer += octet_string(short_message, _max=254)
-
-    if tlvs:
-        for tlv in tlvs:
-            buffer += tlv
-
-    return create_header(_id=CommandID.DELIVER_SM,
-                         status=Status.ESME_ROK,
-                         sequence_number=sequence_number,
-                         payload=buffer)
+deliver_sm = ENCODERS[CommandID.DELIVER_SM]
+decode_deliver_sm = DECODERS[CommandID.DELIVER_SM]
+deliver_sm_resp = ENCODERS[CommandID.DELIVER_SM_RESP]
+decode_deliver_sm_resp = DECODERS[CommandID.DELIVER_SM_RESP]
@@ -0,0 +1,69 @@
+from typing import Any, Dict, List, Optional
+
+
+DEFAULT_SAMPLES = 256
+
+
+def _percentile(ordered: List[float], percent: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))]
+
+
+class RTTStats(object):
+    """
+    Round trip times of a bind's requests
+
+    Keeps the last `samples` round trips in a ring buffer for percentiles, plus a smoothed RTT (RFC 6298 style EWMA)
+    which is cheap enough to read on every request.
+    """
+    __slots__ = ('_samples', '_size', '_index', 'count', 'srtt', 'min', 'max', 'last')
+
+    def __init__(self, samples: int=DEFAULT_SAMPLES):
+        self._samples: List[float] = []
+        self._size = samples
+        self._index = 0
+
+        self.count = 0
+        self.srtt: Optional[float] = None
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self.last: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, rtt: float):
+        if len(self._samples) < self._size:
+            self._samples.append(rtt)
+        else:
+            self._samples[self._index] = rtt
+            self._index = (self._index + 1) % self._size
+
+        self.count += 1
+        self.last = rtt
+        if self.srtt is None:
+            self.srtt = self.min = self.max = rtt
+        else:
+            self.srtt += (rtt - self.srtt) / 8
+            if rtt < self.min:
+                self.min = rtt
+            if rtt > self.max:
+                self.max = rtt
+
+    def percentile(self, percent: float) -> Optional[float]:
+        return _percentile(sorted(self._samples), percent)
+
+    def to_dict(self) -> Dict[str, Any]:
+        ordered = sorted(self._samples)
+
+        return {
+            'count': self.count,
+            'last': self.last,
+            'srtt': self.srtt,
+            'min': self.min,
+            'max': self.max,
+            'p50': _percentile(ordered, 50),
+            'p90': _percentile(ordered, 90),
+            'p99': _percentile(ordered, 99)
+        }
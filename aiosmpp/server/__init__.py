@@ -4,9 +4,12 @@ import datetime
 import enum
 import logging
 import uuid
-from typing import Dict, Any, Type
+from typing import Dict, Any, Type, Optional
 
 from aiosmpp import pdu, log, constants as const
+from aiosmpp.dispatch import DispatchTable
+from aiosmpp.framing import PDUFramer, PDUWriter, FramingException
+from aiosmpp.timers import get_timer_wheel
 
 
 class SMPPSessionState(enum.Enum):
@@ -17,9 +20,18 @@ class SMPPSessionState(enum.Enum):
     CLOSED = enum.auto()  # Client as unbound and closed network connection
 
 
-OPEN_COMMAND_IDS = (pdu.CommandID.BIND_TRANSMITTER, pdu.CommandID.BIND_RECEIVER, pdu.CommandID.BIND_TRANSCEIVER)
-ALL_BOUND_COMMAND_IDS = (pdu.CommandID.ENQUIRE_LINK, pdu.CommandID.UNBIND, pdu.CommandID.DATA_SM)
-BOUND_TRX_COMMAND_IDS = ALL_BOUND_COMMAND_IDS + (pdu.CommandID.SUBMIT_SM, pdu.CommandID.DELIVER_SM_RESP)
+# (state, command_id) -> handler, anything else is unsupported in that state
+SERVER_DISPATCH = DispatchTable.build(
+    SMPPSessionState,
+    ((SMPPSessionState.OPEN,), (pdu.CommandID.BIND_TRANSMITTER,), '_handle_bind_transmitter'),
+    ((SMPPSessionState.OPEN,), (pdu.CommandID.BIND_RECEIVER,), '_handle_bind_receiver'),
+    ((SMPPSessionState.OPEN,), (pdu.CommandID.BIND_TRANSCEIVER,), '_handle_bind_transceiver'),
+    ((SMPPSessionState.BOUND_TRX,), (pdu.CommandID.ENQUIRE_LINK,), '_handle_enquire_link'),
+    ((SMPPSessionState.BOUND_TRX,), (pdu.CommandID.UNBIND,), '_handle_unbind'),
+    ((SMPPSessionState.BOUND_TRX,), (pdu.CommandID.SUBMIT_SM,), '_handle_submit_sm'),
+    ((SMPPSessionState.BOUND_TRX,), (pdu.CommandID.DELIVER_SM_RESP,), '_handle_deliver_sm_resp'),
+    default='_handle_unsupported'
+)
 
 
 class RawSMPPServer(asyncio.Protocol):
@@ -28,9 +40,17 @@ class RawSMPPServer(asyncio.Protocol):
 
         self.logger = logger
         self.transport = None
+        self.writer: Optional[PDUWriter] = None
+        self.framer = PDUFramer()
+
+        self._dispatch = SERVER_DISPATCH.bind(self)
+        self._handle_default = SERVER_DISPATCH.bind_default(self)
+        self._handlers = self._dispatch[SMPPSessionState.CLOSED]
 
         self._state = SMPPSessionState.CLOSED
-        self.unacknowledged_requests = {}
+        self.timers = get_timer_wheel()
+        self.deliver_sm_resp_timeout = 30
+        self.unacknowledged_requests = {}  # Seq ID -> timeout timer
 
         self._sequence_number = 0
 
@@ -49,116 +69,153 @@ class RawSMPPServer(asyncio.Protocol):
 
     @state.setter
     def state(self, value: SMPPSessionState):
-        self.logger.debug('SMPP State transition from {0} -> {1}'.format(self._state, value))
+        self.logger.debug('SMPP State transition from %s -> %s', self._state, value)
         self._state = value
+        self._handlers = self._dispatch[value]
 
     def connection_made(self, transport):
         peername = transport.get_extra_info('peername')
-        self.logger.info('Connection from {0[0]}:{0[1]}'.format(peername))
+        self.logger.info('Connection from %s:%s', *peername[:2])
         self.state = SMPPSessionState.OPEN
         self.transport = transport
+        self.writer = PDUWriter(transport, asyncio.get_event_loop())
 
     def connection_lost(self, exc):
         self.state = SMPPSessionState.CLOSED
-        self.logger.info('Lost connection from {0[0]}:{0[1]}'.format(self.transport.get_extra_info('peername')))
+        for timer in self.unacknowledged_requests.values():
+            timer.cancel()
+        self.unacknowledged_requests.clear()
+        self.logger.info('Lost connection from %s:%s', *self.transport.get_extra_info('peername')[:2])
 
     def data_received(self, data: bytes):
-        header = pdu.decode_header(data)
-        payload = data[16:]
-        command_id = header['id']
-        sequence_no = header['seq_no']
+        try:
+            packets = self.framer.feed(data)
+        except FramingException as err:
+            self.logger.warning('Invalid PDU stream, %s. Closing', err)
+            self.framer.clear()
+            self.writer.close()
+            return
+
+        for packet in packets:
+            if self.transport.is_closing():
+                break
+            self.pdu_received(packet)
+
+    def pdu_received(self, packet: memoryview):
+        _, command_id, command_status, sequence_no = pdu.peek_header(packet)
 
         # Store highest sequence number incase we need to asyncronously
         # speak to the client
         self.sequence_number = sequence_no
 
-        # OPEN, so not bound yet
-        if self.state == SMPPSessionState.OPEN:
-            if command_id not in OPEN_COMMAND_IDS:
-                self.logger.warning('Command ID {0} not supported whilst in OPEN state. Closing'.format(command_id))
-                self.transport.close()
-            elif command_id == pdu.CommandID.BIND_TRANSMITTER:
-                self._handle_bind('transmitter', sequence_no, payload)
-            elif command_id == pdu.CommandID.BIND_RECEIVER:
-                self._handle_bind('receiver', sequence_no, payload)
-            else:  # BIND_TRANSCEIVER
-                self._handle_bind('tranceiver', sequence_no, payload)
-
-        # ALL BIND TYPES
-        elif self.state == SMPPSessionState.BOUND_TRX:
-            if command_id not in BOUND_TRX_COMMAND_IDS:
-                self.logger.warning('Command ID {0} not supported whilst in BOUND_TRX state. Closing'.format(command_id))
-                self.transport.close()
-            elif command_id == pdu.CommandID.ENQUIRE_LINK:
-                self.logger.debug('Sending enquire_link_resp')
-                self._handle_enquire_link(sequence_no)
-            elif command_id == pdu.CommandID.SUBMIT_SM:
-                self._handle_submit_sm(sequence_no, payload)
-            elif command_id == pdu.CommandID.DELIVER_SM_RESP:
-                self._handle_deliver_sm_resp(sequence_no, payload)
-            else:
-                # All other stuff, not handled
-                self.logger.error('Unknown command id {0}'.format(command_id))
-                raise NotImplementedError()
+        self._handlers.get(command_id, self._handle_default)(packet, command_id, command_status, sequence_no)
 
-        else:
-            self.logger.error('Unknown state'.format(self.state))
-            raise NotImplementedError()
+    def _decode(self, packet: memoryview, command_id: int, command_status: int, sequence_id: int) -> Optional[pdu.PDU]:
+        try:
+            return pdu.decode_body(packet, command_id, command_status, sequence_id)
+        except pdu.DecodeException as err:
+            self.logger.warning('Failed to decode PDU, %s. Closing', err)
+            self.writer.close()
+
+        return None
 
     # Handlers
-    def _handle_bind(self, _type: str, sequence_id: int, payload: bytes):
-        if _type == 'transmitter':
-            self.logger.error('transmitter bind not implemented')
-            raise NotImplementedError()
-        elif _type == 'receiver':
-            self.logger.error('receiver bind not implemented')
+    def _handle_unsupported(self, packet: memoryview, command_id: int, command_status: int, sequence_id: int):
+        self.logger.warning('Command ID %s not supported whilst in %s state. Closing', command_id, self.state.name)
+        self.writer.close()
+
+    def _handle_bind_transmitter(self, packet: memoryview, command_id: int, command_status: int, sequence_id: int):
+        self.logger.error('transmitter bind not implemented')
+        raise NotImplementedError()
+
+    def _handle_bind_receiver(self, packet: memoryview, command_id: int, command_status: int, sequence_id: int):
+        self.logger.error('receiver bind not implemented')
+        raise NotImplementedError()
+
+    def _handle_bind_transceiver(self, packet: memoryview, command_id: int, command_status: int, sequence_id: int):
+        request = self._decode(packet, command_id, command_status, sequence_id)
+        if request is None:
+            return
+
+        if self.handle_bind_transceiver(request):
+            # Send resp
+            self.state = SMPPSessionState.BOUND_TRX
+            response = pdu.bind_trx_resp(sequence_id, 'test smpp')
+            self.writer.write(response, urgent=True)
+        else:
+            # Send nack
             raise NotImplementedError()
-        else:  # transceiver
-            request = pdu.decode_bind_trx(payload)
-
-            if self.handle_bind_transceiver(request):
-                # Send resp
-                self.state = SMPPSessionState.BOUND_TRX
-                response = pdu.bind_trx_resp(sequence_id, 'test smpp')
-                self.transport.write(response)
-            else:
-                # Send nack
-                raise NotImplementedError()
-
-    def _handle_enquire_link(self, sequence_id: int):
-        # TODO log
+
+    def _handle_enquire_link(self, packet: memoryview, command_id: int, command_status: int, sequence_id: int):
+        self.logger.debug('Sending enquire_link_resp')
         payload = pdu.enquire_link_resp(sequence_id)
-        self.transport.write(payload)
+        self.writer.write(payload, urgent=True)
+
+    def _handle_unbind(self, packet: memoryview, command_id: int, command_status: int, sequence_id: int):
+        self.logger.info('Unbind requested')
+        self.writer.write(pdu.ENCODERS[pdu.CommandID.UNBIND_RESP](sequence_id))
+        self.state = SMPPSessionState.OPEN
+        self.writer.close()
 
-    def _handle_submit_sm(self, sequence_id: int, payload: bytes):
-        request = pdu.decode_submit_sm(payload)
+    def _handle_submit_sm(self, packet: memoryview, command_id: int, command_status: int, sequence_id: int):
+        request = self._decode(packet, command_id, command_status, sequence_id)
+        if request is None:
+            return
 
         # TODO raise SMPPError with errocode + msg to log out
         msg_id = self.handle_submit_sm(request)
 
         response = pdu.submit_sm_resp(sequence_id, msg_id, status=pdu.Status.ESME_ROK)
-        self.transport.write(response)
+        self.writer.write(response)
 
-    def _handle_deliver_sm_resp(self, sequence_id: int, payload: bytes):
-        pass
+    def _handle_deliver_sm_resp(self, packet: memoryview, command_id: int, command_status: int, sequence_id: int):
+        timer = self.unacknowledged_requests.pop(sequence_id, None)
+        if timer is None:
+            self.logger.warning('Got deliver_sm_resp for unknown sequence number %s', sequence_id)
+            return
+
+        timer.cancel()
+        if command_status != pdu.Status.ESME_ROK:
+            self.logger.warning('deliver_sm %s rejected with status %s', sequence_id, command_status)
+
+    def _deliver_sm_resp_timeout(self, sequence_id: int):
+        if self.unacknowledged_requests.pop(sequence_id, None) is not None:
+            self.logger.warning('Failed to receive deliver_sm_resp for %s in %s seconds', sequence_id, self.deliver_sm_resp_timeout)
+
+    def send_deliver_sm(self, **fields) -> int:
+        """
+        Send a deliver_sm to the ESME and expect a deliver_sm_resp within deliver_sm_resp_timeout
+
+        :return: Sequence number used
+        """
+        sequence_id = self.sequence_number
+        self.sequence_number = sequence_id
+
+        payload = pdu.deliver_sm(sequence_id, **fields)
+        self.unacknowledged_requests[sequence_id] = self.timers.call_later(
+            self.deliver_sm_resp_timeout, self._deliver_sm_resp_timeout, sequence_id
+        )
+        self.writer.write(payload)
+
+        return sequence_id
 
     # Handlers to override
-    def handle_bind_transmitter(self, request: Dict[str, Any]) -> bool:
+    def handle_bind_transmitter(self, request: pdu.BindTransmitter) -> bool:
         return True
 
-    def handle_bind_receiver(self, request: Dict[str, Any]) -> bool:
+    def handle_bind_receiver(self, request: pdu.BindReceiver) -> bool:
         return True
 
-    def handle_bind_transceiver(self, request: Dict[str, Any]) -> bool:
-        self.logger.info('Bind TRX from {0}, pw {1}, system_type {2}'.format(request['system_id'], request['password'], request['system_type']))
+    def handle_bind_transceiver(self, request: pdu.BindTransceiver) -> bool:
+        self.logger.info('Bind TRX from %s, pw %s, system_type %s', request.system_id, request.password, request.system_type)
         return True
 
-    def handle_submit_sm(self, request: Dict[str, Any]) -> str:
+    def handle_submit_sm(self, request: pdu.SubmitSM) -> str:
         # TODO deal with all the logic of msg combining, getting short_message from tlv if needed
         msg_id = str(uuid.uuid4()).lower().replace('-', '')
 
-        self.logger.info('SMS MT {0} -> {1}: {2}'.format(request['source_addr'], request['dest_addr'], request['short_message']))
-        self.logger.debug('Values: {0}'.format(request))
+        self.logger.info('SMS MT %s -> %s: %r', request.source_addr, request.dest_addr, request.short_message)
+        self.logger.debug('Values: %s', request)
 
         # Return MSG ID
         return msg_id
@@ -166,16 +223,17 @@ class RawSMPPServer(asyncio.Protocol):
 
 def run_server(address: str='0.0.0.0', port: int=2775,
                smpp_class: Type[RawSMPPServer]=RawSMPPServer,
-               verbose: bool=False):
+               verbose: bool=False,
+               log_queue: bool=False):
     log_level = logging.DEBUG if verbose else logging.INFO
-    logger = log.get_stdout_logger('server', log_level)
+    logger = log.get_stdout_logger('server', log_level, use_queue=log_queue)
 
     loop = asyncio.get_event_loop()
     server_coro = loop.create_server(lambda: smpp_class(logger=logger), address, port)
     server = loop.run_until_complete(server_coro)
 
     # Serve requests until Ctrl+C is pressed
-    logger.info('Serving on {0[0]}:{0[1]}'.format(server.sockets[0].getsockname()))
+    logger.info('Serving on %s:%s', *server.sockets[0].getsockname()[:2])
     try:
         loop.run_forever()
     except KeyboardInterrupt:
@@ -192,9 +250,10 @@ def get_args() -> Dict[str, Any]:
     parser.add_argument('--address', default='0.0.0.0', help='Address to listen on')
     parser.add_argument('--port', default=2775, type=int, help='Port to listen on')
     parser.add_argument('-v', '--verbose', action='store_true', help='Verbose mode')
+    parser.add_argument('--log-queue', action='store_true', help='Write logs from a background thread so logging never blocks the event loop')
 
     args = parser.parse_args()
-    return {'address': args.address, 'port': args.port, 'verbose': args.verbose}
+    return {'address': args.address, 'port': args.port, 'verbose': args.verbose, 'log_queue': args.log_queue}
 
 
 if __name__ == '__main__':
@@ -0,0 +1,163 @@
+import asyncio
+from typing import Any, Callable, Dict, List, Optional
+
+import aioamqp
+from aioamqp.channel import Channel as AMQPChannel
+
+from aiosmpp import log
+from aiosmpp.smppmanager.reconnect import backoff_delay
+
+logger = log.get_logger('smppmanager.amqp')
+
+DEFAULT_CONNECTIONS = 2
+# Broker reconnect delay, doubles on every failure up to the max
+RECONNECT_DELAY = 1.0
+RECONNECT_MAX_DELAY = 30.0
+
+
+class AMQPConnection(object):
+    """
+    AMQP connection shared by several connectors, each connector opens its own channel on it
+
+    Once started the connection is held open by a background task which reconnects with a jittered backoff whenever
+    it drops. Listeners are called with True once connected and False when the connection is lost, channels die with
+    the connection so that is when users should open a new channel and restart their consumers.
+    """
+    def __init__(self, config: Dict[str, Any], loop: Optional[asyncio.AbstractEventLoop]=None):
+        self.config = config
+
+        self.loop = loop
+        if not loop:
+            self.loop = asyncio.get_event_loop()
+
+        self._transport: Optional[asyncio.BaseTransport] = None
+        self._protocol: Optional[aioamqp.AmqpProtocol] = None
+        self._listeners: List[Callable[[bool], Any]] = []
+
+        self._task: Optional[asyncio.Future] = None
+        # Resolved after every connection attempt, connect() waits on it
+        self._attempt: asyncio.Future = self.loop.create_future()
+        self._closed = False
+
+    @property
+    def connected(self) -> bool:
+        return self._protocol is not None and self._protocol.state == aioamqp.protocol.OPEN
+
+    @property
+    def users(self) -> int:
+        return len(self._listeners)
+
+    def add_listener(self, callback: Callable[[bool], Any]):
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[bool], Any]):
+        try:
+            self._listeners.remove(callback)
+        except ValueError:
+            pass
+
+    def _notify(self, connected: bool):
+        for callback in list(self._listeners):
+            try:
+                callback(connected)
+            except Exception as err:
+                logger.error('Error in MQ connection listener %r: %r', callback, err)
+
+    async def connect(self) -> aioamqp.AmqpProtocol:
+        """
+        Get the open connection, connecting first if needed
+
+        :raises aioamqp.AmqpClosedConnection: If the next connection attempt fails, it is retried in the background
+        """
+        if self.connected:
+            return self._protocol
+
+        if self._task is None and not self._closed:
+            self._task = asyncio.ensure_future(self._run(), loop=self.loop)
+
+        # Shield so one caller being cancelled doesn't cancel the attempt everyone else is waiting on
+        await asyncio.shield(self._attempt)
+        if not self.connected:
+            raise aioamqp.AmqpClosedConnection()
+        return self._protocol
+
+    async def channel(self) -> AMQPChannel:
+        protocol = await self.connect()
+        return await protocol.channel()
+
+    async def _run(self):
+        attempts = 0
+        while not self._closed:
+            try:
+                self._transport, self._protocol = await aioamqp.connect(
+                    host=self.config['host'],
+                    port=self.config['port'],
+                    login=self.config['user'],
+                    password=self.config['password'],
+                    virtualhost=self.config['vhost'],
+                    ssl=False,
+                    heartbeat=self.config['heartbeat_interval']
+                )
+            except (OSError, aioamqp.AioamqpException) as err:
+                logger.warning('Cant connect to MQ on %s:%s, %r', self.config['host'], self.config['port'], err)
+                self._transport = self._protocol = None
+
+            attempt, self._attempt = self._attempt, self.loop.create_future()
+            attempt.set_result(None)
+
+            if self._protocol is None:
+                await asyncio.sleep(backoff_delay(RECONNECT_DELAY, attempts, RECONNECT_MAX_DELAY))
+                attempts += 1
+                continue
+
+            attempts = 0
+            logger.info('Connected to MQ on %s:%s', self.config['host'], self.config['port'])
+            self._notify(True)
+
+            await self._protocol.connection_closed.wait()
+            self._transport = self._protocol = None
+            if not self._closed:
+                logger.warning('Lost connection to MQ on %s:%s, reconnecting', self.config['host'], self.config['port'])
+                self._notify(False)
+
+    def close(self):
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if not self._attempt.done():
+            self._attempt.set_result(None)
+
+        transport, self._transport, self._protocol = self._transport, None, None
+        try:
+            if transport:
+                transport.close()
+        except Exception:
+            pass
+
+
+class AMQPPool(object):
+    """
+    A few AMQP connections shared by every connector in the manager
+
+    Each connector is handed the connection with the fewest users and multiplexes its channel over it, so hundreds
+    of connectors cost a handful of broker connections and heartbeats rather than one each.
+    """
+    def __init__(self, config: Dict[str, Any], size: int=DEFAULT_CONNECTIONS,
+                 loop: Optional[asyncio.AbstractEventLoop]=None):
+        self.loop = loop
+        if not loop:
+            self.loop = asyncio.get_event_loop()
+
+        self.connections = [AMQPConnection(config, loop=self.loop) for _ in range(max(1, size))]
+
+    @property
+    def connected(self) -> int:
+        return sum(1 for connection in self.connections if connection.connected)
+
+    def get_connection(self) -> AMQPConnection:
+        return min(self.connections, key=lambda connection: connection.users)
+
+    def close(self):
+        for connection in self.connections:
+            connection.close()
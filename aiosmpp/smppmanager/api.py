@@ -5,11 +5,14 @@ from typing import Optional, TYPE_CHECKING
 
 from aiohttp import web
 
+from aiosmpp import log
 from aiosmpp.config.smpp import SMPPConfig
 
 if TYPE_CHECKING:
     from aiosmpp.smppmanager.manager import SMPPManager
 
+logger = log.get_logger('smppmanager.api')
+
 
 class WebHandler(object):
     def __init__(self, smpp_manager: 'SMPPManager', config: Optional[SMPPConfig]=None):
@@ -22,6 +25,7 @@ class WebHandler(object):
         _app.add_routes((
             web.get('/api/v1/status', self.handler_api_v1_status),
             web.get('/api/v1/smpp/connectors', self.handler_api_v1_smpp_connectors),
+            web.post('/api/v1/reload', self.handler_api_v1_reload),
         ))
         _app.on_startup.append(self.startup_tasks)
         _app.on_shutdown.append(self.teardown_tasks)
@@ -29,11 +33,11 @@ class WebHandler(object):
         return _app
 
     async def startup_tasks(self, _app):
-        print('Running SMPP Manager setup')
+        logger.info('Running SMPP Manager setup')
         await self.smpp_manager.setup()
 
     async def teardown_tasks(self, _app):
-        print('Running SMPP Manager teardown')
+        logger.info('Running SMPP Manager teardown')
         await self.smpp_manager.teardown()
 
     async def handler_api_v1_smpp_connectors(self, request: web.Request) -> web.Response:
@@ -44,10 +48,37 @@ class WebHandler(object):
 
             result['connectors'][conn_id] = {
                 'state': conn.state.name,
+                'consuming': conn.consuming,
+                'processing': conn.processing,
+                'lanes': conn.lanes.to_dict(),
+                'sessions': [session.to_dict() for session in conn.sessions],
                 'config': conn.config
             }
 
         return web.json_response(result)
 
+    async def handler_api_v1_reload(self, request: web.Request) -> web.Response:
+        await self.smpp_manager.reload()
+
+        return web.json_response({'connectors': list(self.smpp_manager.connectors)})
+
     async def handler_api_v1_status(self, request: web.Request) -> web.Response:
-        return web.Response(text='OK', status=200)
+        """
+        Readiness, 503 until setup has finished and at least one bind is up. Pass ?all=1 to also wait for every bind
+        """
+        manager = self.smpp_manager
+        bound, total = manager.bound_sessions, manager.total_sessions
+
+        ready = manager.started and bound > 0
+        if request.query.get('all', '0') in ('1', 'yes', 'true'):
+            ready = manager.started and bound == total
+
+        result = {
+            'status': 'OK' if ready else 'STARTING',
+            'started': manager.started,
+            'binds': {'bound': bound, 'total': total},
+            'connectors': {'bound': manager.bound_connectors, 'total': len(manager.connectors)},
+            'mq': {'connected': manager.amqp.connected, 'total': len(manager.amqp.connections)}
+        }
+
+        return web.json_response(result, status=200 if ready else 503)
@@ -4,6 +4,10 @@ from typing import Dict, Any, Union
 
 import aiohttp
 
+from aiosmpp import log
+
+logger = log.get_logger('smppmanager.client')
+
 
 # /api/v1/smpp/connections
 
@@ -47,7 +51,7 @@ class SMPPManagerClient(object):
         except asyncio.TimeoutError:
             pass
         except Exception as err:
-            print('get connectors err: {0}'.format(err))
+            logger.warning('get connectors err: %s', err)
 
         return None
 
@@ -56,9 +60,9 @@ class SMPPManagerClient(object):
             try:
                 connector_data = await self.get_connectors()
                 if not connector_data:
-                    print('failed to get connector data')
+                    logger.warning('failed to get connector data')
                 else:
-                    print('Updated SMPP connector data')
+                    logger.debug('Updated SMPP connector data')
                     self.connectors['connectors'].clear()
                     self.connectors.update(connector_data)
                     self.connectors['last_updated'] = datetime.datetime.now()
@@ -67,5 +71,5 @@ class SMPPManagerClient(object):
             except asyncio.CancelledError:
                 break
             except Exception as err:
-                print('get connectors loop err: {0}'.format(err))
+                logger.warning('get connectors loop err: %s', err)
 
@@ -0,0 +1,153 @@
+import asyncio
+import collections
+import zlib
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+from aiosmpp.rtt import RTTStats
+
+PRIORITY_LEVELS = 4
+DEFAULT_WEIGHTS = (1, 2, 4, 8)
+DEFAULT_DESTINATION_LANES = 256
+
+
+def lane_queue_name(queue_name: str, level: int) -> str:
+    """
+    Queue for a priority level, level 0 keeps the connector's original queue
+    """
+    if level <= 0:
+        return queue_name
+    return '{0}_p{1}'.format(queue_name, min(level, PRIORITY_LEVELS - 1))
+
+
+def parse_weights(value: str) -> Tuple[int, ...]:
+    """
+    Parse a comma separated weight per level, e.g. 1,2,4,8
+
+    :raises ValueError: If there isn't a positive integer for every level
+    """
+    weights = tuple(int(part) for part in value.split(','))
+    if len(weights) != PRIORITY_LEVELS or min(weights) < 1:
+        raise ValueError('Need {0} positive weights'.format(PRIORITY_LEVELS))
+    return weights
+
+
+class Lane(object):
+    """
+    Messages delivered from one priority queue which are waiting for a free slot
+    """
+    __slots__ = ('level', 'weight', 'pending', 'wait', 'dispatched', '_current')
+
+    def __init__(self, level: int, weight: int):
+        self.level = level
+        self.weight = weight
+        self.pending: Deque[Tuple[float, Any]] = collections.deque()
+        # Time from delivery to dispatch
+        self.wait = RTTStats()
+        self.dispatched = 0
+        self._current = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'level': self.level,
+            'weight': self.weight,
+            'depth': len(self.pending),
+            'dispatched': self.dispatched,
+            'wait': self.wait.to_dict()
+        }
+
+
+class LaneScheduler(object):
+    """
+    Picks which priority lane's message takes the next free slot
+
+    Lanes share slots by smooth weighted round robin (as in nginx), so with weights 1,2,4,8 and every lane busy
+    level 3 gets 8 of every 15 slots, interleaved rather than in bursts, and bulk on level 0 still progresses.
+    With strict set the top level always goes first whenever it has anything waiting.
+    """
+    def __init__(self, weights: Sequence[int]=DEFAULT_WEIGHTS, strict: bool=True,
+                 loop: Optional[asyncio.AbstractEventLoop]=None):
+        self.loop = loop
+        if not loop:
+            self.loop = asyncio.get_event_loop()
+
+        self.strict = strict
+        self.lanes: List[Lane] = [Lane(level, weight) for level, weight in enumerate(weights)]
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def set_weights(self, weights: Sequence[int], strict: bool):
+        self.strict = strict
+        for lane, weight in zip(self.lanes, weights):
+            lane.weight = weight
+
+    def push(self, level: int, item: Any):
+        self.lanes[level].pending.append((self.loop.time(), item))
+        self._count += 1
+
+    def pop(self) -> Optional[Any]:
+        if not self._count:
+            return None
+
+        top = self.lanes[-1]
+        if self.strict and top.pending:
+            lane = top
+        else:
+            lane = None
+            total = 0
+            for candidate in self.lanes:
+                if candidate.pending:
+                    candidate._current += candidate.weight
+                    total += candidate.weight
+                    if lane is None or candidate._current > lane._current:
+                        lane = candidate
+            lane._current -= total
+
+        queued, item = lane.pending.popleft()
+        lane.wait.add(self.loop.time() - queued)
+        lane.dispatched += 1
+        self._count -= 1
+
+        return item
+
+    def clear(self) -> List[Any]:
+        items = [item for lane in self.lanes for _, item in lane.pending]
+        for lane in self.lanes:
+            lane.pending.clear()
+            lane._current = 0
+        self._count = 0
+        return items
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'strict': self.strict,
+            'lanes': [lane.to_dict() for lane in self.lanes]
+        }
+
+
+def destination_hash(dest_addr: Optional[str]) -> int:
+    return zlib.crc32(dest_addr.encode()) if dest_addr else 0
+
+
+class DestinationLanes(object):
+    """
+    Keeps the submits for a destination in order
+
+    Destinations are hashed onto a fixed set of lanes. A message's segments are written whilst holding its lane's
+    lock, so they go out back to back, in order and ahead of the next message to that destination. The lock is
+    released once they are written, responses are awaited outside it, so windows still pipeline and destinations
+    on other lanes are never held up.
+    """
+    def __init__(self, lanes: int=DEFAULT_DESTINATION_LANES):
+        self._locks = [asyncio.Lock() for _ in range(lanes)]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    def lock(self, dest_addr: Optional[str]) -> asyncio.Lock:
+        return self._locks[destination_hash(dest_addr) % len(self._locks)]
+
+    @property
+    def busy(self) -> int:
+        return sum(1 for lock in self._locks if lock.locked())
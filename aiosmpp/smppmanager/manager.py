@@ -1,16 +1,29 @@
 import argparse
 import asyncio
+import functools
 import os
 import sys
-from typing import Optional, Dict, Tuple, Any
+from typing import Optional, Dict, Tuple, Any, List, Set, Union
 
 from slugify import slugify
 
+from aiosmpp import log
 from aiosmpp.config.smpp import SMPPConfig
-from aiosmpp.client import SMPPClientProtocol, SMPPConnectionState
-import aioamqp
+from aiosmpp.client import SMPPClientProtocol, SMPPConnectionState, SMPPClientError, SubmitResult, SUBMIT_STATES
+from aiosmpp.pdu import SubmitSMTemplate
+from aiosmpp.smppmanager.amqp import AMQPConnection, AMQPPool, DEFAULT_CONNECTIONS
+from aiosmpp.smppmanager.lanes import DEFAULT_WEIGHTS, PRIORITY_LEVELS, DestinationLanes, LaneScheduler, destination_hash, \
+    lane_queue_name, parse_weights
+from aiosmpp.smppmanager.payload import QueuedMessage, decode_payload
+from aiosmpp.smppmanager.requeue import DEFAULT_MAX_ATTEMPTS, is_transient, parse_statuses, retry_queue_arguments, retry_queue_name
+from aiosmpp.smppmanager.reconnect import ReconnectScheduler, DEFAULT_MAX_CONCURRENT, DEFAULT_MAX_DELAY
+from aiosmpp.throttle import TokenBucket
 from aioamqp.channel import Channel as AMQPChannel
+from aioamqp.exceptions import AmqpClosedConnection
 
+logger = log.get_logger('smppmanager.manager')
+
+DEFAULT_STARTUP_CONCURRENCY = 20
 
 
 def try_format(value, func, default=None, warn_str=None, allow_none=False):
@@ -21,153 +34,592 @@ def try_format(value, func, default=None, warn_str=None, allow_none=False):
         value = func(value)
     except Exception:
         if warn_str:
-            print(warn_str.format(value=value))
+            logger.warning(warn_str.format(value=value))
         value = default
     return value
 
 
-class SMPPConnector(object):
-    def __init__(self, config: Dict[str, Any], loop: Optional[asyncio.AbstractEventLoop]=None):
-        self.config = config
-        self._smpp_proto: SMPPClientProtocol = None
+def relative_validity_period(minutes: Optional[int]) -> Optional[str]:
+    """
+    Convert a validity in minutes into an SMPP relative time string, 7.1.1
+    """
+    if minutes is None:
+        return None
 
-        self._amqp_transport = None
-        self._amqp_protocol: aioamqp.AmqpProtocol = None
-        self._amqp_channel: AMQPChannel = None
-        self._queue_name = config['queue_name']
+    days, minutes = divmod(minutes, 60 * 24)
+    hours, minutes = divmod(minutes, 60)
+    years, days = divmod(days, 365)
+    months, days = divmod(days, 30)
+
+    return '{0:02d}{1:02d}{2:02d}{3:02d}{4:02d}00000R'.format(min(years, 99), months, days, hours, minutes)
+
+
+# Most useful state first, a connector reports the best state of its sessions
+STATE_ORDER = (
+    SMPPConnectionState.BOUND_TRX,
+    SMPPConnectionState.BOUND_TX,
+    SMPPConnectionState.BOUND_RX,
+    SMPPConnectionState.OPEN,
+    SMPPConnectionState.CLOSED
+)
+
+
+class SMPPSession(object):
+    """
+    One bind of a connector, connects and reconnects independently of the connector's other binds
+
+    Connection attempts are run by the connector's ReconnectScheduler.
+    """
+    def __init__(self, connector: 'SMPPConnector', index: int, loop: Optional[asyncio.AbstractEventLoop]=None):
+        self.connector = connector
+        self.index = index
+        self._smpp_proto: SMPPClientProtocol = None
 
         self._loop = loop
         if not loop:
             self._loop = asyncio.get_event_loop()
 
-        self._do_reconnect_future = None
+        self._bind_future: Optional[asyncio.Future] = None
+        self._closed = False
 
     def __del__(self):
         self.close()
 
+    @property
+    def scheduler(self) -> ReconnectScheduler:
+        return self.connector.reconnect_scheduler
+
+    @property
+    def name(self) -> str:
+        return '{0}#{1}'.format(self.connector.config['queue_name'], self.index)
+
+    @property
+    def config(self) -> Dict[str, Any]:
+        return self.connector.config
+
+    @property
+    def proto(self) -> Optional[SMPPClientProtocol]:
+        return self._smpp_proto
+
+    @property
+    def state(self) -> SMPPConnectionState:
+        if self._smpp_proto:
+            return self._smpp_proto.state
+        return SMPPConnectionState.CLOSED
+
+    @property
+    def in_flight(self) -> int:
+        if self._smpp_proto:
+            return self._smpp_proto.in_flight
+        return 0
+
+    @property
+    def writing_paused(self) -> bool:
+        return bool(self._smpp_proto and self._smpp_proto.writing_paused)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'index': self.index,
+            'state': self.state.name,
+            'in_flight': self.in_flight,
+            'write_buffer_size': self._smpp_proto.write_buffer_size if self._smpp_proto else 0,
+            'writing_paused': self.writing_paused,
+            'rtt': self._smpp_proto.rtt.to_dict() if self._smpp_proto else None
+        }
+
     def close(self):
+        self._closed = True
         try:
-            self._smpp_proto.close()
+            self.scheduler.forget(self)
         except Exception:
             pass
-        self._smpp_proto = None
+        self._close_proto()
+
+    def _close_proto(self):
+        proto, self._smpp_proto = self._smpp_proto, None
         try:
-            if self._do_reconnect_future:
-                self._do_reconnect_future.cancel()
-        except:
+            proto.close()
+        except Exception:
             pass
 
+    def apply_config(self):
+        if self._smpp_proto:
+            self._smpp_proto.config = self.config
+            self._smpp_proto.submit_sm_template = self.connector.submit_sm_template
+            self._smpp_proto.throttle = self.connector.throttle
+            self._smpp_proto.enquire_link_interval = self.config['enquire_link_interval']
+
+    async def connect(self) -> bool:
+        """
+        Connect and bind, returns True once bound or False if either failed
+        """
+        if self._closed:
+            return True
+
+        self._close_proto()
         try:
-            if self._amqp_transport:
-                self._amqp_transport.close()
-        except:
-            pass
+            sock, conn = await self._loop.create_connection(
+                lambda: SMPPClientProtocol(config=self.config, loop=self._loop),
+                self.config['host'],
+                self.config['port']
+            )
+        except OSError as err:
+            logger.warning('%s cant connect to %s:%s, %s', self.name, self.config['host'], self.config['port'], err)
+            return False
+
+        if self._closed:
+            conn.close()
+            return True
+
+        self._smpp_proto = conn
+        self._smpp_proto.set_connection_lost_callback(functools.partial(self.connection_lost_trigger, conn))
+        self._smpp_proto.set_bound_callback(self.bound_trigger)
+        self._smpp_proto.set_flow_control_callback(self.connector.flow_control_trigger)
+        self.apply_config()
+
+        if self.config['bind_type'] == 'TX':
+            raise NotImplementedError()
+        elif self.config['bind_type'] == 'RX':
+            raise NotImplementedError()
+
+        # TRX, wait for bind_trx_resp. The proto closes the connection if the bind fails, times out or its response
+        # can't be decoded, connection_lost_trigger then resolves the future
+        self._bind_future = self._loop.create_future()
+        self._smpp_proto.bind_trx()
+        try:
+            return await self._bind_future
+        finally:
+            self._bind_future = None
+
+    def bound_trigger(self):
+        self.scheduler.reset(self)
+        self.connector.session_state_trigger()
+        if self._bind_future is not None and not self._bind_future.done():
+            self._bind_future.set_result(True)
+
+    def connection_lost_trigger(self, proto: SMPPClientProtocol):
+        if self._closed or proto is not self._smpp_proto:
+            return
+        self._close_proto()
+        self.connector.session_state_trigger()
+
+        if self._bind_future is not None:
+            # Still connecting, the scheduler retries once connect() returns
+            if not self._bind_future.done():
+                self._bind_future.set_result(False)
+            return
+
+        logger.info('%s connection closed, retrying', self.name)
+        if self.config['conn_loss_retry']:
+            self.scheduler.schedule(self)
+
+
+class SMPPConnector(object):
+    def __init__(self, config: Dict[str, Any], loop: Optional[asyncio.AbstractEventLoop]=None,
+                 reconnect_scheduler: Optional[ReconnectScheduler]=None, amqp: Optional[AMQPConnection]=None):
+        self.config = config
+        self.sessions: List[SMPPSession] = []
+
+        self._loop = loop
+        if not loop:
+            self._loop = asyncio.get_event_loop()
+
+        # The manager passes in a pooled connection, a standalone connector makes its own
+        self._own_amqp = amqp is None
+        self.amqp = amqp or AMQPConnection(config['mq'], loop=self._loop)
+        self.amqp.add_listener(self.amqp_state_trigger)
+        self._amqp_channel: AMQPChannel = None
+        self._queue_future: Optional[asyncio.Future] = None
+        self._queue_name = config['queue_name']
+
+        # AMQP consumption is paused whilst no session is bound or every bound session's write buffer is full
+        self._consumer_tags: Dict[int, str] = {}  # priority level -> consumer tag
+        self._consume = False
+        self._consume_future: Optional[asyncio.Future] = None
+        # Delivered messages wait in their priority lane for one of prefetch_count processing slots
+        self.lanes = LaneScheduler(config['priority_weights'], config['priority_strict'], loop=self._loop)
+        self._processing: Set[asyncio.Future] = set()
+        # Segments to one destination are written in order on one bind
+        self.destination_lanes = DestinationLanes()
+
+        self._running = False
+        self.reconnect_scheduler = reconnect_scheduler or ReconnectScheduler(loop=self._loop)
+
+        self._submit_sm_template: Optional[SubmitSMTemplate] = None
+
+        # submit_throughput of 0 means unthrottled
+        self.throttle: Optional[TokenBucket] = None
+        if config['submit_throughput'] > 0:
+            self.throttle = TokenBucket(config['submit_throughput'], loop=self._loop)
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        self._running = False
+        for session in self.sessions:
+            session.close()
+        self.sessions.clear()
+
+        if self._consume_future is not None:
+            self._consume_future.cancel()
+        if self._queue_future is not None:
+            self._queue_future.cancel()
+        # Anything unacked is redelivered by the broker once the channel closes
+        self.lanes.clear()
+        for future in list(self._processing):
+            future.cancel()
+
+        self.amqp.remove_listener(self.amqp_state_trigger)
+        channel, self._amqp_channel = self._amqp_channel, None
+        if self._own_amqp:
+            self.amqp.close()
+        elif channel is not None and channel.is_open:
+            asyncio.ensure_future(channel.close(), loop=self._loop)
 
     @property
     def state(self) -> SMPPConnectionState:
-        if self._smpp_proto:
-            return self._smpp_proto.state
+        states = {session.state for session in self.sessions}
+        for state in STATE_ORDER:
+            if state in states:
+                return state
         return SMPPConnectionState.CLOSED
 
-    async def run(self):
-        # Connect and listen to queue
-        await self._do_queue_connect()
-
-        # Try and connect to the smpp server
-        await self._do_smpp_connect_or_retry()
+    @property
+    def bound_sessions(self) -> List[SMPPSession]:
+        return [session for session in self.sessions if session.state in SUBMIT_STATES]
+
+    def get_session(self, dest_addr: Optional[str]=None) -> Optional[SMPPSession]:
+        """
+        Get the bound session with the fewest submits in flight, preferring sessions which aren't write paused
+
+        Given a destination, the session it hashes to among those bound and not write paused instead, so its
+        messages stay on one bind. Only if every bound session is paused does it hash over all of them.
+        """
+        if dest_addr is not None:
+            bound = self.bound_sessions
+            sessions = [session for session in bound if not session.writing_paused] or bound
+            if not sessions:
+                return None
+            return sessions[destination_hash(dest_addr) % len(sessions)]
+
+        result = None
+        for session in self.sessions:
+            if session.state not in SUBMIT_STATES:
+                continue
+            if result is None or (result.writing_paused, result.in_flight) > (session.writing_paused, session.in_flight):
+                result = session
+        return result
 
-        while True:
-            # print('sleeping')
-            await asyncio.sleep(10)
+    @property
+    def consuming(self) -> bool:
+        return bool(self._consumer_tags)
 
-    async def _do_queue_connect(self):
+    @property
+    def processing(self) -> int:
+        return len(self._processing)
+
+    def amqp_state_trigger(self, connected: bool):
+        if not connected:
+            # The channel and its consumer went with the connection
+            if self._consume_future is not None:
+                self._consume_future.cancel()
+            self._amqp_channel = None
+            self._consumer_tags.clear()
+            # Their delivery tags died with the channel, the broker redelivers them
+            self.lanes.clear()
+        elif self._running and self._amqp_channel is None and (self._queue_future is None or self._queue_future.done()):
+            logger.info('MQ reconnected, restoring consumer on %s', self._queue_name)
+            self._setup_queue()
+
+    def flow_control_trigger(self, paused: bool):
+        self._update_consume()
+
+    def session_state_trigger(self):
+        self._update_consume()
+
+    def _update_consume(self):
+        consume = any(not session.writing_paused for session in self.bound_sessions)
+        if consume != self._consume:
+            self._consume = consume
+            self._sync_consumer()
+
+    def _sync_consumer(self):
+        if self._consume_future is None or self._consume_future.done():
+            self._consume_future = asyncio.ensure_future(self._update_consumer(), loop=self._loop)
+
+    async def _update_consumer(self):
+        """
+        Cancel or restart the priority lane consumers until they match whether we want messages
+        """
         try:
+            while self._amqp_channel is not None:
+                if self._consume and len(self._consumer_tags) < PRIORITY_LEVELS:
+                    level = min(set(range(PRIORITY_LEVELS)) - set(self._consumer_tags))
+                    result = await self._amqp_channel.basic_consume(functools.partial(self._amqp_callback, level),
+                                                                    queue_name=lane_queue_name(self._queue_name, level))
+                    self._consumer_tags[level] = result['consumer_tag']
+                    if len(self._consumer_tags) == PRIORITY_LEVELS:
+                        logger.info('Consuming from %s', self._queue_name)
+                elif not self._consume and self._consumer_tags:
+                    _, consumer_tag = self._consumer_tags.popitem()
+                    await self._amqp_channel.basic_cancel(consumer_tag)
+                    if not self._consumer_tags:
+                        logger.warning('No writable binds, stopped consuming from %s', self._queue_name)
+                else:
+                    break
+        except asyncio.CancelledError:
+            pass
+        except Exception as err:
+            logger.error('Failed to update consumer on %s: %r', self._queue_name, err)
+
+    async def submit_sm(self, *args, **kwargs) -> SubmitResult:
+        """
+        Submit on the least loaded bound session, takes the same arguments as SMPPClientProtocol.submit_sm
+
+        :raises SMPPClientError: If no session is bound
+        """
+        session = self.get_session()
+        if session is None:
+            raise SMPPClientError('No bound sessions')
+        return await session.proto.submit_sm(*args, **kwargs)
+
+    async def submit_segments(self, submits: List[Dict[str, Any]]) -> List[Union[SubmitResult, BaseException]]:
+        """
+        Submit the segments of one message in order on the bind its destination hashes to
+
+        Returns each segment's SubmitResult or the exception it failed with. If a segment can't be sent the rest
+        aren't either, rather than going out of order on another bind.
+        """
+        sent: List[Union[asyncio.Future, BaseException]] = []
+        async with self.destination_lanes.lock(submits[0]['dest_addr']):
+            session = self.get_session(submits[0]['dest_addr'])
+            error: Optional[BaseException] = None if session else SMPPClientError('No bound sessions')
+
+            for args in submits:
+                if error is None and session.proto is None:
+                    error = SMPPClientError('Session closed')
+                if error is None:
+                    try:
+                        sent.append(await session.proto.send_submit_sm(**args))
+                        continue
+                    except SMPPClientError as err:
+                        error = err
+                sent.append(error)
+
+        results: List[Union[SubmitResult, BaseException]] = []
+        for future in sent:
+            if isinstance(future, BaseException):
+                results.append(future)
+                continue
+            try:
+                results.append(await future)
+            except (SMPPClientError, asyncio.TimeoutError) as err:
+                results.append(err)
+        return results
 
-            print('Attempting to contact MQ')
-            self._amqp_transport, self._amqp_protocol = await aioamqp.connect(
-                host=self.config['mq']['host'],
-                port=self.config['mq']['port'],
-                login=self.config['mq']['user'],
-                password=self.config['mq']['password'],
-                virtualhost=self.config['mq']['vhost'],
-                ssl=False,
-                heartbeat=self.config['mq']['heartbeat_interval']
+    @property
+    def submit_sm_template(self) -> SubmitSMTemplate:
+        """
+        submit_sm with the connector level parameters pre-encoded, rebuilt after a config change
+        """
+        if self._submit_sm_template is None:
+            self._submit_sm_template = SubmitSMTemplate(
+                service_type=self.config['service_type'],
+                source_addr_ton=self.config['source_addr_ton'],
+                source_addr_npi=self.config['source_addr_npi'],
+                dest_addr_ton=self.config['dest_addr_ton'],
+                dest_addr_npi=self.config['dest_addr_npi'],
+                protocol_id=self.config['protocol_id'],
+                priority_flag=self.config['priority_flag'],
+                validity_period=relative_validity_period(self.config['validity_period']),
+                replace_if_present_flag=self.config['replace_if_present_flag'],
+                sm_default_msg_id=self.config['sm_default_msg_id']
             )
-            print('Connected to MQ on {0}:{1}'.format(self.config['mq']['host'], self.config['mq']['port']))
-            self._amqp_channel = await self._amqp_protocol.channel()
-            print('Created MQ channel')
-
-            # Declare queue
-            await self._amqp_channel.queue_declare(self._queue_name, durable=True)
-            print('Declared MQ channel {0}'.format(self._queue_name))
-            # Setup QOS so we only take 1 msg at a time
-            await self._amqp_channel.basic_qos(prefetch_count=1, prefetch_size=0, connection_global=False)
-            print('Set MQ QOS Settings')
-
-            await self._amqp_channel.basic_consume(self._amqp_callback, queue_name=self._queue_name)
-            print('Set up callback')
-        except Exception as err:
-            print('Unexpected error when trying to connect to MQ: {0}'.format(repr(err)))
 
-    async def _amqp_callback(self, channel, body, envelope, properties):
-        print(" [x] Received {0}".format(body))
-        await asyncio.sleep(1)
-        print(" [x] Done")
-        await channel.basic_client_ack(delivery_tag=envelope.delivery_tag)
-        print(" [x] Ackd")
+        return self._submit_sm_template
 
-    async def _do_smpp_reconnect(self):
-        try:
-            if self.config['conn_loss_retry']:
-                # Do reconnect if config says yes
-                await asyncio.sleep(self.config['conn_loss_delay'])
-                await self._do_smpp_connect_or_retry()
-        except asyncio.CancelledError:
-            pass
+    def update_config(self, config: Dict[str, Any]):
+        self.config = config
+        self._queue_name = config['queue_name']
 
-    async def _do_smpp_connect_or_retry(self):
-        if not self._smpp_proto:
-            self._smpp_proto = None
-            try:
-                sock, conn = await self._loop.create_connection(
-                    lambda: SMPPClientProtocol(config=self.config, loop=self._loop),
-                    self.config['host'],
-                    self.config['port']
-                )
+        # Invalidate anything pre-encoded from the old config
+        self._submit_sm_template = None
+        self.lanes.set_weights(config['priority_weights'], config['priority_strict'])
 
-                self._smpp_proto = conn
-                self._smpp_proto.set_connection_lost_callback(self.connection_lost_trigger)
+        if config['submit_throughput'] <= 0:
+            self.throttle = None
+        elif self.throttle is None:
+            self.throttle = TokenBucket(config['submit_throughput'], loop=self._loop)
+        else:
+            self.throttle.set_rate(config['submit_throughput'])
 
-            except ConnectionRefusedError:
-                self._smpp_proto = None
-                print('Cant connect to {0}:{1}, retrying'.format(self.config['host'], self.config['port']))
+        for session in self.sessions:
+            session.apply_config()
 
-                self._do_reconnect_future = asyncio.ensure_future(self._do_smpp_reconnect())
+        if self._running:
+            self._resize_pool()
 
-        if self._smpp_proto:
-            # If proto is not None but is closed, do reconnect
-            if self._smpp_proto.state == SMPPConnectionState.CLOSED:
-                print('Connection closed, retrying')
-                try:
-                    self._smpp_proto.close()
-                except Exception:
-                    pass
-                self._smpp_proto = None
-                self._do_reconnect_future = asyncio.ensure_future(self._do_smpp_reconnect())
-
-            # If proto is not None and is connected, do bind
-            elif self._smpp_proto.state == SMPPConnectionState.OPEN:
-                if self.config['bind_type'] == 'TX':
-                    raise NotImplementedError()
-                elif self.config['bind_type'] == 'RX':
-                    raise NotImplementedError()
-                else:  # TRX
-                    self._smpp_proto.bind_trx()
-
-    def connection_lost_trigger(self):
-        print('Connection closed, retrying')
-        self.close()
-        self._do_reconnect_future = asyncio.ensure_future(self._do_smpp_reconnect())
+        # Track the window as binds or window size change
+        if self._amqp_channel is not None:
+            asyncio.ensure_future(self._set_qos(self._amqp_channel), loop=self._loop)
+
+    def _resize_pool(self):
+        while len(self.sessions) > self.config['binds']:
+            session = self.sessions.pop()
+            logger.info('Closing bind %s', session.name)
+            session.close()
+        self._update_consume()
+
+        while len(self.sessions) < self.config['binds']:
+            session = SMPPSession(self, len(self.sessions), loop=self._loop)
+            self.sessions.append(session)
+            self.reconnect_scheduler.connect_now(session)
+
+    async def run(self):
+        """
+        Start the binds dialing then set up the queue, returns once the queue is set up
+
+        Binds are connected by the reconnect scheduler in the background, so they don't wait on MQ.
+        """
+        self._running = True
+        self._resize_pool()
+
+        await asyncio.shield(self._setup_queue())
+
+    def _setup_queue(self) -> asyncio.Future:
+        if self._queue_future is None or self._queue_future.done():
+            self._queue_future = asyncio.ensure_future(self._do_queue_connect(), loop=self._loop)
+        return self._queue_future
+
+    async def _do_queue_connect(self):
+        """
+        Open a channel, declare the queue and start consuming. If MQ is down this is run again once it reconnects
+        """
+        try:
+            channel = await self.amqp.channel()
+            logger.debug('Created MQ channel for %s', self._queue_name)
+
+            # Declare a queue and a retry queue per priority level
+            for level in range(PRIORITY_LEVELS):
+                queue_name = lane_queue_name(self._queue_name, level)
+                await channel.queue_declare(queue_name, durable=True)
+                await channel.queue_declare(retry_queue_name(queue_name), durable=True,
+                                            arguments=retry_queue_arguments(queue_name))
+            logger.debug('Declared MQ queues for %s', self._queue_name)
+            await self._set_qos(channel)
+        except AmqpClosedConnection:
+            logger.warning('MQ unavailable, %s will start consuming once it reconnects', self._queue_name)
+            return
+        except Exception as err:
+            logger.error('Unexpected error when trying to connect to MQ: %r', err)
+            return
+
+        self._amqp_channel = channel
+        self._consumer_tags.clear()
+        # Starts consuming unless every bind is write paused
+        self._sync_consumer()
+
+    @property
+    def prefetch_count(self) -> int:
+        """
+        Enough unacked messages to fill every bind's window, so fetching the next message from the broker overlaps
+        with waiting on the SMSC. This is per lane, and is also how many messages are processed at once.
+        """
+        return self.config['window'] * self.config['binds']
+
+    async def _set_qos(self, channel: AMQPChannel):
+        try:
+            await channel.basic_qos(prefetch_count=self.prefetch_count, prefetch_size=0, connection_global=False)
+            logger.debug('Set MQ prefetch on %s to %d', self._queue_name, self.prefetch_count)
+        except Exception as err:
+            logger.error('Failed to set MQ prefetch on %s: %r', self._queue_name, err)
+
+    async def _amqp_callback(self, level: int, channel: AMQPChannel, body: bytes, envelope, properties):
+        # aioamqp waits for the callback before delivering the next message, so only queue it in its lane here
+        self.lanes.push(level, (channel, body, envelope.delivery_tag, lane_queue_name(self._queue_name, level)))
+        self._dispatch()
+
+    def _dispatch(self):
+        """
+        Fill free processing slots from the priority lanes
+        """
+        while len(self._processing) < self.prefetch_count and self.lanes:
+            future = asyncio.ensure_future(self._process_message(*self.lanes.pop()), loop=self._loop)
+            self._processing.add(future)
+            future.add_done_callback(self._message_done)
+
+    def _message_done(self, future: asyncio.Future):
+        self._processing.discard(future)
+        if self._running:
+            self._dispatch()
+
+    async def _process_message(self, channel: AMQPChannel, body: bytes, delivery_tag: int, queue_name: str):
+        """
+        Submit every segment of a queued message, acking it once all of the submit_sm_resps are back
+        """
+        try:
+            message = decode_payload(body)
+        except ValueError as err:
+            logger.error('Dropping message %d on %s, %s', delivery_tag, self._queue_name, err)
+            await self._settle(channel, delivery_tag, ack=False, requeue=False)
+            return
+
+        results = await self.submit_segments(message.submits)
+
+        retry, failed = [], []
+        for index, result in enumerate(results):
+            if isinstance(result, BaseException):
+                retry.append(index)
+            elif not result.ok:
+                (retry if is_transient(result.command_status, self.config['requeue_statuses']) else failed).append(index)
+
+        if failed:
+            status = results[failed[0]].command_status
+            logger.warning('SMSC rejected %d/%d segments of %s on %s, status 0x%08x, not retrying', len(failed),
+                           len(results), message.req_id, self._queue_name, status)
+
+        if retry:
+            if message.attempts + 1 >= self.config['requeue_attempts']:
+                logger.error('Giving up on %d/%d segments of %s on %s after %d attempts', len(retry), len(results),
+                             message.req_id, self._queue_name, message.attempts + 1)
+            elif not await self._requeue(channel, queue_name, message, retry):
+                # Couldn't park it on the retry queue, hand the whole message back instead
+                await self._settle(channel, delivery_tag, ack=False, requeue=True)
+                return
+        elif not failed:
+            logger.debug('Submitted %s on %s', message.req_id, self._queue_name)
+
+        await self._settle(channel, delivery_tag, ack=True)
+
+    async def _requeue(self, channel: AMQPChannel, queue_name: str, message: QueuedMessage, segments: List[int]) -> bool:
+        """
+        Park the segments which failed transiently on the retry queue, they return to the queue after requeue_delay
+        """
+        try:
+            await channel.basic_publish(
+                message.retry_payload(segments),
+                exchange_name='',
+                routing_key=retry_queue_name(queue_name),
+                properties={'delivery_mode': 2, 'expiration': str(self.config['requeue_delay'] * 1000)}
+            )
+        except Exception as err:
+            logger.error('Failed to requeue %s on %s: %r', message.req_id, queue_name, err)
+            return False
+
+        logger.info('Retrying %d segments of %s on %s in %ds (attempt %d)', len(segments), message.req_id,
+                    queue_name, self.config['requeue_delay'], message.attempts + 2)
+        return True
+
+    async def _settle(self, channel: AMQPChannel, delivery_tag: int, ack: bool, requeue: bool=False):
+        try:
+            if ack:
+                await channel.basic_client_ack(delivery_tag=delivery_tag)
+            else:
+                await channel.basic_reject(delivery_tag=delivery_tag, requeue=requeue)
+        except Exception as err:
+            # The channel went with the connection, the broker redelivers the message
+            logger.debug('Failed to settle message %d on %s: %r', delivery_tag, self._queue_name, err)
 
 
 class SMPPManager(object):
@@ -179,17 +631,58 @@ class SMPPManager(object):
         self.config = config
 
         self.connectors: Dict[str, Tuple[SMPPConnector, asyncio.Future]] = {}
+        self.started = False
+
+        # Connectors share a few AMQP connections rather than opening one each
+        mq_config = config.mq if config else {}
+        self.amqp = AMQPPool(mq_config, size=mq_config.get('connections', DEFAULT_CONNECTIONS), loop=self.loop)
+
+        manager_config = config.manager if config else {}
+        self.startup_concurrency = max(1, manager_config.get('startup_concurrency', DEFAULT_STARTUP_CONCURRENCY))
+
+        # Shared by every connector so reconnects are spread out and capped across the whole manager
+        reconnect_config = config.reconnect if config else {}
+        self.reconnect_scheduler = ReconnectScheduler(
+            max_concurrent=reconnect_config.get('max_concurrent', DEFAULT_MAX_CONCURRENT),
+            max_delay=reconnect_config.get('max_delay', DEFAULT_MAX_DELAY),
+            loop=self.loop
+        )
+
+    @property
+    def total_sessions(self) -> int:
+        return sum(conn.config['binds'] for conn, _ in self.connectors.values())
+
+    @property
+    def bound_sessions(self) -> int:
+        return sum(len(conn.bound_sessions) for conn, _ in self.connectors.values())
+
+    @property
+    def bound_connectors(self) -> int:
+        return sum(1 for conn, _ in self.connectors.values() if conn.bound_sessions)
 
     async def setup(self):
-        # Loop through config
+        """
+        Start every enabled connector, at most startup_concurrency are setting up at once
+        """
+        semaphore = asyncio.Semaphore(self.startup_concurrency)
+
+        async def _add_connector(name: str, data: Dict[str, str]):
+            async with semaphore:
+                logger.info('Adding %s', name)
+                await self.add_connector(name, data)
+
+        tasks = []
         for connector_id, connector_data in self.config.connectors.items():
             if connector_data.get('disabled', '0') == '1':
-                print('Skipping {0} (disabled)'.format(connector_id))
+                logger.info('Skipping %s (disabled)', connector_id)
             else:
-                print('Adding {0}'.format(connector_id))
-                await self.add_connector(connector_id, connector_data)
+                tasks.append(_add_connector(connector_id, connector_data))
 
-        print('Finished setup')
+        if tasks:
+            await asyncio.gather(*tasks)
+
+        self.started = True
+        logger.info('Finished setup, %d/%d binds up', self.bound_sessions, self.total_sessions)
 
     async def teardown(self):
         for conn, future in self.connectors.values():
@@ -198,9 +691,37 @@ class SMPPManager(object):
                 future.cancel()
             except:
                 pass
+        self.reconnect_scheduler.close()
+        self.amqp.close()
+
+    async def reload(self):
+        """
+        Re-read the config, updating changed connectors, adding new ones and removing deleted ones
+        """
+        self.config.reload()
+
+        for name in list(self.connectors):
+            if name not in self.config.connectors or self.config.connectors[name].get('disabled', '0') == '1':
+                logger.info('Removing %s', name)
+                conn, future = self.connectors.pop(name)
+                conn.close()
+                future.cancel()
 
-    async def add_connector(self, name: str, data: Dict[str, str]):
+        for name, data in self.config.connectors.items():
+            if data.get('disabled', '0') == '1':
+                continue
 
+            if name in self.connectors:
+                conn, _ = self.connectors[name]
+                smpp_config = self.connector_config(name, data)
+                if smpp_config != conn.config:
+                    logger.info('Updating %s', name)
+                    conn.update_config(smpp_config)
+            else:
+                logger.info('Adding %s', name)
+                await self.add_connector(name, data)
+
+    def connector_config(self, name: str, data: Dict[str, str]) -> Dict[str, Any]:
         queue_name = 'smpp_' + slugify(name, separator='_')
 
         smpp_config = {
@@ -213,7 +734,15 @@ class SMPPManager(object):
             'conn_loss_retry': data.get('conn_loss_retry', 'yes').lower() == 'yes',
             'conn_loss_delay': int(data.get('conn_loss_delay', '30')),
             'priority_flag': int(data.get('priority', '0')),
+            'priority_weights': try_format(data.get('priority_weights', '1,2,4,8'), parse_weights, default=DEFAULT_WEIGHTS,
+                                           warn_str='priority_weights must be 4 positive integers not {value}'),
+            'priority_strict': data.get('priority_strict', 'yes').lower() == 'yes',
             'submit_throughput': int(data.get('submit_throughput', '1')),
+            'window': int(data.get('window', '10')),
+            'binds': max(1, int(data.get('binds', '1'))),
+            'write_buffer_high': int(data.get('write_buffer_high', '262144')),
+            'write_buffer_low': int(data.get('write_buffer_low', '65536')),
+            'cork': data.get('cork', 'yes').lower() == 'yes',
             'coding': int(data.get('coding', '1')),
             'enquire_link_interval': int(data.get('enquire_link_interval', '30')),
             'replace_if_present_flag': int(data.get('replace_if_present_flag', '0')),
@@ -233,20 +762,34 @@ class SMPPManager(object):
             # Non protocol config
             'dlr_msgid': int(data.get('dlr_msgid', '0')),
             'dlr_expiry': int(data.get('dlr_expiry', '86400')),
-            'requeue_delay': int(data.get('requeue_delay', '120')),
+            'requeue_delay': max(1, int(data.get('requeue_delay', '120'))),
+            'requeue_attempts': max(1, int(data.get('requeue_attempts', str(DEFAULT_MAX_ATTEMPTS)))),
+            'requeue_statuses': try_format(data.get('requeue_statuses', ''), parse_statuses, default=(),
+                                           warn_str='requeue_statuses must be command_status names or numbers not {value}'),
             'queue_name': queue_name,
             'mq': self.config.mq
         }
         # Value checking
         if smpp_config['bind_type'] not in ('TX', 'RX', 'TRX'):
-            print('bind_type ({0}) is not TX, RX, TRX. Setting to TRX'.format(smpp_config['bind_type']))
+            logger.warning('bind_type (%s) is not TX, RX, TRX. Setting to TRX', smpp_config['bind_type'])
             smpp_config['bind_type'] = 'TRX'
 
-        conn = SMPPConnector(config=smpp_config)
-        future = asyncio.ensure_future(conn.run())
+        return smpp_config
+
+    async def add_connector(self, name: str, data: Dict[str, str]):
+        smpp_config = self.connector_config(name, data)
+
+        conn = SMPPConnector(config=smpp_config, loop=self.loop, reconnect_scheduler=self.reconnect_scheduler,
+                             amqp=self.amqp.get_connection())
+        future = asyncio.ensure_future(conn.run(), loop=self.loop)
 
         self.connectors[name] = (conn, future)
 
+        try:
+            await asyncio.shield(future)
+        except Exception as err:
+            logger.error('Failed to start %s: %r', name, err)
+
         # TODO hook up state change trigger
 
 
@@ -258,24 +801,27 @@ async def main():
     parser.add_argument('--config.dynamodb.table', help='DynamoDB config table')
     parser.add_argument('--config.dynamodb.region', help='DynamoDB region')
     parser.add_argument('--config.dynamodb.key', help='DynamoDB key identifying the config entry')
+    parser.add_argument('--log.level', default='INFO', help='Log level, e.g. DEBUG, INFO, WARNING')
+    parser.add_argument('--log.queue', action='store_true', help='Write logs from a background thread so logging never blocks the event loop')
 
     args = parser.parse_args()
+    log.setup_logging(log.get_log_level(getattr(args, 'log.level')), use_queue=getattr(args, 'log.queue'))
 
     config = None
     if getattr(args, 'config.file') and getattr(args, 'config.dynamodb.table'):
-        print('Cannot specify both dynamodb and file')
+        logger.error('Cannot specify both dynamodb and file')
         sys.exit(1)
     elif getattr(args, 'config.dynamodb.table'):
         raise NotImplementedError()
     elif getattr(args, 'config.file'):
         filepath = os.path.expanduser(getattr(args, 'config.file'))
         if not os.path.exists(filepath):
-            print('Path "{0}" does not exist, exiting'.format(filepath))
+            logger.error('Path "%s" does not exist, exiting', filepath)
             sys.exit(1)
 
         config = SMPPConfig.from_file(filepath)
 
-    print('Starting SMPP Manager')
+    logger.info('Starting SMPP Manager')
     smpp_mgmr = SMPPManager(config=config)
     await smpp_mgmr.setup()
 
@@ -0,0 +1,89 @@
+import binascii
+import json
+from typing import Any, Dict, List, NamedTuple, Optional, Union
+
+from aiosmpp import codec
+from aiosmpp.constants import RegisteredDeliveryReceipt
+from aiosmpp.pdu import TLVs
+
+
+class QueuedMessage(NamedTuple):
+    """
+    A message from a connector's queue, submits holds the SMPPConnector.submit_sm kwargs for each segment
+
+    attempts counts previous submissions which were retried, data is the decoded payload for republishing.
+    """
+    req_id: str
+    submits: List[Dict[str, Any]]
+    dlr: Dict[str, Any]
+    attempts: int
+    data: Dict[str, Any]
+
+    def retry_payload(self, segments: List[int]) -> bytes:
+        """
+        Payload with just the given segments left to send
+        """
+        pdus = self.data['pdus']
+        return json.dumps(dict(self.data, pdus=[pdus[index] for index in segments], attempts=self.attempts + 1)).encode()
+
+
+def esm_class_value(esm_class: Union[int, List[int], None]) -> Optional[int]:
+    """
+    esm_class is either an int or a list of the mode, type and feature bits
+    """
+    if esm_class is None or isinstance(esm_class, int):
+        return esm_class
+    result = 0
+    for part in esm_class:
+        result |= int(part)
+    return result
+
+
+def submit_sm_args(pdu: Dict[str, Any], dlr: Optional[Dict[str, Any]]=None) -> Dict[str, Any]:
+    """
+    Convert a JSON PDU from the queue into submit_sm arguments
+
+    Connector level parameters (TON/NPI, protocol_id etc.) come from the connector's submit_sm template
+    """
+    if pdu.get('short_message_hex'):
+        short_message = binascii.unhexlify(pdu['short_message_hex'])
+    elif isinstance(pdu.get('short_message'), str):
+        short_message = codec.encode(pdu['short_message'], pdu.get('data_coding') or 0, errors='replace')
+    else:
+        short_message = b''
+
+    registered_delivery = pdu.get('registered_delivery')
+    if dlr and dlr.get('level') in (2, 3):
+        # Levels 2 and 3 want the handset delivery receipt, level 1 only needs the submit_sm_resp
+        registered_delivery = RegisteredDeliveryReceipt.SMSC_DELIVERY_RECEIPT_REQUESTED
+
+    return {
+        'source_addr': pdu.get('source_addr'),
+        'dest_addr': pdu.get('destination_addr'),
+        'data_coding': pdu.get('data_coding') or 0,
+        'short_message': short_message,
+        'esm_class': esm_class_value(pdu.get('esm_class')),
+        'priority_flag': pdu.get('priority_flag'),
+        'registered_delivery': registered_delivery,
+        'tlvs': TLVs.from_json(pdu['tlvs']) if pdu.get('tlvs') else None
+    }
+
+
+def decode_payload(body: bytes) -> QueuedMessage:
+    """
+    Decode a message published by the HTTP API
+
+    :raises ValueError: If the body isn't a valid payload
+    """
+    try:
+        data = json.loads(body)
+        dlr = data.get('dlr') or {}
+        submits = [submit_sm_args(pdu, dlr) for pdu in data['pdus']]
+        attempts = int(data.get('attempts', 0))
+    except (ValueError, TypeError, KeyError, AttributeError, binascii.Error) as err:
+        raise ValueError('Invalid payload: {0!r}'.format(err))
+
+    if not submits:
+        raise ValueError('Payload has no PDUs')
+
+    return QueuedMessage(data.get('req_id'), submits, dlr, attempts, data)
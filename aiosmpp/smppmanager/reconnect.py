@@ -0,0 +1,121 @@
+import asyncio
+import functools
+import random
+from typing import Dict, Optional, TYPE_CHECKING
+
+from aiosmpp import log
+
+if TYPE_CHECKING:
+    from aiosmpp.smppmanager.manager import SMPPSession
+
+logger = log.get_logger('smppmanager.reconnect')
+
+DEFAULT_MAX_CONCURRENT = 10
+DEFAULT_MAX_DELAY = 300
+# Floor for conn_loss_delay so a delay of 0 still backs off
+MIN_DELAY = 1.0
+
+
+def backoff_delay(base: float, attempts: int, max_delay: float=DEFAULT_MAX_DELAY) -> float:
+    """
+    Delay before retry number attempts + 1, doubling from base up to max_delay with equal jitter
+    """
+    delay = min(max_delay, max(base, MIN_DELAY) * 2 ** attempts)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class ReconnectScheduler(object):
+    """
+    Schedules connection attempts for every session in the manager
+
+    Each failed attempt doubles the session's delay, starting from its connector's conn_loss_delay and capped at
+    max_delay. The delay is jittered between half and all of that so binds dropped by the same SMSC restart spread
+    out instead of retrying in lockstep. At most max_concurrent connect + bind attempts run at once, the rest queue.
+    A successful bind resets the session's backoff.
+    """
+    def __init__(self, max_concurrent: int=DEFAULT_MAX_CONCURRENT, max_delay: float=DEFAULT_MAX_DELAY,
+                 loop: Optional[asyncio.AbstractEventLoop]=None):
+        self.loop = loop
+        if not loop:
+            self.loop = asyncio.get_event_loop()
+
+        self.max_delay = max_delay
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._attempts: Dict['SMPPSession', int] = {}
+        self._pending: Dict['SMPPSession', asyncio.Handle] = {}
+        self._running: Dict['SMPPSession', asyncio.Future] = {}
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    @property
+    def running(self) -> int:
+        return len(self._running)
+
+    def delay(self, base: float, attempts: int) -> float:
+        return backoff_delay(base, attempts, self.max_delay)
+
+    def connect_now(self, session: 'SMPPSession'):
+        """
+        Queue a connection attempt without any delay, it still waits for a free slot
+        """
+        self.cancel(session)
+        self._start(session)
+
+    def schedule(self, session: 'SMPPSession'):
+        handle = self._pending.pop(session, None)
+        if handle is not None:
+            handle.cancel()
+
+        attempts = self._attempts.get(session, 0)
+        self._attempts[session] = attempts + 1
+        delay = self.delay(session.config['conn_loss_delay'], attempts)
+
+        logger.info('Reconnecting %s in %.1f seconds (attempt %d)', session.name, delay, attempts + 1)
+        self._pending[session] = self.loop.call_later(delay, self._start, session)
+
+    def reset(self, session: 'SMPPSession'):
+        self._attempts.pop(session, None)
+
+    def cancel(self, session: 'SMPPSession'):
+        handle = self._pending.pop(session, None)
+        if handle is not None:
+            handle.cancel()
+
+        future = self._running.pop(session, None)
+        if future is not None:
+            future.cancel()
+
+    def forget(self, session: 'SMPPSession'):
+        self.cancel(session)
+        self._attempts.pop(session, None)
+
+    def _start(self, session: 'SMPPSession'):
+        self._pending.pop(session, None)
+
+        future = asyncio.ensure_future(self._run(session), loop=self.loop)
+        future.add_done_callback(functools.partial(self._finished, session))
+        self._running[session] = future
+
+    def _finished(self, session: 'SMPPSession', future: asyncio.Future):
+        if self._running.get(session) is future:
+            del self._running[session]
+
+    async def _run(self, session: 'SMPPSession'):
+        try:
+            async with self._semaphore:
+                bound = await session.connect()
+        except asyncio.CancelledError:
+            return
+        except Exception as err:
+            logger.error('Unexpected error connecting %s: %r', session.name, err)
+            bound = False
+
+        if not bound and session.config['conn_loss_retry']:
+            self.schedule(session)
+
+    def close(self):
+        for session in list(self._pending) + list(self._running):
+            self.cancel(session)
+        self._attempts.clear()
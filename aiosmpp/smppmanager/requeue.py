@@ -0,0 +1,60 @@
+from typing import Any, Collection, Dict, Tuple, Union
+
+from aiosmpp.pdu import Status
+
+# Statuses where the SMSC turned the message away, so it's safe to retry later. Others such as ESME_RSUBMITFAIL or
+# ESME_RDELIVERYFAILURE can come after the SMSC accepted it, a resubmit could deliver it twice, so they're only
+# retried if a connector's requeue_statuses lists them
+TRANSIENT_STATUSES = frozenset((
+    Status.ESME_RSYSERR,
+    Status.ESME_RMSGQFUL,
+    Status.ESME_RTHROTTLED
+))
+DEFAULT_MAX_ATTEMPTS = 5
+
+
+def parse_statuses(value: str) -> Tuple[int, ...]:
+    """
+    Parse a comma separated list of command_status names or numbers, e.g. ESME_RSUBMITFAIL,0x45
+
+    :raises ValueError: If a status is unknown
+    """
+    result = []
+    for part in value.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            result.append(Status[part.upper()])
+        except KeyError:
+            result.append(Status(int(part, 0)))
+    return tuple(result)
+
+
+def is_transient(result: Union[int, BaseException], extra: Collection[int]=()) -> bool:
+    """
+    Whether a submit's command_status or exception (no bind, session closed, resp timeout) is worth retrying
+
+    :param extra: Statuses to retry on top of TRANSIENT_STATUSES
+    """
+    if isinstance(result, BaseException):
+        return True
+    return result in TRANSIENT_STATUSES or result in extra
+
+
+def retry_queue_name(queue_name: str) -> str:
+    return queue_name + '_retry'
+
+
+def retry_queue_arguments(queue_name: str) -> Dict[str, Any]:
+    """
+    Arguments for a connector's retry queue
+
+    Nothing consumes the retry queue, messages are published to it with an expiration of requeue_delay and the
+    broker dead letters them back onto the tail of the connector queue once it passes. Retries wait on the broker
+    rather than holding a prefetch slot, and a restart doesn't lose them.
+    """
+    return {
+        'x-dead-letter-exchange': '',
+        'x-dead-letter-routing-key': queue_name
+    }
@@ -2,12 +2,15 @@ import argparse
 import os
 import sys
 
+from aiosmpp import log
 from aiosmpp.config.smpp import SMPPConfig
 from aiosmpp.smppmanager.api import WebHandler
 from aiosmpp.smppmanager.manager import SMPPManager
 
 from aiohttp import web
 
+logger = log.get_logger('smppmanager')
+
 
 def app(argv: list=None) -> web.Application:
     parser = argparse.ArgumentParser(prog='HTTP API')
@@ -17,26 +20,29 @@ def app(argv: list=None) -> web.Application:
     parser.add_argument('--config.dynamodb.table', help='DynamoDB config table')
     parser.add_argument('--config.dynamodb.region', help='DynamoDB region')
     parser.add_argument('--config.dynamodb.key', help='DynamoDB key identifying the config entry')
+    parser.add_argument('--log.level', default='INFO', help='Log level, e.g. DEBUG, INFO, WARNING')
+    parser.add_argument('--log.queue', action='store_true', help='Write logs from a background thread so logging never blocks the event loop')
 
     args = parser.parse_args(argv[1:])
+    log.setup_logging(log.get_log_level(getattr(args, 'log.level')), use_queue=getattr(args, 'log.queue'))
 
     config = None
     if getattr(args, 'config.file') and getattr(args, 'config.dynamodb.table'):
-        print('Cannot specify both dynamodb and file')
+        logger.error('Cannot specify both dynamodb and file')
         sys.exit(1)
     elif getattr(args, 'config.dynamodb.table'):
         raise NotImplementedError()
     elif getattr(args, 'config.file'):
         filepath = os.path.expanduser(getattr(args, 'config.file'))
         if not os.path.exists(filepath):
-            print('Path "{0}" does not exist, exiting'.format(filepath))
+            logger.error('Path "%s" does not exist, exiting', filepath)
             sys.exit(1)
 
         config = SMPPConfig.from_file(filepath)
 
-    print('Initialising SMPP Manager')
+    logger.info('Initialising SMPP Manager')
     smpp_manager = SMPPManager(config=config)
-    print('Initialising Web API')
+    logger.info('Initialising Web API')
     web_server = WebHandler(smpp_manager=smpp_manager, config=config)
 
     return web_server.app()
@@ -0,0 +1,152 @@
+import collections
+import random
+from typing import List
+
+from aiosmpp.codec import ESCAPE
+from aiosmpp.constants import DataCoding, UDHIdentifier
+
+MAX_SM_OCTETS = 140
+# The total and sequence number are single octets in both the concatenation IEs and SAR TLVs
+MAX_SEGMENTS = 255
+DEFAULT_MAX_SEGMENTS = 5
+SPLIT_MODES = ('udh', 'sar', 'payload')
+DEFAULT_MAX_DESTINATIONS = 100000
+
+
+def coding_bits(data_coding: int) -> int:
+    """
+    Bits per character for a data_coding, short_message holds 160 7 bit, 140 8 bit or 70 16 bit characters
+    """
+    if data_coding in (DataCoding.OCTET_UNSPECIFIED, DataCoding.LATIN_1, DataCoding.OCTET_UNSPECIFIED_COMMON,
+                       DataCoding.CYRILLIC, DataCoding.ISO_8859_8, DataCoding.ISO_2022_JP):
+        return 8
+    elif data_coding in (DataCoding.JIS, DataCoding.UCS2, DataCoding.PICTOGRAM, DataCoding.EXTENDED_KANJI_JIS,
+                         DataCoding.KS_C_5601):
+        return 16
+    return 7
+
+
+def segment_capacity(data_coding: int, header_octets: int=0) -> int:
+    """
+    Octets of encoded (unpacked for GSM) text that fit in a short_message after header_octets of UDH
+    """
+    bits = coding_bits(data_coding)
+    characters = (MAX_SM_OCTETS - header_octets) * 8 // bits
+    return characters * 2 if bits == 16 else characters
+
+
+def split_short_message(data: bytes, data_coding: int, capacity: int) -> List[bytes]:
+    """
+    Split encoded text into chunks of at most capacity octets
+
+    A GSM escape is never parted from the septet after it and a UTF-16 surrogate pair is never split, either would
+    turn into garbage on the handset.
+    """
+    result = []
+    start = 0
+    while len(data) - start > capacity:
+        end = start + capacity
+        if data_coding == DataCoding.SMSC_DEFAULT:
+            # Escapes pair up from the start of the chunk, so an odd run at the end leaves one without its septet
+            index = end - 1
+            while index >= start and data[index] == ESCAPE:
+                index -= 1
+            if (end - 1 - index) % 2:
+                end -= 1
+        elif data_coding == DataCoding.UCS2 and 0xd8 <= data[end - 2] <= 0xdb:
+            end -= 2
+
+        result.append(data[start:end])
+        start = end
+    result.append(data[start:])
+
+    return result
+
+
+class MessageSplitter(object):
+    """
+    Splits messages too long for one short_message
+
+    mode is udh for a concatenation IE in each segment's UDH, sar for the sar_* TLVs or payload to send the whole
+    message in one message_payload TLV. UDH concatenation uses 16 bit references unless reference_bits is 8.
+    """
+    def __init__(self, mode: str='udh', reference_bits: int=16, max_segments: int=DEFAULT_MAX_SEGMENTS):
+        if mode not in SPLIT_MODES:
+            raise ValueError('Split mode must be one of {0}'.format(', '.join(SPLIT_MODES)))
+        if reference_bits not in (8, 16):
+            raise ValueError('Reference bits must be 8 or 16')
+
+        self.mode = mode
+        self.reference_bits = reference_bits
+        self.max_segments = max(1, min(max_segments, MAX_SEGMENTS))
+
+    def fits(self, data: bytes, data_coding: int, udh: bytes=b'') -> bool:
+        """
+        Whether data fits in one short_message alongside the IEs in udh
+        """
+        return len(data) <= segment_capacity(data_coding, len(udh) + 1 if udh else 0)
+
+    def chunks(self, data: bytes, data_coding: int, udh: bytes=b'') -> List[bytes]:
+        """
+        The segments data needs, in payload mode this is how the SMSC would most likely split it
+        """
+        if self.fits(data, data_coding, udh):
+            return [data]
+
+        if self.mode == 'sar':
+            header_octets = len(udh) + 1 if udh else 0
+        else:
+            header_octets = len(udh) + 1 + (6 if self.reference_bits == 16 else 5)
+        return split_short_message(data, data_coding, segment_capacity(data_coding, header_octets))
+
+    def count(self, data: bytes, data_coding: int, udh: bytes=b'') -> int:
+        return len(self.chunks(data, data_coding, udh))
+
+    def split(self, data: bytes, data_coding: int, udh: bytes=b'') -> List[bytes]:
+        """
+        Split data into segments, in payload mode it's left whole
+
+        :raises ValueError: If it needs more than max_segments
+        """
+        chunks = self.chunks(data, data_coding, udh)
+        if len(chunks) > self.max_segments:
+            raise ValueError('Message needs {0} segments, the limit is {1}'.format(len(chunks), self.max_segments))
+
+        if self.mode == 'payload':
+            return [data]
+        return chunks
+
+    def concat_ie(self, reference: int, total: int, seqnum: int) -> bytes:
+        if self.reference_bits == 16:
+            return bytes((UDHIdentifier.CONCATENATED_16BIT, 4, reference >> 8 & 0xff, reference & 0xff, total, seqnum))
+        return bytes((UDHIdentifier.CONCATENATED_8BIT, 3, reference & 0xff, total, seqnum))
+
+
+class ReferenceAllocator(object):
+    """
+    Concatenation references, counted per destination
+
+    A handset reassembles by reference, so one shared counter wraps across every destination far faster than any
+    one destination sees it repeat. The least recently used destinations are forgotten past max_destinations, one
+    seen again starts from a random reference so it's unlikely to reuse a recent one.
+    """
+    def __init__(self, bits: int=16, max_destinations: int=DEFAULT_MAX_DESTINATIONS):
+        self.modulus = 1 << bits
+        self.max_destinations = max_destinations
+        self._last = collections.OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._last)
+
+    def next(self, destination: str) -> int:
+        last = self._last.pop(destination, None)
+        if last is None:
+            reference = random.randrange(self.modulus)
+        else:
+            reference = (last + 1) % self.modulus
+        self._last[destination] = reference
+
+        if len(self._last) > self.max_destinations:
+            self._last.popitem(last=False)
+
+        return reference
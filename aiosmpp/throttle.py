@@ -0,0 +1,88 @@
+import asyncio
+from typing import Optional
+
+
+class TokenBucket(object):
+    """
+    Token bucket pacing submits to a messages per second rate
+
+    The bucket holds at most a tenth of a second of tokens so bursts stay small. Callers reserve a token up front,
+    when the bucket is empty the balance goes negative and the caller sleeps until its token has accrued, which
+    queues callers in order without a lock.
+
+    backoff() is called when the SMSC says we are going too fast, it cuts the rate multiplicatively (at most once per
+    backoff_cooldown, as a whole window of responses tends to come back throttled). The rate then climbs back
+    linearly, reaching the configured rate again after recovery_time seconds.
+    """
+    def __init__(self, rate: float,
+                 burst: Optional[float]=None,
+                 backoff_factor: float=0.5,
+                 backoff_cooldown: float=1.0,
+                 min_rate: float=1.0,
+                 recovery_time: float=10.0,
+                 loop: Optional[asyncio.AbstractEventLoop]=None):
+        self.loop = loop
+        if not loop:
+            self.loop = asyncio.get_event_loop()
+
+        self.target_rate = float(rate)
+        self.rate = self.target_rate
+        self.burst = burst
+        self.backoff_factor = backoff_factor
+        self.backoff_cooldown = backoff_cooldown
+        self.min_rate = min(min_rate, self.target_rate)
+        self.recovery_time = recovery_time
+
+        self._tokens = self.capacity
+        self._last = self.loop.time()
+        self._last_backoff = None
+
+    @property
+    def capacity(self) -> float:
+        if self.burst is not None:
+            return self.burst
+        return max(1.0, self.rate / 10)
+
+    @property
+    def throttled(self) -> bool:
+        return self.rate < self.target_rate
+
+    def set_rate(self, rate: float):
+        self.target_rate = float(rate)
+        self.min_rate = min(self.min_rate, self.target_rate)
+        self.rate = min(self.rate, self.target_rate) if self.throttled else self.target_rate
+
+    def _refill(self, now: float):
+        elapsed = now - self._last
+        self._last = now
+
+        if self.rate < self.target_rate:
+            self.rate = min(self.target_rate, self.rate + self.target_rate * elapsed / self.recovery_time)
+
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+
+    def reserve(self) -> float:
+        """
+        Take a token, returns how long to wait before using it
+        """
+        self._refill(self.loop.time())
+        self._tokens -= 1
+        if self._tokens >= 0:
+            return 0.0
+        return -self._tokens / self.rate
+
+    async def acquire(self):
+        delay = self.reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+    def backoff(self):
+        now = self.loop.time()
+        if self._last_backoff is not None and now - self._last_backoff < self.backoff_cooldown:
+            return
+
+        self._refill(now)
+        self._last_backoff = now
+        self.rate = max(self.min_rate, self.rate * self.backoff_factor)
+        # Drop any saved up burst so the slower rate applies straight away
+        self._tokens = min(self._tokens, 0.0)
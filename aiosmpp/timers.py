@@ -0,0 +1,154 @@
+import asyncio
+import math
+import weakref
+from typing import Any, Callable, List, Optional
+
+
+DEFAULT_TICK = 0.05  # 50ms
+DEFAULT_SLOTS = 512
+
+
+class Timer(object):
+    """
+    Handle for a callback armed on a TimerWheel, cancel() disarms it
+    """
+    __slots__ = ('callback', 'args', 'rounds', '_slot', '_wheel')
+
+    def __init__(self, callback: Callable[..., Any], args: tuple, rounds: int, slot: Optional[dict], wheel: 'TimerWheel'):
+        self.callback = callback
+        self.args = args
+        self.rounds = rounds
+        self._slot = slot
+        self._wheel = wheel
+
+    @property
+    def active(self) -> bool:
+        return self._slot is not None
+
+    def cancel(self):
+        slot = self._slot
+        if slot is not None:
+            self._slot = None
+            del slot[self]
+            self._wheel._count -= 1
+
+
+class TimerWheel(object):
+    """
+    Hashed timer wheel for request/response timeouts
+
+    Timers are hashed into one of `slots` buckets by expiry tick, arming and cancelling are a dict insert and a
+    dict pop. A single loop.call_later tick walks the buckets and is only scheduled whilst timers are armed.
+    Timers fire up to one tick late, which is fine for timeouts measured in seconds.
+    """
+    def __init__(self, tick: float=DEFAULT_TICK, slots: int=DEFAULT_SLOTS, loop: Optional[asyncio.AbstractEventLoop]=None):
+        self.loop = loop
+        if not loop:
+            self.loop = asyncio.get_event_loop()
+
+        self.tick = tick
+        self._wheel: List[dict] = [{} for _ in range(slots)]
+        self._cursor = 0
+        self._count = 0
+        self._last_tick = 0.0
+        self._handle: Optional[asyncio.TimerHandle] = None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def call_later(self, delay: float, callback: Callable[..., Any], *args) -> Timer:
+        now = self.loop.time()
+        if self._handle is None:
+            self._last_tick = now
+            self._handle = self.loop.call_at(self._last_tick + self.tick, self._run)
+
+        # The cursor is where the wheel stood at _last_tick, count from there so part of a tick already gone by
+        # can't make the timer fire early
+        ticks = max(1, math.ceil((now - self._last_tick + delay) / self.tick))
+        rounds, offset = divmod(ticks, len(self._wheel))
+        if offset == 0:
+            rounds -= 1
+        slot = self._wheel[(self._cursor + offset) % len(self._wheel)]
+
+        timer = Timer(callback, args, rounds, slot, self)
+        slot[timer] = None
+        self._count += 1
+
+        return timer
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        for slot in self._wheel:
+            for timer in slot:
+                timer._slot = None
+            slot.clear()
+        self._count = 0
+
+    def _run(self):
+        now = self.loop.time()
+        elapsed = max(1, int((now - self._last_tick) / self.tick))
+        self._last_tick += elapsed * self.tick
+
+        wheel = self._wheel
+        size = len(wheel)
+        expired = []
+        if elapsed <= size:
+            for _ in range(elapsed):
+                self._cursor = (self._cursor + 1) % size
+                slot = wheel[self._cursor]
+                for timer in list(slot):
+                    if timer.rounds > 0:
+                        timer.rounds -= 1
+                    else:
+                        del slot[timer]
+                        timer._slot = None
+                        expired.append(timer)
+        else:
+            # Loop stalled for more than a whole revolution, work out what is left of each timer directly
+            cursor = self._cursor
+            self._cursor = new_cursor = (cursor + elapsed) % size
+            for index, slot in enumerate(wheel):
+                distance = (index - cursor) % size or size
+                new_distance = (index - new_cursor) % size or size
+                for timer in list(slot):
+                    remaining = timer.rounds * size + distance - elapsed
+                    if remaining > 0:
+                        timer.rounds = (remaining - new_distance) // size
+                    else:
+                        del slot[timer]
+                        timer._slot = None
+                        expired.append(timer)
+
+        self._count -= len(expired)
+        if self._count:
+            self._handle = self.loop.call_at(self._last_tick + self.tick, self._run)
+        else:
+            self._handle = None
+
+        for timer in expired:
+            try:
+                timer.callback(*timer.args)
+            except Exception as err:
+                self.loop.call_exception_handler({
+                    'message': 'Exception in timer callback {0!r}'.format(timer.callback),
+                    'exception': err
+                })
+
+
+_WHEELS = weakref.WeakKeyDictionary()  # loop -> TimerWheel
+
+
+def get_timer_wheel(loop: Optional[asyncio.AbstractEventLoop]=None) -> TimerWheel:
+    """
+    Get the timer wheel shared by every session on the loop
+    """
+    if not loop:
+        loop = asyncio.get_event_loop()
+
+    try:
+        return _WHEELS[loop]
+    except KeyError:
+        wheel = _WHEELS[loop] = TimerWheel(loop=loop)
+        return wheel
@@ -1,21 +1,10 @@
-GSM_CHARS = ("@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞ\x1bÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>"
-             "?¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà")
-GSM_CHARS_EXT = ("````````````````````^```````````````````{}`````\\````````````[~]`"
-                 "|````````````````````````````````````€``````````````````````````")
+from aiosmpp import codec
 
 
 def gsm_encode(plaintext: str) -> str:
-    """Will encode plaintext to gsm 338
-    Taken from
-    http://stackoverflow.com/questions/2452861/python-library-for-converting-plain-text-ascii-into-gsm-7-bit-character-set
     """
-    res = ""
-    for c in plaintext:
-        idx = GSM_CHARS.find(c)
-        if idx != -1:
-            res += chr(idx)
-            continue
-        idx = GSM_CHARS_EXT.find(c)
-        if idx != -1:
-            res += chr(27) + chr(idx)
-    return res
+    Encode plaintext to GSM 03.38, one character per septet with extension characters escaped
+
+    Kept for compatibility, use aiosmpp.codec.gsm_encode for bytes. Unencodable characters become '?'
+    """
+    return codec.gsm_encode(plaintext, errors='replace').decode('latin-1')
@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+from aiosmpp import pdu
+from aiosmpp.client import SMPPClientError, SMPPClientProtocol, SMPPConnectionState
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+async def reply_truncated(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """
+    Answer each request with a response missing its body's null terminator
+    """
+    while True:
+        try:
+            header = await reader.readexactly(16)
+        except asyncio.IncompleteReadError:
+            break
+        command_length, command_id, _, sequence_no = pdu.HEADER.unpack(header)
+        await reader.readexactly(command_length - 16)
+        writer.write(pdu.HEADER.pack(19, command_id | 0x80000000, 0, sequence_no) + b'abc')
+    writer.close()
+
+
+def test_malformed_submit_sm_resp_fails_submit():
+    async def main():
+        loop = asyncio.get_event_loop()
+        server = await asyncio.start_server(reply_truncated, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+
+        lost = loop.create_future()
+        _, proto = await loop.create_connection(lambda: SMPPClientProtocol({}, loop=loop), '127.0.0.1', port)
+        proto.set_connection_lost_callback(lambda: lost.set_result(None))
+        proto.state = SMPPConnectionState.BOUND_TRX
+
+        with pytest.raises(SMPPClientError):
+            await asyncio.wait_for(proto.submit_sm('1', '2', b'hello'), 1)
+        assert proto.in_flight == 0
+        assert proto.state == SMPPConnectionState.CLOSED
+        await asyncio.wait_for(lost, 1)
+
+        server.close()
+        await server.wait_closed()
+
+    run(main())
+
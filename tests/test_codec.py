@@ -0,0 +1,99 @@
+import pytest
+
+from aiosmpp import codec
+from aiosmpp.constants import DataCoding, NationalLanguage
+
+
+def test_gsm_basic_round_trip():
+    text = '@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !"#¤%&\'()*+,-./0123456789:;<=>?¡ABCXYZÄÖÑÜ§¿abcxyzäöñüà'
+    data = codec.gsm_encode(text)
+
+    assert len(data) == len(text) == codec.gsm_length(text)
+    assert codec.gsm_decode(data) == text
+
+
+def test_gsm_extension_round_trip():
+    text = '^{}\\[~]|€\x0c'
+    data = codec.gsm_encode(text)
+
+    assert data == b'\x1b\x14\x1b\x28\x1b\x29\x1b\x2f\x1b\x3c\x1b\x3d\x1b\x3e\x1b\x40\x1b\x65\x1b\x0a'
+    assert codec.gsm_length(text) == len(data) == 2 * len(text)
+    assert codec.gsm_decode(data) == text
+
+
+def test_gsm_errors():
+    with pytest.raises(ValueError):
+        codec.gsm_encode('snow ☃')
+
+    assert codec.gsm_encode('snow ☃', errors='replace') == b'snow ?'
+    assert codec.gsm_encode('snow ☃', errors='ignore') == b'snow '
+
+
+@pytest.mark.parametrize('locking,single,text', [
+    (NationalLanguage.TURKISH, NationalLanguage.TURKISH, 'Günaydın İstanbul, Şişli ğ ç €'),
+    (NationalLanguage.DEFAULT, NationalLanguage.SPANISH, 'Él llegó a Cádiz, ¿qué tal? ç'),
+    (NationalLanguage.PORTUGUESE, NationalLanguage.PORTUGUESE, 'Olá, ação não está Ê ª ∞'),
+    (NationalLanguage.HINDI, NationalLanguage.DEFAULT, 'नमस्ते {x}')
+])
+def test_gsm_shift_tables_round_trip(locking, single, text):
+    assert codec.is_gsm(text, locking, single)
+    assert not codec.is_gsm(text)
+
+    data = codec.gsm_encode(text, locking=locking, single=single)
+    assert len(data) == codec.gsm_length(text, locking, single)
+    assert codec.gsm_decode(data, locking, single) == text
+
+
+def test_shift_tables_are_complete():
+    for table in codec.GSM_LOCKING_SHIFT.values():
+        assert len(table) == 128
+        assert table[codec.ESCAPE] == '\x1b'
+        assert table[codec.GSM_REPLACEMENT] == codec.REPLACEMENT
+
+
+def test_pack_septets():
+    assert codec.pack_septets(codec.gsm_encode('hello')) == bytes.fromhex('e8329bfd06')
+
+
+@pytest.mark.parametrize('text', ['', 'a', 'hellohe', 'hello world', 'x' * 160, '€{}' * 20])
+@pytest.mark.parametrize('fill_bits', [0, 1, 6])
+def test_pack_unpack_round_trip(text, fill_bits):
+    septets = codec.gsm_encode(text)
+    packed = codec.pack_septets(septets, fill_bits)
+
+    assert codec.unpack_septets(packed, len(septets), fill_bits) == septets
+    assert codec.gsm_decode(codec.unpack_septets(packed, len(septets), fill_bits)) == text
+
+
+def test_unpack_count_drops_padding_septet():
+    # 7 septets are 49 bits, the last octet's 7 spare bits would otherwise read as an 8th septet, '@'
+    packed = codec.pack_septets(codec.gsm_encode('hellohe'))
+    assert len(packed) == 7
+
+    assert codec.gsm_decode(codec.unpack_septets(packed)) == 'hellohe@'
+    assert codec.gsm_decode(codec.unpack_septets(packed, 7)) == 'hellohe'
+
+    # Fill bits shift the septets along, the count still trims the tail
+    packed = codec.pack_septets(codec.gsm_encode('hellohe'), fill_bits=7)
+    assert codec.gsm_decode(codec.unpack_septets(packed, 7, fill_bits=7)) == 'hellohe'
+
+
+def test_ucs2_round_trip():
+    text = 'Привет 😀'
+    data = codec.ucs2_encode(text)
+
+    assert len(data) == 2 * codec.ucs2_length(text) == 2 * (len(text) + 1)
+    assert codec.ucs2_decode(data) == text
+
+
+@pytest.mark.parametrize('data_coding,text', [
+    (DataCoding.SMSC_DEFAULT, 'Hi {there} €'),
+    (DataCoding.IA5_ASCII, 'plain ascii'),
+    (DataCoding.LATIN_1, 'café'),
+    (DataCoding.UCS2, 'Привет 😀')
+])
+def test_encode_decode(data_coding, text):
+    data = codec.encode(text, data_coding)
+
+    assert codec.decode(data, data_coding) == text
+    assert codec.encoded_length(text, data_coding) == (len(data) // 2 if data_coding == DataCoding.UCS2 else len(data))
@@ -0,0 +1,30 @@
+from aiosmpp.constants import DataCoding, NationalLanguage
+from aiosmpp.encoding import parse_languages, plan_encoding
+
+
+def test_plan_default_alphabet():
+    plan = plan_encoding('Hello there', parse_languages('turkish'))
+
+    assert plan.data_coding == DataCoding.SMSC_DEFAULT
+    assert (plan.locking, plan.single, plan.udh) == (NationalLanguage.DEFAULT, NationalLanguage.DEFAULT, b'')
+
+
+def test_plan_turkish_single_shift():
+    # è is only in the default alphabet and ş only in the Turkish tables, so just the single shift can carry both
+    text = 'Çok güzel bir gün, crème brulée yok ama şeker var. ' * 2
+    plan = plan_encoding(text, parse_languages('turkish'))
+
+    assert plan.data_coding == DataCoding.SMSC_DEFAULT
+    assert plan.locking == NationalLanguage.DEFAULT
+    assert plan.single == NationalLanguage.TURKISH
+    assert plan.udh == b'\x24\x01\x01'
+    assert plan.segments == 1
+    assert plan.length == len(text) + text.count('ş')
+
+
+def test_plan_ucs2_without_languages():
+    text = 'Çok güzel bir gün, crème brulée yok ama şeker var. ' * 2
+    plan = plan_encoding(text)
+
+    assert plan.data_coding == DataCoding.UCS2
+    assert plan.segments == 2
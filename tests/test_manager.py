@@ -0,0 +1,72 @@
+import asyncio
+import types
+
+from aiosmpp import pdu
+from aiosmpp.client import SMPPConnectionState
+from aiosmpp.smppmanager.manager import SMPPSession
+from aiosmpp.smppmanager.reconnect import ReconnectScheduler
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+async def reply_truncated(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """
+    Answer each request with a response missing its body's null terminator
+    """
+    while True:
+        try:
+            header = await reader.readexactly(16)
+        except asyncio.IncompleteReadError:
+            break
+        command_length, command_id, _, sequence_no = pdu.HEADER.unpack(header)
+        await reader.readexactly(command_length - 16)
+        writer.write(pdu.HEADER.pack(19, command_id | 0x80000000, 0, sequence_no) + b'abc')
+    writer.close()
+
+
+def make_connector(port: int, loop: asyncio.AbstractEventLoop):
+    config = {
+        'host': '127.0.0.1',
+        'port': port,
+        'bind_type': 'TRX',
+        'queue_name': 'test',
+        'enquire_link_interval': 30,
+        'conn_loss_retry': False,
+        'conn_loss_delay': 1
+    }
+    return types.SimpleNamespace(
+        config=config,
+        reconnect_scheduler=ReconnectScheduler(max_concurrent=1, loop=loop),
+        submit_sm_template=None,
+        throttle=None,
+        flow_control_trigger=lambda paused: None,
+        session_state_trigger=lambda: None
+    )
+
+
+def test_malformed_bind_resp_fails_connect():
+    async def main():
+        loop = asyncio.get_event_loop()
+        server = await asyncio.start_server(reply_truncated, '127.0.0.1', 0)
+        connector = make_connector(server.sockets[0].getsockname()[1], loop)
+        session = SMPPSession(connector, 0, loop=loop)
+
+        assert await asyncio.wait_for(session.connect(), 1) is False
+        assert session.state == SMPPConnectionState.CLOSED
+
+        # The attempt gives up its scheduler slot
+        connector.reconnect_scheduler.connect_now(session)
+        await asyncio.sleep(0.2)
+        assert connector.reconnect_scheduler.running == 0
+
+        session.close()
+        server.close()
+        await server.wait_closed()
+
+    run(main())
@@ -0,0 +1,41 @@
+from aiosmpp import codec
+from aiosmpp.constants import DataCoding
+from aiosmpp.splitter import MessageSplitter, split_short_message
+
+
+def test_split_keeps_escape_with_septet():
+    data = codec.gsm_encode('a' * 151 + '€' + 'b' * 10)
+    chunks = split_short_message(data, DataCoding.SMSC_DEFAULT, 152)
+
+    assert [len(chunk) for chunk in chunks] == [151, 12]
+    assert chunks[1].startswith(b'\x1be')
+    assert b''.join(chunks) == data
+    assert ''.join(codec.gsm_decode(chunk) for chunk in chunks) == 'a' * 151 + '€' + 'b' * 10
+
+
+def test_split_escape_run():
+    # Escape pairs count from the start of the chunk, an even cut needs no adjusting
+    text = '€' * 100
+    chunks = split_short_message(codec.gsm_encode(text), DataCoding.SMSC_DEFAULT, 152)
+
+    assert [len(chunk) for chunk in chunks] == [152, 48]
+    assert ''.join(codec.gsm_decode(chunk) for chunk in chunks) == text
+
+
+def test_split_keeps_surrogate_pair():
+    text = 'x' * 66 + '😀' + 'y' * 10
+    data = codec.ucs2_encode(text)
+    chunks = split_short_message(data, DataCoding.UCS2, 134)
+
+    assert [len(chunk) for chunk in chunks] == [132, 24]
+    assert [codec.ucs2_decode(chunk) for chunk in chunks] == ['x' * 66, '😀' + 'y' * 10]
+
+
+def test_splitter_segments():
+    splitter = MessageSplitter()
+    data = codec.gsm_encode('a' * 161)
+
+    assert splitter.fits(codec.gsm_encode('a' * 160), DataCoding.SMSC_DEFAULT)
+    assert [len(chunk) for chunk in splitter.split(data, DataCoding.SMSC_DEFAULT)] == [152, 9]
+    assert [len(chunk) for chunk in MessageSplitter(reference_bits=8).split(data, DataCoding.SMSC_DEFAULT)] == [153, 8]
+    assert MessageSplitter(mode='payload').split(data, DataCoding.SMSC_DEFAULT) == [data]
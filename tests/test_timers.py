@@ -0,0 +1,51 @@
+import asyncio
+
+from aiosmpp.timers import TimerWheel
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def test_timer_never_fires_before_delay():
+    async def main():
+        loop = asyncio.get_event_loop()
+        wheel = TimerWheel(tick=0.05, loop=loop)
+        fired = []
+
+        # Keep the wheel armed so later timers are added part way through a tick
+        wheel.call_later(1.0, lambda: None)
+        for offset in (0.0, 0.01, 0.024, 0.049, 0.07):
+            await asyncio.sleep(offset)
+            armed = loop.time()
+            wheel.call_later(0.05, lambda armed=armed: fired.append(loop.time() - armed))
+
+        await asyncio.sleep(0.3)
+        wheel.close()
+        return fired
+
+    fired = run(main())
+    assert len(fired) == 5
+    # Allow for the loop's clock resolution, timers may only be late
+    assert all(0.05 - 1e-6 <= elapsed < 0.05 + 0.1 for elapsed in fired), fired
+
+
+def test_timer_cancel():
+    async def main():
+        loop = asyncio.get_event_loop()
+        wheel = TimerWheel(tick=0.01, loop=loop)
+        fired = []
+
+        timer = wheel.call_later(0.02, fired.append, 1)
+        wheel.call_later(0.02, fired.append, 2)
+        timer.cancel()
+        assert len(wheel) == 1
+
+        await asyncio.sleep(0.1)
+        return fired, len(wheel)
+
+    assert run(main()) == ([2], 0)